@@ -0,0 +1,256 @@
+"""Scoring VADER des avis produits, en un seul passage.
+
+Le notebook appelait `analyzer.polarity_scores` ligne à ligne trois fois sur les
+mêmes avis (score compound, comparaison annuelle, détail des composantes).
+Ici chaque avis est scoré une seule fois et les quatre composantes VADER
+(neg / neu / pos / compound) sont renvoyées ensemble :
+- les textes identiques (même empreinte) ne sont scorés qu'une fois ;
+- les textes distincts sont répartis par paquets sur un pool de processus ;
+- les scores déjà connus sont relus dans un cache local (ScoreCache, SQLite) ;
+- côté Snowflake, refresh_sentiment() ne traite que les avis nouveaux ou modifiés
+  de PRODUCT_REVIEWS_CLEAN et les fusionne dans ANALYTICS.REVIEW_SENTIMENT_SCORES.
+"""
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+COMPONENTS = ["neg", "neu", "pos", "compound"]
+CHUNK_SIZE = 2000
+DEFAULT_CACHE = Path(__file__).resolve().parents[1] / "data" / "sentiment_cache.sqlite"
+
+_analyzer = None
+
+
+def _get_analyzer():
+    # Un analyseur par processus : le lexique n'est chargé qu'une fois par worker
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def text_hash(value):
+    """Empreinte stable d'un texte d'avis (None → chaîne vide).
+
+    Identique à SHA1(COALESCE(review_text, '')) côté Snowflake.
+    """
+    value = "" if value is None or (isinstance(value, float) and np.isnan(value)) else str(value)
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def _score_chunk(texts):
+    analyzer = _get_analyzer()
+    rows = []
+    for t in texts:
+        scores = analyzer.polarity_scores(t)
+        rows.append([scores[c] for c in COMPONENTS])
+    return rows
+
+
+class ScoreCache:
+    """Cache local des scores VADER, indexé par empreinte du texte (SQLite)."""
+
+    def __init__(self, path=DEFAULT_CACHE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores "
+            "(text_hash TEXT PRIMARY KEY, neg REAL, neu REAL, pos REAL, compound REAL)"
+        )
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, hashes):
+        """Scores connus pour `hashes`, indexés par empreinte (les absents sont omis)."""
+        hashes = list(hashes)
+        parts = []
+        for i in range(0, len(hashes), 900):      # limite de variables d'une requête SQLite
+            batch = hashes[i:i + 900]
+            marks = ", ".join("?" * len(batch))
+            parts.append(pd.read_sql_query(
+                f"SELECT text_hash, {', '.join(COMPONENTS)} FROM scores WHERE text_hash IN ({marks})",
+                self.conn, params=batch, index_col="text_hash",
+            ))
+        if not parts:
+            return pd.DataFrame(columns=COMPONENTS, dtype="float64")
+        return pd.concat(parts)
+
+    def put_many(self, scores):
+        """Enregistre un DataFrame de scores indexé par empreinte."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+            [(h, *row) for h, row in zip(scores.index, scores[COMPONENTS].itertuples(index=False))],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def score_texts(texts, chunk_size=CHUNK_SIZE, workers=None, cache=None):
+    """Scores VADER (neg, neu, pos, compound) de chaque texte, alignés sur l'entrée.
+
+    Un texte manquant reçoit des scores nuls (comme `get_vader_score` dans le notebook).
+    Avec un `cache`, seuls les textes jamais vus sont scorés, puis ajoutés au cache.
+    Au-delà d'un paquet de textes à scorer, le travail part sur un pool de processus.
+    """
+    texts = pd.Series(texts).reset_index(drop=True)
+    missing = texts.isna()
+    hashes = texts.map(text_hash)
+
+    first = ~hashes.duplicated() & ~missing
+    known = cache.get_many(hashes[first]) if cache is not None else None
+    todo = first & ~hashes.isin(known.index) if known is not None else first
+
+    unique_texts = texts[todo].astype(str).tolist()
+    chunks = [unique_texts[i:i + chunk_size] for i in range(0, len(unique_texts), chunk_size)]
+
+    if workers == 1 or len(chunks) <= 1:
+        results = [_score_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = list(pool.map(_score_chunk, chunks))
+
+    rows = [row for chunk in results for row in chunk]
+    by_hash = pd.DataFrame(rows, columns=COMPONENTS, index=hashes[todo].to_numpy(), dtype="float64")
+    if cache is not None:
+        if len(by_hash):
+            cache.put_many(by_hash)
+        by_hash = pd.concat([known.astype("float64"), by_hash])
+
+    scores = by_hash.reindex(hashes.to_numpy()).reset_index(drop=True)
+    scores.loc[missing.to_numpy()] = 0.0
+    return scores
+
+
+def label_sentiment(compound):
+    """Label Positif / Négatif / Neutre à partir du score compound (seuils ±0.05)."""
+    compound = np.asarray(compound, dtype="float64")
+    return np.select([compound >= 0.05, compound <= -0.05], ["Positif", "Négatif"], default="Neutre")
+
+
+def score_reviews(df, text_col="review_text", **kwargs):
+    """Copie de `df` enrichie des colonnes neg, neu, pos, compound (une ligne = un avis)."""
+    scores = score_texts(df[text_col], **kwargs)
+    scores.index = df.index
+    return pd.concat([df, scores], axis=1)
+
+
+# ---------------------------------------------------------
+# Table de scores dans Snowflake (mise à jour incrémentale)
+# ---------------------------------------------------------
+SQL_SCORES_TABLE = """
+CREATE TABLE IF NOT EXISTS ANALYTICS.REVIEW_SENTIMENT_SCORES (
+    review_id NUMBER,
+    text_hash TEXT,
+    neg FLOAT,
+    neu FLOAT,
+    pos FLOAT,
+    compound FLOAT,
+    vader_label TEXT,
+    scored_at TIMESTAMP_NTZ
+)
+"""
+
+# PRODUCT_SENTIMENT devient une vue : plus de reconstruction, elle reflète toujours les derniers scores
+SQL_SENTIMENT_VIEW = """
+CREATE OR REPLACE VIEW ANALYTICS.PRODUCT_SENTIMENT AS
+SELECT
+    r.*,
+    CASE
+        WHEN r.rating >= 4 THEN 'Positif'
+        WHEN r.rating <= 2 THEN 'Négatif'
+        ELSE 'Neutre'
+    END AS sentiment_label,
+    s.neg AS vader_neg,
+    s.neu AS vader_neu,
+    s.pos AS vader_pos,
+    s.compound AS vader_compound,
+    s.vader_label
+FROM SILVER.PRODUCT_REVIEWS_CLEAN r
+LEFT JOIN ANALYTICS.REVIEW_SENTIMENT_SCORES s ON s.review_id = r.review_id
+"""
+
+# Avis jamais scorés, ou dont le texte a changé depuis le dernier scoring
+SQL_PENDING_REVIEWS = """
+SELECT r.review_id, r.review_text
+FROM SILVER.PRODUCT_REVIEWS_CLEAN r
+LEFT JOIN ANALYTICS.REVIEW_SENTIMENT_SCORES s ON s.review_id = r.review_id
+WHERE r.review_id IS NOT NULL
+  AND (s.review_id IS NULL OR s.text_hash <> SHA1(COALESCE(r.review_text, '')))
+"""
+
+SQL_MERGE_SCORES = """
+MERGE INTO ANALYTICS.REVIEW_SENTIMENT_SCORES t
+USING ANALYTICS.REVIEW_SENTIMENT_SCORES_DELTA s
+    ON t.review_id = s.review_id
+WHEN MATCHED THEN UPDATE SET
+    text_hash = s.text_hash, neg = s.neg, neu = s.neu, pos = s.pos, compound = s.compound,
+    vader_label = s.vader_label, scored_at = CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+WHEN NOT MATCHED THEN INSERT (review_id, text_hash, neg, neu, pos, compound, vader_label, scored_at)
+VALUES (s.review_id, s.text_hash, s.neg, s.neu, s.pos, s.compound, s.vader_label, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ)
+"""
+
+
+def ensure_sentiment_objects(engine):
+    """Crée la table de scores et la vue PRODUCT_SENTIMENT (remplace l'ancienne table du même nom)."""
+    with engine.connect() as conn:
+        conn.execute(text(SQL_SCORES_TABLE))
+        legacy_table = conn.execute(text(
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES "
+            "WHERE TABLE_SCHEMA = 'ANALYTICS' AND TABLE_NAME = 'PRODUCT_SENTIMENT' AND TABLE_TYPE = 'BASE TABLE'"
+        )).scalar()
+        if legacy_table:
+            conn.execute(text("DROP TABLE ANALYTICS.PRODUCT_SENTIMENT"))
+        conn.execute(text(SQL_SENTIMENT_VIEW))
+        conn.commit()
+
+
+def write_scores(df, engine):
+    """Fusionne (MERGE) les scores de `df` dans ANALYTICS.REVIEW_SENTIMENT_SCORES.
+
+    `df` doit contenir review_id, review_text et les colonnes produites par score_reviews.
+    Le delta est chargé en une fois par pd_writer (PUT + COPY), pas par des INSERT ligne à ligne.
+    """
+    from snowflake.connector.pandas_tools import pd_writer
+
+    scores = df[["review_id"] + COMPONENTS].copy()
+    scores.insert(1, "text_hash", df["review_text"].map(text_hash))
+    scores["vader_label"] = label_sentiment(scores["compound"])
+    scores.columns = [c.upper() for c in scores.columns]     # identifiants non quotés côté Snowflake
+
+    scores.to_sql("review_sentiment_scores_delta", engine, schema="analytics", if_exists="replace",
+                  index=False, method=pd_writer, chunksize=100_000)
+    with engine.connect() as conn:
+        conn.execute(text(SQL_MERGE_SCORES))
+        conn.execute(text("DROP TABLE IF EXISTS ANALYTICS.REVIEW_SENTIMENT_SCORES_DELTA"))
+        conn.commit()
+
+
+def refresh_sentiment(engine, cache=None, **kwargs):
+    """Score uniquement les avis nouveaux ou modifiés et les fusionne dans Snowflake.
+
+    Renvoie le nombre d'avis mis à jour ; un second appel sans nouvel avis ne transfère rien.
+    """
+    ensure_sentiment_objects(engine)
+    pending = pd.read_sql(text(SQL_PENDING_REVIEWS), engine)
+    pending.columns = [c.lower() for c in pending.columns]
+    if pending.empty:
+        return 0
+    owns_cache = cache is None
+    if owns_cache:
+        cache = ScoreCache()
+    try:
+        write_scores(score_reviews(pending, cache=cache, **kwargs), engine)
+    finally:
+        if owns_cache:
+            cache.close()
+    return len(pending)
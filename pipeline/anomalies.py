@@ -0,0 +1,241 @@
+"""Détection incrémentale d'anomalies sur les volumes journaliers.
+
+Trois familles de séries journalières :
+- « ventes » : CA des ventes par région (ANALYTICS.DAILY_SALES_CUBE, agrégat de
+  SILVER.FINANCIAL_TRANSACTIONS_CLEAN) ;
+- « retours » : expéditions retournées par région de destination
+  (ANALYTICS.LOGISTICS_DAILY) ;
+- « service » : interactions du service client par catégorie de problème
+  (SILVER.CUSTOMER_SERVICE_INTERACTIONS_CLEAN, qui ne porte pas de région).
+
+Chaque série garde, pour chaque jour de la semaine, une moyenne et une variance
+à décroissance exponentielle (EWMA) dans ANALYTICS.ANOMALY_STATE. Un nouveau jour
+est comparé à la référence de son jour de semaine : au-delà de Z_SEUIL écarts-types,
+il est écrit dans ANALYTICS.ANOMALIES (hausse ou baisse). La mise à jour de l'état
+coûte O(1) par série et par jour ; un rafraîchissement ne lit que les jours
+postérieurs au dernier jour traité, jamais l'historique.
+
+Le dernier jour présent dans une source est considéré comme incomplet et attend
+le rafraîchissement suivant. Un jour sans ligne pour une série déjà connue compte
+pour 0 (une région sans aucune vente est justement une anomalie). Les corrections
+tardives d'un jour déjà traité ne sont pas reprises (--full rejoue tout l'historique).
+
+Usage :
+    python pipeline/anomalies.py                      # Snowflake
+    python pipeline/anomalies.py --backend duckdb     # base locale (data/)
+    python pipeline/anomalies.py --full               # repart de zéro
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from tables import sql_type
+from warehouse import connect
+
+TARGET = "ANALYTICS.ANOMALIES"
+STATE = "ANALYTICS.ANOMALY_STATE"
+
+ALPHA = 0.1             # poids du nouveau jour dans la référence (≈ 10 semaines de mémoire par jour de semaine)
+Z_SEUIL = 3.0
+MIN_HISTORY = 4         # observations du même jour de semaine avant de juger
+MIN_REL_STD = 0.05      # écart-type plancher : 5 % de la moyenne (séries très régulières)
+
+# métrique → (requête des jours postérieurs à « ? », série régionale ?)
+SOURCES = {
+    "ventes": ("""
+        SELECT jour, UPPER(TRIM(region)) AS serie, SUM(montant_total) AS valeur
+        FROM ANALYTICS.DAILY_SALES_CUBE
+        WHERE transaction_type = 'Sale' AND region IS NOT NULL AND jour > ?
+        GROUP BY 1, 2
+    """, True),
+    "retours": ("""
+        SELECT ship_date AS jour, UPPER(TRIM(destination_region)) AS serie, SUM(nb_retours) AS valeur
+        FROM ANALYTICS.LOGISTICS_DAILY
+        WHERE destination_region IS NOT NULL AND ship_date > ?
+        GROUP BY 1, 2
+    """, True),
+    "service": ("""
+        SELECT interaction_date AS jour, COALESCE(issue_category, 'Inconnu') AS serie, COUNT(*) AS valeur
+        FROM SILVER.CUSTOMER_SERVICE_INTERACTIONS_CLEAN
+        WHERE interaction_date > ?
+        GROUP BY 1, 2
+    """, False),
+}
+
+ANOMALY_COLUMNS = [
+    ("jour", "DATE"),
+    ("metrique", "TEXT"),
+    ("region", "TEXT"),             # NULL pour les séries non régionales (service)
+    ("serie", "TEXT"),
+    ("valeur", "FLOAT"),
+    ("attendu", "FLOAT"),
+    ("ecart_type", "FLOAT"),
+    ("z_score", "FLOAT"),
+    ("sens", "TEXT"),               # Hausse | Baisse
+    ("detected_at", "TIMESTAMP"),
+]
+
+STATE_COLUMNS = [
+    ("metrique", "TEXT"),
+    ("serie", "TEXT"),
+    ("jour_semaine", "INTEGER"),    # 0 = lundi
+    ("moyenne", "FLOAT"),
+    ("variance", "FLOAT"),
+    ("nb", "INTEGER"),
+    ("dernier_jour", "DATE"),
+]
+
+
+def ensure_tables(wh):
+    for table, columns in ((TARGET, ANOMALY_COLUMNS), (STATE, STATE_COLUMNS)):
+        cols = ",\n    ".join(f"{name} {sql_type(type_, wh.dialect)}" for name, type_ in columns)
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    {cols}\n)")
+
+
+class SeriesState:
+    """Références EWMA (séries × 7 jours de semaine) d'une métrique."""
+
+    def __init__(self, series):
+        self.series = list(series)
+        n = len(self.series)
+        self.mean = np.zeros((n, 7))
+        self.var = np.zeros((n, 7))
+        self.count = np.zeros((n, 7), dtype=np.int64)
+
+    @classmethod
+    def load(cls, wh, metric):
+        rows = wh.execute(
+            f"SELECT serie, jour_semaine, moyenne, variance, nb FROM {STATE} WHERE metrique = ?", [metric])
+        state = cls(sorted({serie for serie, *_ in rows}))
+        index = {serie: i for i, serie in enumerate(state.series)}
+        for serie, weekday, mean, var, count in rows:
+            i = index[serie]
+            state.mean[i, weekday], state.var[i, weekday], state.count[i, weekday] = mean, var, count
+        return state
+
+    def extend(self, series):
+        new = [s for s in series if s not in set(self.series)]
+        if new:
+            self.series += new
+            grow = ((0, len(new)), (0, 0))
+            self.mean, self.var, self.count = (np.pad(a, grow) for a in (self.mean, self.var, self.count))
+
+    def update(self, weekday, values):
+        """Compare `values` (une par série, NaN = pas encore de données) à la référence du jour, puis l'actualise.
+
+        Renvoie (attendu, écart-type, z) avant mise à jour ; z vaut NaN tant que l'historique est insuffisant.
+        """
+        mean, var, count = self.mean[:, weekday], self.var[:, weekday], self.count[:, weekday]
+        known = ~np.isnan(values)
+        std = np.maximum(np.sqrt(var), MIN_REL_STD * np.abs(mean))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = np.where(known & (count >= MIN_HISTORY) & (std > 0), (values - mean) / std, np.nan)
+        expected, spread = mean.copy(), std
+
+        # une valeur aberrante n'entre dans la référence que bornée à ± Z_SEUIL écarts-types
+        bounded = np.where(np.abs(z) > Z_SEUIL, mean + np.sign(z) * Z_SEUIL * std, values)
+        first = known & (count == 0)
+        diff = np.where(known, bounded - mean, 0.0)
+        self.mean[:, weekday] = np.where(first, values, mean + ALPHA * diff)
+        self.var[:, weekday] = np.where(first, 0.0, np.where(known, (1 - ALPHA) * (var + ALPHA * diff ** 2), var))
+        self.count[:, weekday] = count + known
+        return expected, spread, z
+
+    def rows(self, metric, last_day):
+        return [
+            (metric, serie, weekday, float(self.mean[i, weekday]), float(self.var[i, weekday]),
+             int(self.count[i, weekday]), last_day)
+            for i, serie in enumerate(self.series) for weekday in range(7) if self.count[i, weekday]
+        ]
+
+
+def _new_days(wh, sql, since):
+    """Valeurs (jours × séries) postérieures à `since`, sans le dernier jour (incomplet)."""
+    df = wh.query_df(sql, [since])
+    if df.empty:
+        return pd.DataFrame()
+    df["JOUR"] = pd.to_datetime(df["JOUR"])
+    df["VALEUR"] = df["VALEUR"].astype(np.float64)
+    df = df[df["JOUR"] < df["JOUR"].max()]
+    if df.empty:
+        return pd.DataFrame()
+    return df.pivot_table(index="JOUR", columns="SERIE", values="VALEUR", aggfunc="sum").sort_index()
+
+
+def detect(wh, metric, full=False):
+    """Traite les nouveaux jours d'une métrique ; renvoie (jours, valeurs traitées, anomalies)."""
+    sql, regional = SOURCES[metric]
+    state = SeriesState([]) if full else SeriesState.load(wh, metric)
+    since = None if full else wh.execute(f"SELECT MAX(dernier_jour) FROM {STATE} WHERE metrique = ?", [metric])[0][0]
+    values = _new_days(wh, sql, since or date(1900, 1, 1))
+    if values.empty:
+        return 0, 0, []
+
+    state.extend(values.columns)
+    values = values.reindex(columns=state.series)
+    # série déjà commencée : un jour sans ligne vaut 0 ; avant son premier jour : pas de valeur
+    started = np.asarray(state.count.sum(axis=1) > 0)[None, :] | (values.notna().cumsum().to_numpy() > 0)
+    matrix = np.where(started, values.fillna(0).to_numpy(), np.nan)
+
+    anomalies = []
+    for day, row in zip(values.index, matrix):
+        expected, spread, z = state.update(day.weekday(), row)
+        for i in np.flatnonzero(np.abs(np.nan_to_num(z)) > Z_SEUIL):
+            serie = state.series[i]
+            anomalies.append((day.date(), metric, serie if regional else None, serie, float(row[i]),
+                              float(expected[i]), float(spread[i]), round(float(z[i]), 2),
+                              "Hausse" if z[i] > 0 else "Baisse"))
+
+    last_day = values.index.max().date()
+    wh.execute("BEGIN")
+    try:
+        wh.execute(f"DELETE FROM {STATE} WHERE metrique = ?", [metric])
+        wh.executemany(f"INSERT INTO {STATE} VALUES (?, ?, ?, ?, ?, ?, ?)", state.rows(metric, last_day))
+        wh.executemany(f"INSERT INTO {TARGET} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", anomalies)
+        wh.execute("COMMIT")
+    except Exception:
+        wh.execute("ROLLBACK")
+        raise
+    return len(values), int(np.count_nonzero(~np.isnan(matrix))), anomalies
+
+
+def refresh(wh, full=False):
+    """Traite les jours arrivés depuis le dernier passage, pour toutes les métriques ; renvoie un résumé."""
+    start = time.perf_counter()
+    ensure_tables(wh)
+    if full:
+        wh.execute(f"DELETE FROM {TARGET}")
+        wh.execute(f"DELETE FROM {STATE}")
+    days, processed, found = {}, 0, 0
+    for metric in SOURCES:
+        nb_days, nb_values, anomalies = detect(wh, metric, full)
+        days[metric] = nb_days
+        processed += nb_values
+        found += len(anomalies)
+    return {
+        "jours": days,
+        "traitees": processed,
+        "anomalies": found,
+        "total": wh.execute(f"SELECT COUNT(*) FROM {TARGET}")[0][0],
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détection incrémentale d'anomalies (ventes, retours, service client)")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--full", action="store_true", help="efface l'état et rejoue tout l'historique")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        summary = refresh(wh, args.full)
+    jours = ", ".join(f"{metric} : {n} jour(s)" for metric, n in summary["jours"].items())
+    print(f"{TARGET} : {summary['anomalies']} nouvelle(s) anomalie(s) sur {summary['traitees']} valeurs ({jours}), "
+          f"{summary['total']} au total en {summary['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
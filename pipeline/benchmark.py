@@ -0,0 +1,185 @@
+"""Banc d'essai des traitements et des requêtes des dashboards, sur données synthétiques.
+
+Pour chaque volumétrie (nombre de transactions), sur une base DuckDB locale neuve :
+1. génération des fichiers sources (synthetic.py) ;
+2. nettoyage Bronze → Silver, table par table (ingestion.py, mêmes règles que clean_data.sql) ;
+3. construction des tables ANALYTICS lues par les dashboards (cubes journaliers, calendriers,
+   projection des ruptures de stock, caractéristiques client) ;
+4. exécution de chaque requête nommée des dashboards (variables `query_*` de streamlit/*.py),
+   sans filtre de la barre latérale.
+
+Les temps sont écrits en JSON ; `--compare` les confronte à un résultat précédent et
+signale les étapes devenues plus lentes que la tolérance.
+
+Usage :
+    python pipeline/benchmark.py --scales 100000 1000000 10000000 --output bench.json
+    python pipeline/benchmark.py --scales 100000 --compare bench.json
+"""
+import argparse
+import ast
+import json
+import platform
+import shutil
+import statistics
+import string
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import anomalies
+import customer_features
+import forecast
+import ingestion
+import kpi_sketches
+import stockout
+import synthetic
+from local_sql import LOCAL_ANALYTICS
+from tables import TABLES
+from warehouse import ROOT, connect
+
+DASHBOARD_DIR = ROOT / "streamlit"
+DEFAULT_WORKDIR = ROOT / "data" / "bench"
+
+
+def dashboard_queries():
+    """{« dashboard.query_x » : SQL} pour chaque requête nommée des dashboards, sans lancer Streamlit."""
+    queries = {}
+    for path in sorted(DASHBOARD_DIR.glob("*.py")):
+        for node in ast.parse(path.read_text(encoding="utf-8")).body:
+            if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+                continue
+            target = node.targets[0]
+            if (isinstance(target, ast.Name) and target.id.startswith("query")
+                    and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+                queries[f"{path.stem}.{target.id}"] = _without_filters(node.value.value)
+    return queries
+
+
+def _without_filters(template):
+    """Remplace les {emplacements} de filtres (streamlit/filters.py) par TRUE : requête sur toutes les données."""
+    return "".join(literal + ("TRUE" if field is not None else "")
+                   for literal, field, _spec, _conversion in string.Formatter().parse(template))
+
+
+def _timed(fn, repeat=1):
+    """Exécute `fn` `repeat` fois ; renvoie (dernier résultat, liste des durées en secondes)."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def _record(results, scale, kind, name, durations, rows=None, error=None):
+    entry = {
+        "scale": scale,
+        "kind": kind,
+        "name": name,
+        "seconds": round(statistics.median(durations), 4) if durations else None,
+        "min_seconds": round(min(durations), 4) if durations else None,
+        "rows": rows,
+    }
+    if error:
+        entry["error"] = error
+    results.append(entry)
+    label = f"{entry['seconds']} s" if durations else f"ERREUR : {error}"
+    print(f"[{scale:>10}] {kind:<8} {name:<55} {label}")
+
+
+def run_scale(scale, workdir, repeat=3, seed=42):
+    """Mesures complètes pour une volumétrie ; renvoie la liste des résultats."""
+    results = []
+    scale_dir = workdir / f"scale_{scale}"
+    shutil.rmtree(scale_dir, ignore_errors=True)
+    stage_dir = scale_dir / "stage"
+
+    counts, durations = _timed(lambda: synthetic.generate(stage_dir, scale, seed))
+    _record(results, scale, "generate", "fichiers sources", durations, sum(counts.values()))
+
+    # le nom du fichier donne le catalogue ANYCOMPANY_LAB, comme sur Snowflake
+    with connect("duckdb", scale_dir / "anycompany_lab.duckdb") as wh:
+        ingestion.ensure_objects(wh)
+        staged = ingestion.list_staged_files(wh, stage_dir)
+        for table in TABLES:
+            summary, durations = _timed(lambda: ingestion.ingest_table(wh, table, staged))
+            _record(results, scale, "clean", table.silver, durations, summary["rows"] if summary else 0)
+
+        for name, sql in LOCAL_ANALYTICS.items():
+            _, durations = _timed(lambda: wh.execute(sql))
+            rows = wh.execute(f"SELECT COUNT(*) FROM {name}")[0][0]
+            _record(results, scale, "build", name, durations, rows)
+
+        # tables incrémentales : premier calcul complet, puis rafraîchissement sans changement
+        for module in (stockout, customer_features, forecast, anomalies, kpi_sketches):
+            summary, durations = _timed(lambda: module.refresh(wh))
+            _record(results, scale, "build", module.TARGET, durations, summary["total"])
+            summary, durations = _timed(lambda: module.refresh(wh))
+            _record(results, scale, "build", f"{module.TARGET} (incrémental)", durations, summary["total"])
+
+        wh.execute("USE SILVER")
+        for name, sql in dashboard_queries().items():
+            try:
+                rows, durations = _timed(lambda: wh.execute(sql), repeat)
+            except Exception as exc:  # requête propre à Snowflake : on la note sans arrêter le banc
+                _record(results, scale, "query", name, [], error=str(exc).splitlines()[0])
+                continue
+            _record(results, scale, "query", name, durations, len(rows))
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Étapes plus lentes que la référence de plus de `tolerance` (0.2 = +20 %)."""
+    reference = {(r["scale"], r["kind"], r["name"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = reference.get((r["scale"], r["kind"], r["name"]))
+        if before and r["seconds"] is not None and r["seconds"] > before * (1 + tolerance):
+            regressions.append({**r, "baseline_seconds": before, "ratio": round(r["seconds"] / before, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai sur données synthétiques (DuckDB local)")
+    parser.add_argument("--scales", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000],
+                        help="nombres de transactions à générer")
+    parser.add_argument("--repeat", type=int, default=3, help="exécutions par requête (on garde la médiane)")
+    parser.add_argument("--workdir", default=str(DEFAULT_WORKDIR))
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="résultat précédent (JSON) servant de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--keep", action="store_true", help="conserve les fichiers et bases générés")
+    args = parser.parse_args()
+
+    import duckdb
+
+    workdir = Path(args.workdir)
+    results = []
+    for scale in args.scales:
+        results.extend(run_scale(scale, workdir, args.repeat))
+        if not args.keep:
+            shutil.rmtree(workdir / f"scale_{scale}", ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "engine": f"duckdb {duckdb.__version__}",
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "processor": platform.processor()},
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Résultats écrits dans {args.output}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for r in regressions:
+            print(f"RÉGRESSION [{r['scale']}] {r['kind']} {r['name']} : "
+                  f"{r['baseline_seconds']} s → {r['seconds']} s (×{r['ratio']})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
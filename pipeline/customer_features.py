@@ -0,0 +1,196 @@
+"""Customer 360 : caractéristiques client matérialisées une fois, rafraîchies par différence.
+
+Remplace le CREATE OR REPLACE TABLE ANALYTICS.CUSTOMER_360 du notebook et le
+calcul des tranches d'âge à chaque chargement du dashboard Ventes :
+- ANALYTICS.CUSTOMER_FEATURES : une ligne par client (âge, tranche d'âge, tranche
+  de revenu, statut VIP, région...) et l'empreinte de ses entrées. Un
+  rafraîchissement ne réécrit que les clients nouveaux, modifiés ou qui ont
+  changé d'âge ; la table est groupée par customer_id pour les lectures ponctuelles.
+- ANALYTICS.CUSTOMER_SEGMENTS : effectifs et revenus pré-agrégés par segment
+  (région × pays × genre × situation × tranche d'âge × tranche de revenu), lus
+  par le panneau de segmentation. Reconstruite seulement si un client a changé.
+
+Usage :
+    python pipeline/customer_features.py                      # Snowflake
+    python pipeline/customer_features.py --backend duckdb     # base locale (data/)
+    python pipeline/customer_features.py --full               # recalcule tout
+"""
+import argparse
+import time
+
+from tables import sql_type
+from warehouse import connect
+
+TARGET = "ANALYTICS.CUSTOMER_FEATURES"
+SEGMENTS = "ANALYTICS.CUSTOMER_SEGMENTS"
+
+VIP_INCOME = 80000      # seuil « VIP » du notebook (income_group)
+
+COLUMNS = [
+    ("customer_id", "NUMBER"),
+    ("gender", "TEXT"),
+    ("marital_status", "TEXT"),
+    ("region", "TEXT"),
+    ("country", "TEXT"),
+    ("age", "INTEGER"),
+    ("age_group", "TEXT"),
+    ("annual_income", "NUMBER(12,2)"),
+    ("income_band", "TEXT"),
+    ("vip", "BOOLEAN"),
+    ("feature_hash", "TEXT"),
+    ("computed_at", "TIMESTAMP"),
+]
+
+# Caractéristiques de chaque client et empreinte de ses entrées (l'âge en fait partie :
+# un anniversaire ne recalcule que le client concerné)
+FEATURES = f"""
+WITH clients AS (
+    SELECT
+        customer_id,
+        gender,
+        marital_status,
+        region,
+        country,
+        annual_income,
+        CAST(FLOOR(DATEDIFF('day', date_of_birth, CURRENT_DATE) / 365.25) AS INTEGER) AS age
+    FROM SILVER.CUSTOMER_DEMOGRAPHICS_CLEAN
+    WHERE customer_id IS NOT NULL
+),
+caracteristiques AS (
+    SELECT
+        *,
+        CASE
+            WHEN age IS NULL THEN 'Inconnu'
+            WHEN age < 25 THEN 'Under 25'
+            WHEN age BETWEEN 25 AND 34 THEN '25-34'
+            WHEN age BETWEEN 35 AND 44 THEN '35-44'
+            WHEN age BETWEEN 45 AND 54 THEN '45-54'
+            WHEN age BETWEEN 55 AND 64 THEN '55-64'
+            ELSE '65+'
+        END AS age_group,
+        CASE
+            WHEN annual_income IS NULL THEN 'Inconnu'
+            WHEN annual_income < 30000 THEN '< 30k'
+            WHEN annual_income < 50000 THEN '30-50k'
+            WHEN annual_income < {VIP_INCOME} THEN '50-80k'
+            WHEN annual_income < 120000 THEN '80-120k'
+            ELSE '120k+'
+        END AS income_band,
+        COALESCE(annual_income > {VIP_INCOME}, FALSE) AS vip
+    FROM clients
+)
+SELECT
+    *,
+    MD5(CONCAT_WS('|',
+        COALESCE(gender, ''), COALESCE(marital_status, ''), COALESCE(region, ''), COALESCE(country, ''),
+        COALESCE(CAST(annual_income AS VARCHAR), ''), COALESCE(CAST(age AS VARCHAR), '')
+    )) AS feature_hash
+FROM caracteristiques
+"""
+
+# Seuls les clients dont l'empreinte est nouvelle
+CHANGED = f"""
+SELECT f.*
+FROM ({FEATURES}) f
+LEFT JOIN {TARGET} t ON t.customer_id = f.customer_id
+WHERE t.feature_hash IS NULL
+   OR t.feature_hash <> f.feature_hash
+"""
+
+SEGMENTS_SQL = f"""
+CREATE OR REPLACE TABLE {SEGMENTS} AS
+SELECT
+    region,
+    country,
+    gender,
+    marital_status,
+    age_group,
+    income_band,
+    vip,
+    COUNT(*) AS nb_clients,
+    COUNT(annual_income) AS nb_revenus,
+    COALESCE(SUM(annual_income), 0) AS revenu_total
+FROM {TARGET}
+GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+
+def ensure_table(wh):
+    cols = ",\n    ".join(f"{name} {sql_type(type_, wh.dialect)}" for name, type_ in COLUMNS)
+    if wh.dialect == "snowflake":
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {TARGET} (\n    {cols}\n) CLUSTER BY (customer_id)")
+    else:
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {TARGET} (\n    {cols}\n)")
+        wh.execute(f"CREATE INDEX IF NOT EXISTS customer_features_idx ON {TARGET} (customer_id)")
+
+
+def merge_sql():
+    names = [name for name, _type in COLUMNS if name != "computed_at"]
+    update = ", ".join(f"{c} = s.{c}" for c in names if c != "customer_id")
+    return (
+        f"MERGE INTO {TARGET} t\n"
+        f"USING (\n{CHANGED}\n) s\n"
+        f"ON t.customer_id = s.customer_id\n"
+        f"WHEN MATCHED THEN UPDATE SET {update}, computed_at = CURRENT_TIMESTAMP\n"
+        f"WHEN NOT MATCHED THEN INSERT ({', '.join(names)}, computed_at) "
+        f"VALUES ({', '.join(f's.{c}' for c in names)}, CURRENT_TIMESTAMP)"
+    )
+
+
+def _segments_exist(wh):
+    schema, name = SEGMENTS.split(".")
+    return wh.execute(
+        "SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE UPPER(TABLE_SCHEMA) = ? AND UPPER(TABLE_NAME) = ?",
+        [schema, name],
+    )[0][0] > 0
+
+
+def refresh(wh, full=False):
+    """Met à jour les caractéristiques puis, si besoin, les segments ; renvoie un résumé."""
+    start = time.perf_counter()
+    ensure_table(wh)
+    wh.execute("BEGIN")
+    try:
+        if full:
+            wh.execute(f"DELETE FROM {TARGET}")
+        # MERGE renvoie (insérées, mises à jour) sur Snowflake, un total sur DuckDB
+        merged = wh.execute(merge_sql())
+        deleted = wh.execute(f"""
+            DELETE FROM {TARGET} t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM SILVER.CUSTOMER_DEMOGRAPHICS_CLEAN c WHERE c.customer_id = t.customer_id
+            )
+        """)
+        wh.execute("COMMIT")
+    except Exception:
+        wh.execute("ROLLBACK")
+        raise
+
+    changed = sum(merged[0]) if merged else 0
+    removed = deleted[0][0] if deleted else 0
+    if changed or removed or not _segments_exist(wh):
+        wh.execute(SEGMENTS_SQL)
+    return {
+        "recalcules": changed,
+        "supprimes": removed,
+        "total": wh.execute(f"SELECT COUNT(*) FROM {TARGET}")[0][0],
+        "segments": wh.execute(f"SELECT COUNT(*) FROM {SEGMENTS}")[0][0],
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer 360 : caractéristiques client (incrémental)")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--full", action="store_true", help="recalcule tous les clients")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        summary = refresh(wh, args.full)
+    print(f"{TARGET} : {summary['recalcules']} client(s) recalculé(s), {summary['supprimes']} supprimé(s), "
+          f"{summary['total']} au total ; {SEGMENTS} : {summary['segments']} segments "
+          f"en {summary['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Prévisions mensuelles du CA par région, toutes les séries ajustées en un seul lot.
+
+Chaque série (une par région, plus l'ensemble des régions) est le CA mensuel
+des ventes, lu dans ANALYTICS.DAILY_SALES_CUBE (agrégat de
+SILVER.FINANCIAL_TRANSACTIONS_CLEAN) ; le mois en cours, incomplet, est écarté.
+Les séries sont rangées dans une matrice (séries × mois) et chaque modèle est
+calculé pour toutes à la fois, en NumPy :
+- « naif_saisonnier » : le même mois de l'année précédente ;
+- « lissage » : lissage exponentiel simple, alpha choisi par série sur une grille
+  (erreur de prévision à un pas) ;
+- « tendance » : droite des moindres carrés sur tout l'historique.
+
+Backtest : chaque modèle est ajusté sans les BACKTEST derniers mois, puis comparé
+à ces mois (MAE, MAPE, RMSE). Le modèle de plus faible MAE est retenu pour la
+série, réajusté sur tout l'historique, et ses HORIZON prochains mois sont écrits
+dans ANALYTICS.SALES_FORECAST (avec une fourchette ± 1,96 × RMSE du backtest).
+Le modèle retenu, ses paramètres et ses erreurs sont gardés dans
+ANALYTICS.FORECAST_MODELS avec l'empreinte de la série : un rafraîchissement ne
+réajuste que les séries qui ont reçu de nouveaux mois (ou des corrections).
+
+Les ventes ne portent pas de catégorie produit : les séries région × catégorie ne
+sont pas disponibles.
+
+Usage :
+    python pipeline/forecast.py                      # Snowflake
+    python pipeline/forecast.py --backend duckdb     # base locale (data/)
+    python pipeline/forecast.py --full               # réajuste toutes les séries
+"""
+import argparse
+import hashlib
+import json
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from tables import sql_type
+from warehouse import connect
+
+TARGET = "ANALYTICS.SALES_FORECAST"
+MODELS = "ANALYTICS.FORECAST_MODELS"
+
+HORIZON = 6             # mois prévus
+BACKTEST = 6            # mois mis de côté pour comparer les modèles
+SEASON = 12
+ALPHAS = np.round(np.arange(0.05, 1.0, 0.05), 2)
+ALL_REGIONS = "TOUTES RÉGIONS"
+
+FORECAST_COLUMNS = [
+    ("region_key", "TEXT"),
+    ("mois", "DATE"),
+    ("horizon", "INTEGER"),
+    ("modele", "TEXT"),
+    ("prevision", "FLOAT"),
+    ("prevision_basse", "FLOAT"),
+    ("prevision_haute", "FLOAT"),
+    ("computed_at", "TIMESTAMP"),
+]
+
+MODEL_COLUMNS = [
+    ("region_key", "TEXT"),
+    ("modele", "TEXT"),
+    ("parametres", "TEXT"),         # JSON
+    ("backtest", "TEXT"),           # JSON : MAE de chaque modèle
+    ("mae", "FLOAT"),
+    ("mape_pct", "FLOAT"),
+    ("rmse", "FLOAT"),
+    ("nb_mois", "INTEGER"),
+    ("dernier_mois", "DATE"),
+    ("series_hash", "TEXT"),
+    ("fitted_at", "TIMESTAMP"),
+]
+
+MONTHLY = """
+SELECT UPPER(TRIM(region)) AS region_key, DATE_TRUNC('MONTH', jour) AS mois, SUM(montant_total) AS montant
+FROM ANALYTICS.DAILY_SALES_CUBE
+WHERE transaction_type = 'Sale'
+  AND region IS NOT NULL
+  AND jour IS NOT NULL
+GROUP BY 1, 2
+"""
+
+
+# ---------------------------------------------------------
+# Séries
+# ---------------------------------------------------------
+def monthly_series(wh):
+    """Matrice (séries × mois) du CA des mois complets ; NaN avant le premier mois d'une série."""
+    df = wh.query_df(MONTHLY)
+    if not df.empty:
+        df["MOIS"] = pd.to_datetime(df["MOIS"]).dt.to_period("M")
+        df["MONTANT"] = df["MONTANT"].astype(np.float64)
+        last_day = pd.Timestamp(wh.execute(
+            "SELECT MAX(jour) FROM ANALYTICS.DAILY_SALES_CUBE WHERE transaction_type = 'Sale'")[0][0])
+        if not last_day.is_month_end:
+            df = df[df["MOIS"] < last_day.to_period("M")]
+    if df.empty:
+        return pd.DataFrame()
+
+    matrix = df.pivot_table(index="REGION_KEY", columns="MOIS", values="MONTANT", aggfunc="sum")
+    matrix.loc[ALL_REGIONS] = matrix.sum(axis=0, min_count=1)
+    matrix = matrix.reindex(columns=pd.period_range(df["MOIS"].min(), df["MOIS"].max(), freq="M"))
+    # mois sans vente après le début d'une série : 0, pas une valeur manquante
+    started = matrix.notna().cumsum(axis=1) > 0
+    return matrix.where(~started, matrix.fillna(0))
+
+
+def series_hash(row):
+    values = ";".join(f"{month}={value:.2f}" for month, value in row.dropna().items())
+    return hashlib.md5(values.encode()).hexdigest()
+
+
+# ---------------------------------------------------------
+# Modèles (toutes les séries à la fois)
+# ---------------------------------------------------------
+def _last_valid(y):
+    idx = np.where(~np.isnan(y), np.arange(y.shape[1]), -1).max(axis=1)
+    return np.where(idx >= 0, y[np.arange(len(y)), np.maximum(idx, 0)], np.nan)
+
+
+def seasonal_naive(y, horizon):
+    n, t = y.shape
+    steps = np.arange(horizon)
+    cols = t - SEASON + steps % SEASON
+    forecast = np.full((n, horizon), np.nan)
+    if t >= SEASON:
+        forecast = y[:, cols]
+    # moins d'un an d'historique : dernière valeur connue
+    forecast = np.where(np.isnan(forecast), _last_valid(y)[:, None], forecast)
+    return forecast, {}
+
+
+def exponential_smoothing(y, horizon):
+    n, t = y.shape
+    level = np.full((len(ALPHAS), n), np.nan)
+    sse = np.zeros((len(ALPHAS), n))
+    alphas = ALPHAS[:, None]
+    for j in range(t):
+        value = y[:, j][None, :]
+        known = ~np.isnan(value)
+        error = np.where(known & ~np.isnan(level), value - level, 0.0)
+        sse += error ** 2
+        level = np.where(np.isnan(level), value, level + alphas * error)
+    best = np.argmin(sse, axis=0)
+    final = level[best, np.arange(n)]
+    return np.repeat(final[:, None], horizon, axis=1), {"alpha": ALPHAS[best]}
+
+
+def linear_trend(y, horizon):
+    n, t = y.shape
+    known = ~np.isnan(y)
+    x = np.arange(t, dtype=np.float64)[None, :]
+    values = np.where(known, y, 0.0)
+    sw = known.sum(axis=1)
+    sx = (known * x).sum(axis=1)
+    sy = values.sum(axis=1)
+    sxx = (known * x ** 2).sum(axis=1)
+    sxy = (values * x).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominator = sw * sxx - sx ** 2
+        slope = np.where(denominator > 0, (sw * sxy - sx * sy) / denominator, 0.0)
+        intercept = (sy - slope * sx) / sw
+    future = np.arange(t, t + horizon, dtype=np.float64)[None, :]
+    return intercept[:, None] + slope[:, None] * future, {"pente": slope, "origine": intercept}
+
+
+FORECASTERS = {
+    "naif_saisonnier": seasonal_naive,
+    "lissage": exponential_smoothing,
+    "tendance": linear_trend,
+}
+
+
+def backtest(y, months=BACKTEST):
+    """Erreurs de chaque modèle sur les `months` derniers mois : {modèle: (mae, mape, rmse)} par série."""
+    train, actual = y[:, :-months], y[:, -months:]
+    errors = {}
+    for name, forecaster in FORECASTERS.items():
+        forecast, _params = forecaster(train, months)
+        diff = np.abs(forecast - actual)
+        # série sans valeur sur la période de test : erreurs NaN (sans avertissement « Mean of empty slice »)
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mae = np.nanmean(diff, axis=1)
+            mape = np.nanmean(np.where(actual != 0, diff / np.abs(actual), np.nan), axis=1) * 100
+            rmse = np.sqrt(np.nanmean(diff ** 2, axis=1))
+        errors[name] = (mae, mape, rmse)
+    return errors
+
+
+def fit(matrix, horizon=HORIZON):
+    """Prévisions et modèles retenus pour toutes les séries de `matrix` (DataFrame séries × mois)."""
+    y = matrix.to_numpy(dtype=np.float64)
+    n = len(y)
+    names = list(FORECASTERS)
+    history = (~np.isnan(y)).sum(axis=1)
+
+    errors = backtest(y) if y.shape[1] > BACKTEST else {}
+    if errors:
+        mae = np.vstack([errors[name][0] for name in names])
+        # trop peu de mois d'apprentissage pour juger : lissage par défaut
+        usable = (history > BACKTEST + 2)[None, :] & ~np.isnan(mae)
+        best = np.argmin(np.where(usable, mae, np.inf), axis=0)
+        best = np.where(usable.any(axis=0), best, names.index("lissage"))
+    else:
+        best = np.full(n, names.index("lissage"))
+
+    fitted = {name: forecaster(y, horizon) for name, forecaster in FORECASTERS.items()}
+    rows = np.arange(n)
+    forecast = np.stack([fitted[name][0] for name in names])[best, rows]
+    forecast = np.maximum(forecast, 0)
+
+    def chosen(i, k):
+        return float(errors[names[best[i]]][k][i]) if errors else np.nan
+
+    models = []
+    for i, key in enumerate(matrix.index):
+        params = {p: float(v[i]) for p, v in fitted[names[best[i]]][1].items()}
+        scores = {name: round(float(errors[name][0][i]), 2) for name in names} if errors else {}
+        models.append({
+            "region_key": key,
+            "modele": names[best[i]],
+            "parametres": json.dumps(params),
+            "backtest": json.dumps({k: (None if np.isnan(v) else v) for k, v in scores.items()}),
+            "mae": chosen(i, 0),
+            "mape_pct": chosen(i, 1),
+            "rmse": chosen(i, 2),
+            "nb_mois": int(history[i]),
+        })
+    return forecast, pd.DataFrame(models)
+
+
+# ---------------------------------------------------------
+# Tables
+# ---------------------------------------------------------
+def ensure_tables(wh):
+    for table, columns in ((TARGET, FORECAST_COLUMNS), (MODELS, MODEL_COLUMNS)):
+        cols = ",\n    ".join(f"{name} {sql_type(type_, wh.dialect)}" for name, type_ in columns)
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    {cols}\n)")
+
+
+def _float(value):
+    """Flottant Python pour la liaison de paramètres ; NaN → NULL."""
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def refresh(wh, full=False):
+    """Réajuste les séries nouvelles ou modifiées ; renvoie un résumé."""
+    start = time.perf_counter()
+    ensure_tables(wh)
+    matrix = monthly_series(wh)
+    hashes = {key: series_hash(row) for key, row in matrix.iterrows()}
+    known = {} if full else dict(wh.execute(f"SELECT region_key, series_hash FROM {MODELS}"))
+    changed = [key for key, h in hashes.items() if known.get(key) != h]
+    removed = [key for key in known if key not in hashes]
+
+    forecasts, models = [], []
+    if changed:
+        subset = matrix.loc[changed]
+        forecast, fitted = fit(subset)
+        last = subset.columns[-1]
+        months = [(last + h).to_timestamp().date() for h in range(1, HORIZON + 1)]
+        for i, model in fitted.iterrows():
+            spread = 1.96 * model["rmse"]       # NaN sans backtest : pas de fourchette
+            for h, month in enumerate(months):
+                value = forecast[i, h]
+                forecasts.append((model["region_key"], month, h + 1, model["modele"], _float(value),
+                                  _float(np.maximum(value - spread, 0.0)), _float(value + spread)))
+            models.append((model["region_key"], model["modele"], model["parametres"], model["backtest"],
+                           _float(model["mae"]), _float(model["mape_pct"]), _float(model["rmse"]),
+                           int(model["nb_mois"]), last.to_timestamp().date(), hashes[model["region_key"]]))
+
+    stale = changed + removed
+    wh.execute("BEGIN")
+    try:
+        if full:
+            wh.execute(f"DELETE FROM {TARGET}")
+            wh.execute(f"DELETE FROM {MODELS}")
+        elif stale:
+            marks = ", ".join("?" * len(stale))
+            wh.execute(f"DELETE FROM {TARGET} WHERE region_key IN ({marks})", stale)
+            wh.execute(f"DELETE FROM {MODELS} WHERE region_key IN ({marks})", stale)
+        wh.executemany(f"INSERT INTO {TARGET} VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", forecasts)
+        wh.executemany(f"INSERT INTO {MODELS} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", models)
+        wh.execute("COMMIT")
+    except Exception:
+        wh.execute("ROLLBACK")
+        raise
+
+    return {
+        "recalculees": len(changed),
+        "supprimees": len(removed),
+        "total": len(hashes),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prévisions mensuelles du CA par région (incrémental)")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--full", action="store_true", help="réajuste toutes les séries")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        summary = refresh(wh, args.full)
+    print(f"{TARGET} : {summary['recalculees']} série(s) réajustée(s), {summary['supprimees']} supprimée(s), "
+          f"{summary['total']} au total en {summary['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Chargement incrémental Bronze → Silver.
+
+Remplace la reconstruction complète de load_data.sql + clean_data.sql par un
+traitement du seul delta :
+1. on liste les fichiers du stage et on écarte ceux déjà chargés (table
+   BRONZE.INGESTION_STATE : nom du fichier, empreinte, lignes, date max) ;
+2. les nouveaux fichiers sont copiés dans une table delta temporaire, puis ajoutés
+   à la table Bronze ;
+3. le delta est typé, nettoyé et dédoublonné avec les règles de clean_data.sql
+   (voir tables.py), puis fusionné (MERGE) dans la table Silver.
+
+Avec --validated, les fichiers ont déjà été typés par validate.py : le delta est lu
+dans leurs Parquet (colonnes Silver), sans passer par Bronze, et seuls le filtre des
+colonnes obligatoires et le dédoublonnage restent à faire avant le MERGE.
+
+Usage :
+    python pipeline/ingestion.py                      # toutes les tables, sur Snowflake
+    python pipeline/ingestion.py --backend duckdb     # base locale (data/)
+    python pipeline/ingestion.py --tables FINANCIAL_TRANSACTIONS_CLEAN
+    python pipeline/ingestion.py --status             # high-water marks actuels
+    python pipeline/ingestion.py --backend duckdb --validated data/validated
+"""
+import argparse
+import os
+import re
+import time
+
+from tables import STAGE, TABLES, bronze_ddl, column_expr, get_table, merge_sql, silver_ddl, sql_string
+from validate import output_path
+from warehouse import connect, local_config
+
+STATE_TABLE = "BRONZE.INGESTION_STATE"
+VALIDATED_STAGE = "@BRONZE.VALIDATED_STAGE"     # stage interne des Parquet de validate.py (Snowflake)
+
+# Formats de fichier créés dans load_data.sql
+FILE_FORMATS = {"CSV_COMMA": "BRONZE.CSV_COMMA", "CSV_SPACE": "BRONZE.CSV_SPACE", "JSON": "BRONZE.JSON"}
+
+# Séparateur qui n'apparaît jamais dans les avis : une ligne = une valeur (FIELD_DELIMITER = NONE)
+_NO_DELIMITER = "\x1f"
+
+
+def ensure_objects(wh):
+    """Crée si besoin la table d'état et les tables Bronze / Silver (utile sur une base locale vide)."""
+    wh.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name VARCHAR,
+            file_name VARCHAR,
+            fingerprint VARCHAR,
+            rows_loaded BIGINT,
+            max_date DATE,
+            loaded_at TIMESTAMP
+        )
+    """)
+    if wh.dialect == "snowflake":
+        wh.execute(f"CREATE STAGE IF NOT EXISTS {VALIDATED_STAGE[1:]}")
+    for table in TABLES:
+        wh.execute(bronze_ddl(table, wh.dialect))
+        wh.execute(silver_ddl(table, wh.dialect))
+
+
+def list_staged_files(wh, stage_dir=None):
+    """[(nom, empreinte, chemin)] des fichiers disponibles dans le stage (ou dans `stage_dir`, en local)."""
+    if wh.dialect == "snowflake":
+        # LIST renvoie name, size, md5, last_modified
+        return [(name.rsplit("/", 1)[-1], md5, name) for name, _size, md5, _modified in wh.execute(f"LIST {STAGE}")]
+
+    stage_dir = stage_dir or local_config()["stage_dir"]
+    files = []
+    for entry in sorted(os.scandir(stage_dir), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((entry.name, f"{stat.st_size}:{int(stat.st_mtime)}", entry.path))
+    return files
+
+
+def loaded_files(wh, table):
+    rows = wh.execute(f"SELECT file_name, fingerprint FROM {STATE_TABLE} WHERE table_name = ?", [table.silver])
+    return set(rows)
+
+
+def pending_files(wh, table, staged):
+    """Fichiers du stage destinés à `table` et jamais chargés (ou modifiés depuis)."""
+    done = loaded_files(wh, table)
+    return [f for f in staged if re.fullmatch(table.file_pattern, f[0]) and (f[0], f[1]) not in done]
+
+
+def _delta_name(wh, table):
+    short = table.bronze.split(".")[1]
+    # DuckDB range les tables temporaires dans un catalogue à part, sans schéma
+    return f"BRONZE.{short}_DELTA" if wh.dialect == "snowflake" else f"{short}_DELTA"
+
+
+def load_delta(wh, table, files):
+    """Copie les fichiers dans une table delta temporaire ; renvoie {fichier: lignes chargées}."""
+    delta = _delta_name(wh, table)
+    if wh.dialect == "snowflake":
+        wh.execute(f"CREATE OR REPLACE TEMPORARY TABLE {delta} LIKE {table.bronze}")
+        names = ", ".join(sql_string(name, wh.dialect) for name, _fp, _path in files)
+        on_error = "\nON_ERROR = 'CONTINUE'" if table.on_error_continue else ""
+        result = wh.execute(f"""
+            COPY INTO {delta}
+            FROM {STAGE}
+            FILES = ({names})
+            FILE_FORMAT = (FORMAT_NAME = '{FILE_FORMATS[table.file_format]}'){on_error}
+        """)
+        # COPY renvoie une ligne par fichier : file, status, rows_parsed, rows_loaded, ...
+        return delta, {row[0].rsplit("/", 1)[-1]: row[3] for row in result if len(row) > 3}
+
+    wh.execute(f"CREATE OR REPLACE TEMP TABLE {delta} AS SELECT * FROM {table.bronze} LIMIT 0")
+    counts = {}
+    for name, _fp, path in files:
+        path = sql_string(str(path), wh.dialect)
+        if table.file_format == "JSON":
+            source = f"SELECT json FROM read_json_objects({path}, format = 'array')"
+        elif table.file_format == "CSV_SPACE":
+            source = (f"SELECT * FROM read_csv({path}, header = false, delim = '{_NO_DELIMITER}', "
+                      f"quote = '', escape = '', columns = {{'raw_line': 'VARCHAR'}})")
+        else:
+            source = (f"SELECT * FROM read_csv({path}, header = true, all_varchar = true, quote = '\"', "
+                      f"null_padding = true, ignore_errors = true, nullstr = ['NULL', 'null', ''])")
+        counts[name] = wh.execute(f"INSERT INTO {delta} {source}")[0][0]
+    return delta, counts
+
+
+def load_validated(wh, table, files, validated_dir):
+    """Copie les Parquet typés de validate.py dans une table delta temporaire (colonnes Silver)."""
+    parquets = {name: output_path(validated_dir, table, name) for name, _fp, _path in files}
+    missing = [name for name, path in parquets.items() if not path.exists()]
+    if missing:
+        raise FileNotFoundError(f"Fichiers non validés (lancer pipeline/validate.py) : {', '.join(missing)}")
+
+    delta = _delta_name(wh, table)
+    columns = ", ".join(table.column_names)
+    if wh.dialect == "snowflake":
+        folder = f"{VALIDATED_STAGE}/{table.silver.split('.')[1]}"
+        for path in parquets.values():
+            wh.execute(f"PUT 'file://{path.as_posix()}' {folder} AUTO_COMPRESS = FALSE OVERWRITE = TRUE")
+        wh.execute(f"CREATE OR REPLACE TEMPORARY TABLE {delta} LIKE {table.silver}")
+        names = ", ".join(sql_string(path.name, wh.dialect) for path in parquets.values())
+        result = wh.execute(f"""
+            COPY INTO {delta}
+            FROM {folder}
+            FILES = ({names})
+            FILE_FORMAT = (TYPE = PARQUET)
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+        """)
+        loaded = {row[0].rsplit("/", 1)[-1]: row[3] for row in result if len(row) > 3}
+        return delta, {name: loaded.get(path.name, 0) for name, path in parquets.items()}
+
+    wh.execute(f"CREATE OR REPLACE TEMP TABLE {delta} AS SELECT * FROM {table.silver} LIMIT 0")
+    counts = {}
+    for name, path in parquets.items():
+        source = f"SELECT {columns} FROM read_parquet({sql_string(str(path), wh.dialect)})"
+        counts[name] = wh.execute(f"INSERT INTO {delta} ({columns}) {source}")[0][0]
+    return delta, counts
+
+
+def ingest_table(wh, table, staged, validated_dir=None):
+    """Charge les nouveaux fichiers de `table` ; renvoie un résumé (ou None si rien à faire).
+
+    Avec `validated_dir`, le delta vient des Parquet typés de validate.py et Bronze n'est pas alimentée.
+    """
+    files = pending_files(wh, table, staged)
+    if not files:
+        return None
+
+    start = time.perf_counter()
+    typed = validated_dir is not None
+    if typed:
+        delta, counts = load_validated(wh, table, files, validated_dir)
+    else:
+        delta, counts = load_delta(wh, table, files)
+
+    date_col = next((c for c in table.columns if c.name == table.date_column), None)
+    if date_col is None:
+        max_date_expr = "NULL"
+    else:
+        max_date_expr = f"MAX({date_col.name if typed else column_expr(table, date_col, wh.dialect)})"
+    nb_rows, max_date = wh.execute(f"SELECT COUNT(*), {max_date_expr} FROM {delta}")[0]
+
+    # Bronze garde l'historique brut, Silver reçoit le delta nettoyé ; l'état n'est
+    # enregistré que si tout est passé, pour qu'un fichier en échec soit repris au prochain run.
+    wh.execute("BEGIN")
+    try:
+        if not typed:
+            wh.execute(f"INSERT INTO {table.bronze} SELECT * FROM {delta}")
+        merged = wh.execute(merge_sql(table, delta, wh.dialect, typed))
+        for name, fingerprint, _path in files:
+            wh.execute(
+                f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                [table.silver, name, fingerprint, counts.get(name, 0), max_date],
+            )
+        wh.execute("COMMIT")
+    except Exception:
+        wh.execute("ROLLBACK")
+        raise
+    wh.execute(f"DROP TABLE IF EXISTS {delta}")
+
+    return {
+        "table": table.silver,
+        "files": [name for name, _fp, _path in files],
+        "rows": nb_rows,
+        "merged": list(merged[0]) if merged else None,
+        "max_date": max_date,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def high_water_marks(wh):
+    """Dernier état connu par table : nombre de fichiers, lignes chargées, date max."""
+    return wh.query_df(f"""
+        SELECT
+            table_name,
+            COUNT(*) AS nb_fichiers,
+            SUM(rows_loaded) AS lignes_chargees,
+            MAX(max_date) AS date_max,
+            MAX(loaded_at) AS dernier_chargement
+        FROM {STATE_TABLE}
+        GROUP BY table_name
+        ORDER BY table_name
+    """)
+
+
+def run(wh, table_names=None, validated_dir=None):
+    ensure_objects(wh)
+    tables = [get_table(name) for name in table_names] if table_names else TABLES
+    staged = list_staged_files(wh)
+    results = []
+    for table in tables:
+        summary = ingest_table(wh, table, staged, validated_dir)
+        if summary is None:
+            print(f"{table.silver} : à jour")
+            continue
+        print(f"{table.silver} : {len(summary['files'])} fichier(s), {summary['rows']} lignes "
+              f"en {summary['seconds']} s (date max : {summary['max_date']})")
+        results.append(summary)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement incrémental Bronze → Silver")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--tables", nargs="*", help="tables à traiter (par défaut : toutes)")
+    parser.add_argument("--status", action="store_true", help="affiche les high-water marks et s'arrête")
+    parser.add_argument("--validated", default=None,
+                        help="dossier des Parquet typés par validate.py (charge Silver sans passer par Bronze)")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        if args.status:
+            ensure_objects(wh)
+            print(high_water_marks(wh).to_string(index=False))
+        else:
+            run(wh, args.tables, args.validated)
+
+
+if __name__ == "__main__":
+    main()
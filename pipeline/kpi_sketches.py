@@ -0,0 +1,245 @@
+"""Résumés fusionnables et échantillons stratifiés pour le mode approché des dashboards.
+
+Les panneaux globaux de la page Marketing agrègent des tables SILVER entières
+(avis produits, interactions du service client, transactions). En mode approché,
+ils lisent à la place :
+
+- ANALYTICS.KPI_SKETCHES : une ligne par strate (source × région × mois) avec le
+  nombre de lignes, le nombre de valeurs renseignées, leur somme et leur somme
+  des carrés (montant, note), le nombre de lignes « cibles » (demandes résolues)
+  et un HyperLogLog des identifiants (2^11 registres, écart-type relatif ≈ 2,3 %).
+  Comptages et sommes s'additionnent, les registres se fusionnent par maximum :
+  n'importe quel ensemble de mois et de régions se calcule sans relire SILVER ;
+- ANALYTICS.KPI_SAMPLE : jusqu'à TAILLE_ECHANTILLON lignes par strate, tirées au
+  hasard (les plus petites valeurs d'un hachage de l'identifiant : le tirage est
+  reproductible). Il sert aux mois coupés par la période choisie, que les résumés
+  mensuels ne savent pas découper.
+
+Les sources sans région (avis, service client) ont une seule strate par mois
+(region_key = ''). Un mois n'est recalculé que si l'une de ses strates a changé
+dans SILVER (nombre de lignes, somme ou nombre de cibles différents des résumés
+gardés) ; ses registres et son échantillon sont alors reconstruits.
+
+Usage :
+    python pipeline/kpi_sketches.py                      # Snowflake
+    python pipeline/kpi_sketches.py --backend duckdb     # base locale (data/)
+    python pipeline/kpi_sketches.py --full               # recalcule tous les mois
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from tables import sql_type
+from warehouse import connect
+
+TARGET = "ANALYTICS.KPI_SKETCHES"
+SAMPLE = "ANALYTICS.KPI_SAMPLE"
+
+PRECISION = 11                      # 2^11 registres HyperLogLog par strate
+REGISTRES = 1 << PRECISION
+TAILLE_ECHANTILLON = 500            # lignes gardées par strate
+
+# hachage 63 bits positif de l'identifiant : les 11 bits de poids faible donnent le
+# registre, les 31 bits de poids fort le rang du premier bit à 1
+HASH = {"snowflake": "ABS(HASH({}))", "duckdb": "(HASH({}) >> 1)"}
+LOG2 = {"snowflake": "LOG(2, {})", "duckdb": "LOG2({})"}
+
+# source → table SILVER, colonnes (date, région, identifiant, valeur, condition « cible ») et filtre
+SOURCES = {
+    "ventes": dict(table="SILVER.FINANCIAL_TRANSACTIONS_CLEAN", date="transaction_date", region="region",
+                   ident="transaction_id", valeur="amount", cible=None, where="transaction_type = 'Sale'"),
+    "avis": dict(table="SILVER.PRODUCT_REVIEWS_CLEAN", date="review_date", region=None,
+                 ident="review_id", valeur="rating", cible=None, where=None),
+    "service": dict(table="SILVER.CUSTOMER_SERVICE_INTERACTIONS_CLEAN", date="interaction_date", region=None,
+                    ident="interaction_id", valeur=None, cible="resolution_status = 'Resolved'", where=None),
+}
+
+SKETCH_COLUMNS = [
+    ("source", "TEXT"),
+    ("region_key", "TEXT"),         # '' pour les sources sans région et les lignes sans région
+    ("mois", "DATE"),
+    ("nb", "INTEGER"),
+    ("nb_valeurs", "INTEGER"),
+    ("somme", "FLOAT"),
+    ("somme_carres", "FLOAT"),
+    ("nb_cible", "INTEGER"),
+    ("registres", "TEXT"),          # REGISTRES octets en hexadécimal
+    ("updated_at", "TIMESTAMP"),
+]
+
+SAMPLE_COLUMNS = [
+    ("source", "TEXT"),
+    ("region_key", "TEXT"),
+    ("mois", "DATE"),
+    ("jour", "DATE"),
+    ("valeur", "FLOAT"),
+    ("cible", "INTEGER"),
+]
+
+
+def ensure_tables(wh):
+    for table, columns in ((TARGET, SKETCH_COLUMNS), (SAMPLE, SAMPLE_COLUMNS)):
+        cols = ",\n    ".join(f"{name} {sql_type(type_, wh.dialect)}" for name, type_ in columns)
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    {cols}\n)")
+
+
+def _rows(source, dialect):
+    """Lignes de la source ramenées à (region_key, mois, jour, valeur, cible, h)."""
+    spec = SOURCES[source]
+    region = f"COALESCE(UPPER(TRIM({spec['region']})), '')" if spec["region"] else "''"
+    valeur = f"CAST({spec['valeur']} AS DOUBLE)" if spec["valeur"] else "CAST(NULL AS DOUBLE)"
+    cible = f"CASE WHEN {spec['cible']} THEN 1 ELSE 0 END" if spec["cible"] else "0"
+    where = f" AND {spec['where']}" if spec["where"] else ""
+    ident = spec["ident"]
+    return f"""
+        SELECT
+            {region} AS region_key,
+            CAST(DATE_TRUNC('MONTH', {spec['date']}) AS DATE) AS mois,
+            {spec['date']} AS jour,
+            {valeur} AS valeur,
+            {cible} AS cible,
+            CASE WHEN {ident} IS NOT NULL THEN {HASH[dialect].format(ident)} END AS h
+        FROM {spec['table']}
+        WHERE {spec['date']} IS NOT NULL{where}
+    """
+
+
+def _months_clause(months):
+    if months is None:
+        return "TRUE", []
+    return f"mois IN ({', '.join('?' * len(months))})", list(months)
+
+
+def summaries(wh, source):
+    """Comptages et sommes de chaque strate, lus dans SILVER (un seul GROUP BY)."""
+    df = wh.query_df(f"""
+        SELECT
+            region_key,
+            mois,
+            COUNT(*) AS nb,
+            COUNT(valeur) AS nb_valeurs,
+            SUM(valeur) AS somme,
+            SUM(valeur * valeur) AS somme_carres,
+            SUM(cible) AS nb_cible
+        FROM ({_rows(source, wh.dialect)}) r
+        GROUP BY 1, 2
+    """)
+    df["MOIS"] = pd.to_datetime(df["MOIS"])
+    for column in ("SOMME", "SOMME_CARRES"):
+        df[column] = df[column].astype(np.float64).fillna(0.0)
+    df["NB_CIBLE"] = df["NB_CIBLE"].fillna(0).astype(np.int64)
+    return df
+
+
+def registers(wh, source, months=None):
+    """Registres HyperLogLog de chaque strate des mois donnés : {(region_key, mois): hexadécimal}."""
+    clause, params = _months_clause(months)
+    v = "FLOOR(h / 4294967296)"
+    df = wh.query_df(f"""
+        SELECT
+            region_key,
+            mois,
+            h % {REGISTRES} AS registre,
+            MAX(CASE WHEN h < 4294967296 THEN 32 ELSE 31 - FLOOR({LOG2[wh.dialect].format(v)}) END) AS rang
+        FROM ({_rows(source, wh.dialect)}) r
+        WHERE h IS NOT NULL AND {clause}
+        GROUP BY 1, 2, 3
+    """, params)
+    df["MOIS"] = pd.to_datetime(df["MOIS"])
+    packed = {}
+    for key, group in df.groupby(["REGION_KEY", "MOIS"], sort=False):
+        values = np.zeros(REGISTRES, dtype=np.uint8)
+        values[group["REGISTRE"].to_numpy(dtype=np.int64)] = group["RANG"].to_numpy(dtype=np.int64)
+        packed[key] = values.tobytes().hex()
+    return packed
+
+
+def changed_months(current, stored):
+    """Mois dont au moins une strate est apparue, a disparu ou a changé."""
+    keys = ["REGION_KEY", "MOIS"]
+    both = current.merge(stored, on=keys, how="outer", suffixes=("", "_GARDE"), indicator=True)
+    differs = (
+        (both["_merge"] != "both")
+        | (both["NB"] != both["NB_GARDE"])
+        | (both["NB_CIBLE"] != both["NB_CIBLE_GARDE"])
+        | ~np.isclose(both["SOMME"].astype(np.float64), both["SOMME_GARDE"].astype(np.float64), rtol=1e-9)
+    )
+    return sorted(set(both.loc[differs, "MOIS"]))
+
+
+def refresh_source(wh, source, full=False):
+    """Recalcule les mois modifiés d'une source ; renvoie (strates recalculées, strates supprimées)."""
+    current = summaries(wh, source)
+    stored = wh.query_df(f"SELECT region_key, mois, nb, somme, nb_cible FROM {TARGET} WHERE source = ?", [source])
+    stored["MOIS"] = pd.to_datetime(stored["MOIS"])
+    months = sorted(set(current["MOIS"]) | set(stored["MOIS"])) if full else changed_months(current, stored)
+    if not months:
+        return 0, 0
+
+    month_dates = [m.date() for m in months]
+    packed = registers(wh, source, None if full else month_dates)
+    todo = current[current["MOIS"].isin(months)]
+    rows = [
+        (source, r.REGION_KEY, r.MOIS.date(), int(r.NB), int(r.NB_VALEURS), float(r.SOMME), float(r.SOMME_CARRES),
+         int(r.NB_CIBLE), packed.get((r.REGION_KEY, r.MOIS), bytes(REGISTRES).hex()))
+        for r in todo.itertuples(index=False)
+    ]
+    removed = int(stored["MOIS"].isin(months).sum()) - int(todo.merge(stored, on=["REGION_KEY", "MOIS"]).shape[0])
+
+    clause, params = _months_clause(month_dates)
+    wh.execute("BEGIN")
+    try:
+        wh.execute(f"DELETE FROM {TARGET} WHERE source = ? AND {clause}", [source] + params)
+        wh.execute(f"DELETE FROM {SAMPLE} WHERE source = ? AND {clause}", [source] + params)
+        wh.executemany(f"INSERT INTO {TARGET} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", rows)
+        # échantillon : les TAILLE_ECHANTILLON plus petits hachages de chaque strate, sans quitter le warehouse
+        wh.execute(f"""
+            INSERT INTO {SAMPLE}
+            SELECT ?, region_key, mois, jour, valeur, cible
+            FROM (
+                SELECT r.*, ROW_NUMBER() OVER (PARTITION BY region_key, mois ORDER BY h NULLS LAST) AS rang
+                FROM ({_rows(source, wh.dialect)}) r
+                WHERE {clause}
+            ) s
+            WHERE rang <= {TAILLE_ECHANTILLON}
+        """, [source] + params)
+        wh.execute("COMMIT")
+    except Exception:
+        wh.execute("ROLLBACK")
+        raise
+    return len(rows), max(removed, 0)
+
+
+def refresh(wh, full=False):
+    """Met à jour résumés, registres et échantillons des mois modifiés, pour toutes les sources."""
+    start = time.perf_counter()
+    ensure_tables(wh)
+    recalcules = supprimes = 0
+    for source in SOURCES:
+        done, removed = refresh_source(wh, source, full)
+        recalcules += done
+        supprimes += removed
+    return {
+        "recalcules": recalcules,
+        "supprimes": supprimes,
+        "total": wh.execute(f"SELECT COUNT(*) FROM {TARGET}")[0][0],
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résumés, HyperLogLog et échantillons stratifiés des KPI globaux")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--full", action="store_true", help="recalcule tous les mois")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        summary = refresh(wh, args.full)
+    print(f"{TARGET} : {summary['recalcules']} strate(s) recalculée(s), {summary['supprimes']} supprimée(s), "
+          f"{summary['total']} au total en {summary['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Équivalents DuckDB des tables ANALYTICS construites par les scripts sql/*.sql.
+
+sql/sales_cube.sql, sql/logistics_cube.sql et sql/promo_calendar.sql utilisent du
+SQL propre à Snowflake (MERGE incrémental, tables de dates). En local, chaque table
+est reconstruite en entier par l'instruction ci-dessous ; le runner (base locale) et
+le banc d'essai s'en servent tous deux.
+"""
+
+LOCAL_ANALYTICS = {
+    "ANALYTICS.DAILY_SALES_CUBE": """
+        CREATE OR REPLACE TABLE ANALYTICS.DAILY_SALES_CUBE AS
+        SELECT
+            transaction_date AS jour,
+            region,
+            transaction_type,
+            COUNT(*) AS nb_transactions,
+            COUNT(amount) AS nb_montants,
+            COALESCE(SUM(amount), 0) AS montant_total,
+            CURRENT_TIMESTAMP AS updated_at
+        FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+        WHERE transaction_date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """,
+    "ANALYTICS.LOGISTICS_DAILY": """
+        CREATE OR REPLACE TABLE ANALYTICS.LOGISTICS_DAILY AS
+        SELECT
+            ship_date,
+            destination_region,
+            shipping_method,
+            DATEDIFF('day', ship_date, estimated_delivery) AS delivery_days,
+            COUNT(*) AS nb_expeditions,
+            COUNT(CASE WHEN status = 'Returned' THEN 1 END) AS nb_retours,
+            COUNT(shipping_cost) AS nb_couts,
+            COALESCE(SUM(shipping_cost), 0) AS cout_total,
+            CURRENT_TIMESTAMP AS updated_at
+        FROM SILVER.LOGISTICS_AND_SHIPPING_CLEAN
+        WHERE ship_date IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """,
+    "ANALYTICS.PROMO_CALENDAR": """
+        CREATE OR REPLACE TABLE ANALYTICS.PROMO_CALENDAR AS
+        SELECT
+            UPPER(TRIM(region)) AS region_key,
+            CAST(UNNEST(generate_series(start_date, end_date, INTERVAL 1 DAY)) AS DATE) AS jour,
+            promotion_id,
+            product_category,
+            promotion_type,
+            discount_percentage
+        FROM SILVER.PROMOTIONS_DATA_CLEAN
+        WHERE start_date IS NOT NULL
+          AND end_date >= start_date
+    """,
+    "ANALYTICS.CAMPAIGN_CALENDAR": """
+        CREATE OR REPLACE TABLE ANALYTICS.CAMPAIGN_CALENDAR AS
+        SELECT
+            UPPER(TRIM(region)) AS region_key,
+            CAST(UNNEST(generate_series(start_date, end_date, INTERVAL 1 DAY)) AS DATE) AS jour,
+            campaign_id,
+            campaign_type,
+            product_category,
+            budget,
+            conversion_rate
+        FROM SILVER.MARKETING_CAMPAIGNS_CLEAN
+        WHERE start_date IS NOT NULL
+          AND end_date >= start_date
+    """,
+}
+
+# Équivalents DuckDB des data products du notebook ml/data_product_and_sentiment_analysis.ipynb
+# (TO_DATE, DATEDIFF(day, ...) n'existent pas en DuckDB) ; sur Snowflake, le runner exécute le SQL du notebook
+LOCAL_DATA_PRODUCTS = {
+    "ANALYTICS.SALES_HISTORY": """
+        CREATE OR REPLACE TABLE ANALYTICS.SALES_HISTORY AS
+        SELECT
+            *,
+            YEAR(transaction_date) AS annee_vente,
+            MONTH(transaction_date) AS mois_vente,
+            DAYNAME(transaction_date) AS jour_semaine,
+            CASE
+                WHEN amount > 100 THEN 'Panier Élevé'
+                WHEN amount < 20 THEN 'Petit Panier'
+                ELSE 'Moyen'
+            END AS categorie_panier
+        FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+    """,
+    "ANALYTICS.MARKETING_INITIATIVES": """
+        CREATE OR REPLACE TABLE ANALYTICS.MARKETING_INITIATIVES AS
+        SELECT
+            *,
+            DATEDIFF('day', start_date, end_date) AS duree_jours
+        FROM SILVER.MARKETING_CAMPAIGNS_CLEAN
+    """,
+}
@@ -0,0 +1,410 @@
+"""Exécution du pipeline complet sous forme de graphe d'étapes (DAG).
+
+Chaque étape déclare les tables qu'elle lit et celles qu'elle écrit ; les
+dépendances s'en déduisent (une étape attend celles qui produisent ses entrées) :
+- Bronze → Silver : une étape par table de tables.py (ingestion.ingest_table) ;
+  les 11 nettoyages sont indépendants et tournent en parallèle ;
+- tables ANALYTICS des scripts sql/*.sql (cubes, calendriers) : chaque script est
+  découpé en instructions, regroupées par table écrite ; les tables lues sont
+  relevées dans les FROM / JOIN. En local (DuckDB), les équivalents de
+  local_sql.LOCAL_ANALYTICS remplacent le SQL propre à Snowflake ;
+- data products du notebook ml/data_product_and_sentiment_analysis.ipynb
+  (SALES_HISTORY, MARKETING_INITIATIVES) : leurs CREATE TABLE sont relus dans les
+  cellules du notebook (local_sql.LOCAL_DATA_PRODUCTS en local) ; tables
+  incrémentales Python (stockout.py, customer_features.py, qui remplace CUSTOMER_360,
+  forecast.py, anomalies.py, kpi_sketches.py).
+
+Hors graphe : le scoring de sentiment des avis (ml/sentiment.py, refresh_sentiment →
+ANALYTICS.REVIEW_SENTIMENT_SCORES, lue par la vue ANALYTICS.PRODUCT_SENTIMENT). Il
+passe par un moteur SQLAlchemy, VADER et un MERGE propre à Snowflake, que le runner
+n'utilise pas : il se lance depuis le notebook après le chargement des avis, sans quoi
+les scores des nouveaux avis restent absents de la vue.
+
+Une étape n'est relancée que si l'une de ses entrées a changé depuis son dernier
+succès (ou si elle n'a jamais réussi) ; les étapes d'ingestion tournent toujours,
+elles ne chargent que les nouveaux fichiers. Durée et statut de chaque étape sont
+enregistrés dans BRONZE.PIPELINE_STATE.
+
+Usage :
+    python pipeline/runner.py                        # Snowflake
+    python pipeline/runner.py --backend duckdb       # base locale (data/)
+    python pipeline/runner.py --plan                 # affiche le graphe sans rien exécuter
+    python pipeline/runner.py --force --workers 8
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import anomalies
+import customer_features
+import forecast
+import ingestion
+import kpi_sketches
+import stockout
+from local_sql import LOCAL_ANALYTICS, LOCAL_DATA_PRODUCTS
+from tables import TABLES
+from warehouse import ROOT, connect
+
+SQL_DIR = ROOT / "sql"
+SQL_SCRIPTS = ["sales_cube.sql", "logistics_cube.sql", "promo_calendar.sql"]
+STATE_TABLE = "BRONZE.PIPELINE_STATE"
+
+# Notebook de la phase 3 : ses CREATE TABLE ANALYTICS.* sont relus à chaque construction
+# du graphe (les data products ne sont pas recopiés ici)
+NOTEBOOK = ROOT / "ml" / "data_product_and_sentiment_analysis.ipynb"
+NOTEBOOK_EXCLUDED = {"ANALYTICS.CUSTOMER_360"}      # remplacée par customer_features.py
+
+_TABLE = r"((?:ANYCOMPANY_LAB\.)?(?:BRONZE|SILVER|ANALYTICS)\.\w+)"
+_WRITES = re.compile(
+    r"^\s*(?:CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"|MERGE\s+INTO\s+|INSERT\s+(?:OVERWRITE\s+)?INTO\s+|DELETE\s+FROM\s+|UPDATE\s+)" + _TABLE,
+    re.IGNORECASE,
+)
+_READS = re.compile(r"\b(?:FROM|JOIN)\s+" + _TABLE, re.IGNORECASE)
+_PY_STRING = re.compile(r'("""|\'\'\')(.*?)\1', re.DOTALL)
+
+
+@dataclass
+class Stage:
+    name: str
+    kind: str                       # ingestion | sql | data_product | python
+    inputs: frozenset
+    outputs: frozenset
+    run: object                     # fonction(wh) → True si les sorties ont changé
+    always: bool = False            # relancée à chaque exécution (l'étape détecte elle-même le travail à faire)
+    upstream: set = field(default_factory=set)
+
+
+def _table_name(name):
+    name = name.upper()
+    return name.split(".", 1)[1] if name.startswith("ANYCOMPANY_LAB.") else name
+
+
+def split_statements(script):
+    """Instructions d'un script SQL, sans commentaires « -- » (les « ; » entre quotes sont respectés)."""
+    statements, current, quoted = [], [], False
+    for line in script.splitlines():
+        out = []
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            if ch == "'":
+                quoted = not quoted
+            elif not quoted and line.startswith("--", i):
+                break
+            elif not quoted and ch == ";":
+                current.append("".join(out))
+                statements.append("\n".join(current).strip())
+                current, out = [], []
+                i += 1
+                continue
+            out.append(ch)
+            i += 1
+        current.append("".join(out))
+    statements.append("\n".join(current).strip())
+    return [s for s in statements if s]
+
+
+def notebook_data_products(path=NOTEBOOK):
+    """{table: CREATE TABLE} des data products du notebook (chaînes SQL de ses cellules de code).
+
+    Seules les tables du schéma ANALYTICS sont retenues, hors NOTEBOOK_EXCLUDED ;
+    les cellules contiennent des commandes magiques (%sql) : elles ne sont pas
+    analysées comme du Python, on y relève les chaînes entre triples guillemets.
+    """
+    products = {}
+    for cell in json.loads(Path(path).read_text(encoding="utf-8"))["cells"]:
+        if cell["cell_type"] != "code":
+            continue
+        for _quote, text in _PY_STRING.findall("".join(cell["source"])):
+            match = _WRITES.match(text)
+            if not match:
+                continue
+            target = _table_name(match.group(1))
+            if target.startswith("ANALYTICS.") and target not in NOTEBOOK_EXCLUDED:
+                products[target] = text.strip()
+    return products
+
+
+def sql_stages(path, dialect):
+    """Étapes d'un script : les instructions qui écrivent une même table forment une étape.
+
+    Les instructions sans table écrite (USE, requêtes de vérification) sont ignorées.
+    """
+    groups = {}
+    for statement in split_statements(Path(path).read_text(encoding="utf-8")):
+        match = _WRITES.match(statement)
+        if not match:
+            continue
+        target = _table_name(match.group(1))
+        groups.setdefault(target, []).append(statement)
+
+    stages = []
+    for target, statements in groups.items():
+        reads = {_table_name(t) for s in statements for t in _READS.findall(s)} - {target}
+        if dialect != "snowflake":
+            if target not in LOCAL_ANALYTICS:
+                continue
+            statements = [LOCAL_ANALYTICS[target]]
+        stages.append(Stage(
+            name=target, kind="sql", inputs=frozenset(reads), outputs=frozenset([target]),
+            run=_run_statements(statements),
+        ))
+    return stages
+
+
+def _run_statements(statements):
+    def run(wh):
+        for statement in statements:
+            wh.execute(statement)
+        return True
+    return run
+
+
+def _ingest(table, staged):
+    def run(wh):
+        return ingestion.ingest_table(wh, table, staged) is not None
+    return run
+
+
+def _refresh(module):
+    def run(wh):
+        summary = module.refresh(wh)
+        return any(summary.get(k) for k in ("recalculees", "supprimees", "recalcules", "supprimes", "traitees"))
+    return run
+
+
+def build_stages(wh, staged):
+    """Toutes les étapes du pipeline, dépendances résolues."""
+    stages = [
+        Stage(
+            name=table.silver, kind="ingestion", inputs=frozenset(),
+            outputs=frozenset([table.bronze, table.silver]), run=_ingest(table, staged), always=True,
+        )
+        for table in TABLES
+    ]
+    for script in SQL_SCRIPTS:
+        stages += sql_stages(SQL_DIR / script, wh.dialect)
+    for target, sql in notebook_data_products().items():
+        reads = frozenset(_table_name(t) for t in _READS.findall(sql))
+        if wh.dialect != "snowflake":
+            if target not in LOCAL_DATA_PRODUCTS:
+                continue
+            sql = LOCAL_DATA_PRODUCTS[target]
+        stages.append(Stage(
+            name=target, kind="data_product", inputs=reads, outputs=frozenset([target]), run=_run_statements([sql]),
+        ))
+    stages.append(Stage(
+        name=stockout.TARGET, kind="python",
+        inputs=frozenset(["SILVER.INVENTORY_CLEAN", "SILVER.SUPPLIER_INFORMATION_CLEAN", "ANALYTICS.DAILY_SALES_CUBE"]),
+        outputs=frozenset([stockout.TARGET]), run=_refresh(stockout),
+    ))
+    stages.append(Stage(
+        name=customer_features.TARGET, kind="python",
+        inputs=frozenset(["SILVER.CUSTOMER_DEMOGRAPHICS_CLEAN"]),
+        outputs=frozenset([customer_features.TARGET, customer_features.SEGMENTS]), run=_refresh(customer_features),
+    ))
+    stages.append(Stage(
+        name=forecast.TARGET, kind="python",
+        inputs=frozenset(["ANALYTICS.DAILY_SALES_CUBE"]),
+        outputs=frozenset([forecast.TARGET, forecast.MODELS]), run=_refresh(forecast),
+    ))
+    stages.append(Stage(
+        name=anomalies.TARGET, kind="python",
+        inputs=frozenset(["ANALYTICS.DAILY_SALES_CUBE", "ANALYTICS.LOGISTICS_DAILY",
+                          "SILVER.CUSTOMER_SERVICE_INTERACTIONS_CLEAN"]),
+        outputs=frozenset([anomalies.TARGET, anomalies.STATE]), run=_refresh(anomalies),
+    ))
+    stages.append(Stage(
+        name=kpi_sketches.TARGET, kind="python",
+        inputs=frozenset(spec["table"] for spec in kpi_sketches.SOURCES.values()),
+        outputs=frozenset([kpi_sketches.TARGET, kpi_sketches.SAMPLE]), run=_refresh(kpi_sketches),
+    ))
+
+    producers = {out: s.name for s in stages for out in s.outputs}
+    for stage in stages:
+        stage.upstream = {producers[t] for t in stage.inputs if t in producers and producers[t] != stage.name}
+    return {s.name: s for s in stages}
+
+
+def ensure_state(wh):
+    wh.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            stage VARCHAR,
+            status VARCHAR,
+            changed BOOLEAN,
+            seconds DOUBLE,
+            finished_at TIMESTAMP
+        )
+    """)
+
+
+def last_state(wh):
+    """{étape: (dernier succès, dernier changement des sorties)}."""
+    rows = wh.execute(f"""
+        SELECT
+            stage,
+            MAX(CASE WHEN status = 'ok' THEN finished_at END),
+            MAX(CASE WHEN status = 'ok' AND changed THEN finished_at END)
+        FROM {STATE_TABLE}
+        GROUP BY stage
+    """)
+    return {stage: (success, changed) for stage, success, changed in rows}
+
+
+class _Connections:
+    """Une connexion par thread : DuckDB partage une base ouverte une fois, Snowflake ouvre une session par worker."""
+
+    def __init__(self, wh, backend):
+        self.wh = wh
+        self.backend = backend
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        conn = getattr(self._local, "wh", None)
+        if conn is None:
+            conn = type(self.wh)(self.wh.conn.cursor(), "duckdb") if self.backend == "duckdb" else connect(self.backend)
+            self._local.wh = conn
+            with self._lock:
+                self._opened.append(conn)
+        return conn
+
+    def close(self):
+        for conn in self._opened:
+            conn.close()
+
+
+def _needs_run(stage, state, changed_now, force):
+    if force or stage.always:
+        return True
+    success, _changed = state.get(stage.name, (None, None))
+    if success is None:
+        return True
+    for name in stage.upstream:
+        if name in changed_now:
+            return True
+        upstream_change = state.get(name, (None, None))[1]
+        if upstream_change is not None and upstream_change > success:
+            return True
+    return False
+
+
+def run(wh, backend, workers=4, force=False, only=None, stage_dir=None):
+    """Exécute le graphe ; renvoie la liste des résultats par étape et la durée totale."""
+    ingestion.ensure_objects(wh)
+    ensure_state(wh)
+    stages = build_stages(wh, ingestion.list_staged_files(wh, stage_dir))
+    if only:
+        wanted = {name.upper() for name in only}
+        stages = {name: s for name, s in stages.items() if name in wanted}
+        for stage in stages.values():
+            stage.upstream &= stages.keys()
+    state = last_state(wh)
+
+    results, changed_now, done = {}, set(), set()
+    pending = dict(stages)
+    running = {}
+    connections = _Connections(wh, backend)
+
+    def execute(stage):
+        started = time.perf_counter()
+        changed = stage.run(connections.get())
+        return changed, time.perf_counter() - started
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if not stage.upstream <= done:
+                        continue
+                    del pending[name]
+                    failed = [u for u in stage.upstream if results[u]["status"] in ("erreur", "bloquee")]
+                    if failed:
+                        results[name] = {"stage": name, "status": "bloquee", "seconds": 0.0, "cause": failed[0]}
+                        done.add(name)
+                    elif not _needs_run(stage, state, changed_now, force):
+                        results[name] = {"stage": name, "status": "inchangee", "seconds": 0.0}
+                        done.add(name)
+                    else:
+                        running[pool.submit(execute, stage)] = stage
+                if not running:
+                    if pending and not any(s.upstream <= done for s in pending.values()):
+                        raise ValueError("Dépendance circulaire entre : " + ", ".join(sorted(pending)))
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        changed, seconds = future.result()
+                    except Exception as exc:
+                        results[stage.name] = {"stage": stage.name, "status": "erreur", "seconds": None,
+                                               "error": str(exc).splitlines()[0]}
+                        changed = False
+                    else:
+                        results[stage.name] = {"stage": stage.name, "status": "ok", "changed": bool(changed),
+                                               "seconds": round(seconds, 2)}
+                        if changed:
+                            changed_now.add(stage.name)
+                    wh.execute(f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?)",
+                               [stage.name, results[stage.name]["status"], bool(changed),
+                                results[stage.name]["seconds"], datetime.now()])
+                    done.add(stage.name)
+    finally:
+        connections.close()
+    return [results[name] for name in stages if name in results], round(time.perf_counter() - start, 2)
+
+
+def plan(stages):
+    """Étapes par niveau : toutes celles d'un même niveau peuvent tourner en parallèle."""
+    levels, placed = [], set()
+    while len(placed) < len(stages):
+        level = sorted(n for n, s in stages.items() if n not in placed and s.upstream <= placed)
+        if not level:
+            raise ValueError("Dépendance circulaire entre : " + ", ".join(sorted(set(stages) - placed)))
+        levels.append(level)
+        placed.update(level)
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline complet Bronze → Silver → Analytics (DAG)")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--workers", type=int, default=4, help="étapes exécutées en même temps")
+    parser.add_argument("--stages", nargs="*", help="étapes à exécuter (par défaut : toutes)")
+    parser.add_argument("--force", action="store_true", help="relance les étapes même sans changement en entrée")
+    parser.add_argument("--plan", action="store_true", help="affiche le graphe et s'arrête")
+    parser.add_argument("--output", help="écrit les durées par étape en JSON")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        if args.plan:
+            stages = build_stages(wh, [])
+            for i, level in enumerate(plan(stages), 1):
+                print(f"Niveau {i} :")
+                for name in level:
+                    after = ", ".join(sorted(stages[name].upstream)) or "-"
+                    print(f"    {name:<45} [{stages[name].kind}] après : {after}")
+            return
+        results, wall = run(wh, args.backend, args.workers, args.force, args.stages)
+
+    for r in results:
+        detail = r.get("error") or r.get("cause") or ("modifiée" if r.get("changed") else "")
+        seconds = f"{r['seconds']} s" if r["seconds"] is not None else "-"
+        print(f"{r['stage']:<45} {r['status']:<10} {seconds:>10}  {detail}")
+    busy = sum(r["seconds"] or 0 for r in results)
+    print(f"Durée totale : {wall} s (somme des étapes : {round(busy, 2)} s)")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"wall_seconds": wall, "stages": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
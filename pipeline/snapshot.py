@@ -0,0 +1,119 @@
+"""Export des tables lues par les dashboards vers des fichiers Parquet locaux.
+
+Le snapshot permet de lancer les dashboards sans Snowflake (mode démo, tests,
+travail hors ligne) : streamlit/db.py les relit avec DuckDB quand
+`backend = "duckdb"`. Les grosses tables sont partitionnées par année
+(dossiers annee_partition=AAAA) pour que DuckDB ne lise que les années utiles.
+
+Usage :
+    python pipeline/snapshot.py                     # depuis Snowflake
+    python pipeline/snapshot.py --backend duckdb    # depuis la base locale (pipeline/ingestion.py)
+"""
+import argparse
+import json
+import shutil
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from warehouse import ROOT, connect, load_config
+
+# Table → colonne date servant à partitionner (None : un seul fichier)
+SNAPSHOT_TABLES = {
+    "SILVER.FINANCIAL_TRANSACTIONS_CLEAN": "transaction_date",
+    "SILVER.PROMOTIONS_DATA_CLEAN": None,
+    "SILVER.MARKETING_CAMPAIGNS_CLEAN": None,
+    "SILVER.INVENTORY_CLEAN": None,
+    "SILVER.LOGISTICS_AND_SHIPPING_CLEAN": "ship_date",
+    "SILVER.CUSTOMER_DEMOGRAPHICS_CLEAN": None,
+    "SILVER.CUSTOMER_SERVICE_INTERACTIONS_CLEAN": "interaction_date",
+    "SILVER.PRODUCT_REVIEWS_CLEAN": None,
+    "ANALYTICS.DAILY_SALES_CUBE": "jour",
+    "ANALYTICS.LOGISTICS_DAILY": "ship_date",
+    "ANALYTICS.PROMO_CALENDAR": "jour",
+    "ANALYTICS.CAMPAIGN_CALENDAR": "jour",
+    "ANALYTICS.STOCKOUT_PROJECTION": None,
+    "ANALYTICS.CUSTOMER_FEATURES": None,
+    "ANALYTICS.CUSTOMER_SEGMENTS": None,
+    "ANALYTICS.SALES_FORECAST": None,
+    "ANALYTICS.FORECAST_MODELS": None,
+    "ANALYTICS.ANOMALIES": "jour",
+    "ANALYTICS.KPI_SKETCHES": None,
+    "ANALYTICS.KPI_SAMPLE": None,
+}
+
+PARTITION_COLUMN = "ANNEE_PARTITION"
+MANIFEST = "_snapshot.json"
+
+
+def snapshot_dir():
+    return ROOT / load_config("app").get("snapshot_dir", "data/snapshot")
+
+
+def _normalize(table):
+    """Uniformise les types d'un lot Arrow (Snowflake varie la largeur des entiers d'un lot à l'autre)."""
+    fields = []
+    for f in table.schema:
+        type_ = pa.int64() if pa.types.is_integer(f.type) else f.type
+        fields.append(pa.field(f.name.upper(), type_))
+    return table.rename_columns([f.name for f in fields]).cast(pa.schema(fields))
+
+
+def export_table(wh, table, date_column, root):
+    """Écrit `table` sous root/SCHEMA/TABLE/ ; renvoie le nombre de lignes exportées."""
+    schema, name = table.split(".")
+    target = root / schema / name
+    shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True)
+
+    partition = f", YEAR({date_column}) AS {PARTITION_COLUMN}" if date_column else ""
+    sql = f"SELECT *{partition} FROM {table}"
+
+    if wh.dialect == "duckdb":
+        options = f"FORMAT PARQUET, PARTITION_BY ({PARTITION_COLUMN})" if date_column else "FORMAT PARQUET"
+        path = target if date_column else target / "data.parquet"
+        wh.execute(f"COPY ({sql}) TO '{path}' ({options})")
+        return wh.execute(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    rows = 0
+    writer = None
+    try:
+        for i, batch in enumerate(wh.arrow_batches(sql)):
+            batch = _normalize(batch)
+            rows += batch.num_rows
+            if date_column:
+                pq.write_to_dataset(batch, target, partition_cols=[PARTITION_COLUMN],
+                                    basename_template=f"part-{i}-{{i}}.parquet")
+            else:
+                if writer is None:
+                    writer = pq.ParquetWriter(target / "data.parquet", batch.schema)
+                writer.write_table(batch.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_snapshot(wh, tables=None):
+    root = snapshot_dir()
+    counts = {}
+    for table in tables or SNAPSHOT_TABLES:
+        counts[table] = export_table(wh, table, SNAPSHOT_TABLES.get(table), root)
+        print(f"{table} : {counts[table]} lignes")
+    manifest = {"created_at": datetime.now().isoformat(timespec="seconds"), "source": wh.dialect, "tables": counts}
+    (root / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot Parquet des tables des dashboards")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--tables", nargs="*", help="tables à exporter (par défaut : toutes)")
+    args = parser.parse_args()
+    with connect(args.backend) as wh:
+        export_snapshot(wh, [t.upper() for t in args.tables] if args.tables else None)
+
+
+if __name__ == "__main__":
+    main()
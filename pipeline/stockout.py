@@ -0,0 +1,225 @@
+"""Projection des ruptures de stock par produit × entrepôt.
+
+Pour chaque ligne de SILVER.INVENTORY_CLEAN :
+- demande journalière = reorder_point / lead_time de l'inventaire (le point de
+  commande couvre la demande pendant le délai de réassort), corrigée par la
+  tendance récente des ventes de la région (28 derniers jours / moyenne sur un an,
+  cube ANALYTICS.DAILY_SALES_CUBE) ;
+- jours avant rupture = current_stock / demande journalière ;
+- délai fournisseur = lead_time moyen de SUPPLIER_INFORMATION_CLEAN pour la
+  catégorie et la région (à défaut : la catégorie, puis le délai de l'inventaire).
+
+Statut : « Rupture » (stock nul), « Critique » (la rupture arrive avant qu'un
+réassort lancé aujourd'hui ne soit livré), « À commander » (sous le point de
+commande), « OK ».
+
+Le résultat est gardé dans ANALYTICS.STOCKOUT_PROJECTION, groupée par catégorie et
+entrepôt (CLUSTER BY sur Snowflake, index sur DuckDB). Chaque ligne garde
+l'empreinte de ses entrées : un rafraîchissement ne réécrit que les produits dont
+le stock, les paramètres de réassort, le délai fournisseur ou la tendance des
+ventes ont changé.
+
+Usage :
+    python pipeline/stockout.py                      # Snowflake
+    python pipeline/stockout.py --backend duckdb     # base locale (data/)
+    python pipeline/stockout.py --full               # recalcule tout
+"""
+import argparse
+import time
+
+from tables import sql_type
+from warehouse import connect
+
+TARGET = "ANALYTICS.STOCKOUT_PROJECTION"
+
+TREND_DAYS = 28          # fenêtre « ventes récentes »
+HISTORY_DAYS = 365       # fenêtre de référence de la tendance
+
+COLUMNS = [
+    ("product_id", "TEXT"),
+    ("warehouse", "TEXT"),
+    ("product_category", "TEXT"),
+    ("region", "TEXT"),
+    ("current_stock", "INTEGER"),
+    ("reorder_point", "INTEGER"),
+    ("sales_index", "NUMBER(8,2)"),
+    ("daily_demand", "FLOAT"),
+    ("supplier_lead_time", "FLOAT"),
+    ("days_until_stockout", "FLOAT"),
+    ("risk_status", "TEXT"),
+    ("input_hash", "TEXT"),
+    ("computed_at", "TIMESTAMP"),
+]
+
+# Entrées de la projection et leur empreinte (une ligne par produit × entrepôt)
+INPUTS = f"""
+WITH fournisseurs AS (
+    SELECT UPPER(TRIM(region)) AS region_key, product_category, AVG(lead_time) AS lead_time
+    FROM SILVER.SUPPLIER_INFORMATION_CLEAN
+    WHERE lead_time IS NOT NULL
+    GROUP BY 1, 2
+),
+fournisseurs_categorie AS (
+    SELECT product_category, AVG(lead_time) AS lead_time
+    FROM SILVER.SUPPLIER_INFORMATION_CLEAN
+    WHERE lead_time IS NOT NULL
+    GROUP BY 1
+),
+reference AS (
+    SELECT MAX(jour) AS jour
+    FROM ANALYTICS.DAILY_SALES_CUBE
+    WHERE transaction_type = 'Sale'
+),
+tendance AS (
+    -- arrondie au centième : une petite variation des ventes ne relance pas tout le calcul
+    SELECT
+        UPPER(TRIM(c.region)) AS region_key,
+        ROUND(
+            (SUM(CASE WHEN c.jour > r.jour - {TREND_DAYS} THEN c.montant_total ELSE 0 END) / {TREND_DAYS})
+            / NULLIF(SUM(c.montant_total) / {HISTORY_DAYS}, 0),
+        2) AS sales_index
+    FROM ANALYTICS.DAILY_SALES_CUBE c
+    CROSS JOIN reference r
+    WHERE c.transaction_type = 'Sale'
+      AND c.jour > r.jour - {HISTORY_DAYS}
+    GROUP BY 1
+),
+entrees AS (
+    SELECT
+        i.product_id,
+        i.warehouse,
+        i.product_category,
+        i.region,
+        i.current_stock,
+        i.reorder_point,
+        i.lead_time,
+        COALESCE(f.lead_time, fc.lead_time, i.lead_time) AS supplier_lead_time,
+        COALESCE(t.sales_index, 1) AS sales_index
+    FROM SILVER.INVENTORY_CLEAN i
+    LEFT JOIN fournisseurs f
+        ON f.region_key = UPPER(TRIM(i.region))
+        AND f.product_category = i.product_category
+    LEFT JOIN fournisseurs_categorie fc ON fc.product_category = i.product_category
+    LEFT JOIN tendance t ON t.region_key = UPPER(TRIM(i.region))
+    WHERE i.product_id IS NOT NULL
+      AND i.warehouse IS NOT NULL
+)
+SELECT
+    *,
+    MD5(CONCAT_WS('|',
+        COALESCE(product_category, ''), COALESCE(region, ''),
+        COALESCE(CAST(current_stock AS VARCHAR), ''), COALESCE(CAST(reorder_point AS VARCHAR), ''),
+        COALESCE(CAST(lead_time AS VARCHAR), ''), COALESCE(CAST(ROUND(supplier_lead_time, 2) AS VARCHAR), ''),
+        CAST(sales_index AS VARCHAR)
+    )) AS input_hash
+FROM entrees
+"""
+
+# Projection des seules lignes dont l'empreinte est nouvelle
+CHANGED = f"""
+WITH entrees AS ({INPUTS}),
+a_calculer AS (
+    SELECT e.*
+    FROM entrees e
+    LEFT JOIN {TARGET} p
+        ON p.product_id = e.product_id
+        AND p.warehouse = e.warehouse
+    WHERE p.input_hash IS NULL
+       OR p.input_hash <> e.input_hash
+),
+demande AS (
+    SELECT
+        *,
+        reorder_point / NULLIF(lead_time, 0) * sales_index AS daily_demand
+    FROM a_calculer
+),
+projection AS (
+    SELECT
+        *,
+        CASE
+            WHEN current_stock <= 0 THEN 0
+            ELSE current_stock / NULLIF(daily_demand, 0)
+        END AS days_until_stockout
+    FROM demande
+)
+SELECT
+    product_id, warehouse, product_category, region, current_stock, reorder_point, sales_index,
+    daily_demand, supplier_lead_time, days_until_stockout,
+    CASE
+        WHEN current_stock <= 0 THEN 'Rupture'
+        WHEN days_until_stockout <= supplier_lead_time THEN 'Critique'
+        WHEN current_stock <= reorder_point THEN 'À commander'
+        ELSE 'OK'
+    END AS risk_status,
+    input_hash
+FROM projection
+"""
+
+
+def ensure_table(wh):
+    cols = ",\n    ".join(f"{name} {sql_type(type_, wh.dialect)}" for name, type_ in COLUMNS)
+    if wh.dialect == "snowflake":
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {TARGET} (\n    {cols}\n) CLUSTER BY (product_category, warehouse)")
+    else:
+        wh.execute(f"CREATE TABLE IF NOT EXISTS {TARGET} (\n    {cols}\n)")
+        wh.execute(f"CREATE INDEX IF NOT EXISTS stockout_projection_idx ON {TARGET} (product_category, warehouse)")
+
+
+def merge_sql():
+    names = [name for name, _type in COLUMNS if name != "computed_at"]
+    update = ", ".join(f"{c} = s.{c}" for c in names if c not in ("product_id", "warehouse"))
+    return (
+        f"MERGE INTO {TARGET} t\n"
+        f"USING (\n{CHANGED}\n) s\n"
+        f"ON t.product_id = s.product_id AND t.warehouse = s.warehouse\n"
+        f"WHEN MATCHED THEN UPDATE SET {update}, computed_at = CURRENT_TIMESTAMP\n"
+        f"WHEN NOT MATCHED THEN INSERT ({', '.join(names)}, computed_at) "
+        f"VALUES ({', '.join(f's.{c}' for c in names)}, CURRENT_TIMESTAMP)"
+    )
+
+
+def refresh(wh, full=False):
+    """Met à jour la projection ; renvoie un résumé (lignes recalculées, supprimées, durée)."""
+    start = time.perf_counter()
+    ensure_table(wh)
+    wh.execute("BEGIN")
+    try:
+        if full:
+            wh.execute(f"DELETE FROM {TARGET}")
+        # MERGE renvoie (insérées, mises à jour) sur Snowflake, un total sur DuckDB
+        merged = wh.execute(merge_sql())
+        # produits / entrepôts disparus de l'inventaire
+        deleted = wh.execute(f"""
+            DELETE FROM {TARGET} p
+            WHERE NOT EXISTS (
+                SELECT 1 FROM SILVER.INVENTORY_CLEAN i
+                WHERE i.product_id = p.product_id AND i.warehouse = p.warehouse
+            )
+        """)
+        wh.execute("COMMIT")
+    except Exception:
+        wh.execute("ROLLBACK")
+        raise
+    total = wh.execute(f"SELECT COUNT(*) FROM {TARGET}")[0][0]
+    return {
+        "recalculees": sum(merged[0]) if merged else 0,
+        "supprimees": deleted[0][0] if deleted else 0,
+        "total": total,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Projection des ruptures de stock (incrémentale)")
+    parser.add_argument("--backend", choices=["snowflake", "duckdb"], default="snowflake")
+    parser.add_argument("--full", action="store_true", help="recalcule toutes les lignes")
+    args = parser.parse_args()
+
+    with connect(args.backend) as wh:
+        summary = refresh(wh, args.full)
+    print(f"{TARGET} : {summary['recalculees']} ligne(s) recalculée(s), {summary['supprimees']} supprimée(s), "
+          f"{summary['total']} au total en {summary['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
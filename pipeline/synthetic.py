@@ -0,0 +1,326 @@
+"""Génération de fichiers sources synthétiques, au format des tables Bronze.
+
+Produit dans un dossier « stage » les 11 fichiers attendus par load_data.sql /
+pipeline/ingestion.py (mêmes colonnes que les specs de tables.py), à une
+volumétrie choisie : `n_transactions` fixe la taille de FINANCIAL_TRANSACTIONS,
+les autres tables suivent en proportion. Les données reproduisent les défauts
+des vrais fichiers que le nettoyage doit absorber :
+- montants mal formatés (« $1,234.56 », « 1234.56 USD », « N/A », vides) ;
+- identifiants en double (dédoublonnage de clean_data.sql) ;
+- régions en casse et espaces variables ;
+- promotions et campagnes dont les périodes se chevauchent dans une même région.
+
+Usage :
+    python pipeline/synthetic.py --transactions 1000000 --output data/stage
+"""
+import argparse
+import json
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tables import get_table
+
+CHUNK_ROWS = 1_000_000
+START = np.datetime64(date(2015, 1, 1))
+NB_DAYS = 10 * 365
+
+REGIONS = ["North America", "Europe", "Asia", "Latin America", "Africa", "Middle East", "Oceania"]
+COUNTRIES = ["USA", "France", "Germany", "Japan", "Brazil", "Nigeria", "UAE", "Australia"]
+CATEGORIES = ["Beverages", "Snacks", "Dairy", "Bakery", "Frozen Foods", "Produce", "Meat", "Confectionery"]
+TRANSACTION_TYPES = ["Sale", "Refund", "Expense", "Investment"]
+PAYMENT_METHODS = ["Credit Card", "Cash", "Bank Transfer", "PayPal"]
+WORDS = ["great", "taste", "fresh", "price", "delivery", "quality", "bad", "love", "never", "again", "perfect"]
+
+
+def _pick(rng, values, size, p=None):
+    return rng.choice(np.array(values, dtype=object), size=size, p=p)
+
+
+def _dates(rng, size, start=START, days=NB_DAYS):
+    return (start + rng.integers(0, days, size=size).astype("timedelta64[D]")).astype(str)
+
+
+def _ids(prefix, start, size):
+    return np.char.add(prefix, np.arange(start, start + size).astype(str))
+
+
+def _dirty_region(rng, regions):
+    """Même région écrite de plusieurs façons (« Europe », « europe », « Europe  »)."""
+    variant = rng.integers(0, 10, size=len(regions))
+    regions = regions.astype(str)
+    regions = np.where(variant == 0, np.char.lower(regions), regions)
+    regions = np.where(variant == 1, np.char.add(regions, "  "), regions)
+    return regions.astype(object)
+
+
+def _dirty_amount(rng, amounts):
+    """Montants texte au format des fichiers sources, avec leurs défauts."""
+    text = np.char.mod("%.2f", amounts).astype(object)
+    kind = rng.integers(0, 100, size=len(amounts))
+    text[kind < 5] = [f"${a:,.2f}" for a in amounts[kind < 5]]
+    suffix = (kind >= 5) & (kind < 8)
+    text[suffix] = text[suffix] + " USD"
+    text[kind == 98] = "N/A"
+    text[kind == 99] = ""
+    return text
+
+
+def _times(rng, size):
+    seconds = rng.integers(0, 24 * 3600, size=size)
+    parts = [np.char.zfill(v.astype(str), 2) for v in (seconds // 3600, seconds // 60 % 60, seconds % 60)]
+    return np.char.add(np.char.add(np.char.add(np.char.add(parts[0], ":"), parts[1]), ":"), parts[2])
+
+
+def _with_duplicates(rng, ids, rate=0.01):
+    """Réutilise une partie des identifiants pour créer des doublons."""
+    dup = rng.random(len(ids)) < rate
+    ids = ids.astype(object)
+    ids[dup] = ids[rng.integers(0, len(ids), size=dup.sum())]
+    return ids
+
+
+# ---------------------------------------------------------
+# Une fonction par table : (rng, début, taille, volumétrie) → DataFrame Bronze
+# ---------------------------------------------------------
+def financial_transactions(rng, start, size, n):
+    amounts = np.round(rng.lognormal(4.5, 1.0, size=size), 2)
+    return pd.DataFrame({
+        "transaction_id": _with_duplicates(rng, _ids("TRX", start, size)),
+        "transaction_date": _dates(rng, size),
+        "transaction_type": _pick(rng, TRANSACTION_TYPES, size, p=[0.7, 0.1, 0.15, 0.05]),
+        "amount": _dirty_amount(rng, amounts),
+        "payment_method": _pick(rng, PAYMENT_METHODS, size),
+        "entity": _pick(rng, ["Retail", "Wholesale", "Online"], size),
+        "region": _pick(rng, REGIONS, size),
+        "account_code": np.char.add("ACC", rng.integers(1000, 9999, size=size).astype(str)),
+    })
+
+
+def _periods(rng, size, max_days):
+    """Périodes courtes et nombreuses : dans une région, plusieurs se chevauchent chaque jour."""
+    starts = START + rng.integers(0, NB_DAYS, size=size).astype("timedelta64[D]")
+    ends = starts + rng.integers(0, max_days, size=size).astype("timedelta64[D]")
+    return starts.astype(str), ends.astype(str)
+
+
+def promotions_data(rng, start, size, n):
+    starts, ends = _periods(rng, size, 45)
+    return pd.DataFrame({
+        "promotion_id": _ids("PROMO", start, size),
+        "product_category": _pick(rng, CATEGORIES, size),
+        "promotion_type": _pick(rng, ["Discount", "BOGO", "Bundle", "Flash Sale"], size),
+        "discount_percentage": np.char.mod("%.2f", rng.uniform(0.05, 0.5, size=size)),
+        "start_date": starts,
+        "end_date": ends,
+        "region": _dirty_region(rng, _pick(rng, REGIONS, size)),
+    })
+
+
+def marketing_campaigns(rng, start, size, n):
+    starts, ends = _periods(rng, size, 90)
+    return pd.DataFrame({
+        "campaign_id": _ids("CMP", start, size),
+        "campaign_name": np.char.add("Campagne ", np.arange(start, start + size).astype(str)),
+        "campaign_type": _pick(rng, ["Email", "Social Media", "TV", "Print", "Influencer"], size),
+        "product_category": _pick(rng, CATEGORIES, size),
+        "target_audience": _pick(rng, ["Young Adults", "Families", "Seniors", "Professionals"], size),
+        "start_date": starts,
+        "end_date": ends,
+        "region": _dirty_region(rng, _pick(rng, REGIONS, size)),
+        "budget": _dirty_amount(rng, np.round(rng.uniform(1_000, 500_000, size=size), 2)),
+        "reach": rng.integers(1_000, 5_000_000, size=size),
+        "conversion_rate": np.char.mod("%.4f", rng.uniform(0.001, 0.2, size=size)),
+    })
+
+
+def customer_demographics(rng, start, size, n):
+    return pd.DataFrame({
+        "customer_id": _with_duplicates(rng, np.arange(start, start + size)),
+        "name": np.char.add("Client ", np.arange(start, start + size).astype(str)),
+        "date_of_birth": _dates(rng, size, np.datetime64("1945-01-01"), 60 * 365),
+        "gender": _pick(rng, ["Male", "Female", "Other"], size, p=[0.48, 0.48, 0.04]),
+        "region": _pick(rng, REGIONS, size),
+        "country": _pick(rng, COUNTRIES, size),
+        "city": _pick(rng, ["Paris", "Lyon", "Berlin", "Tokyo", "Lagos", "Sydney", "Austin"], size),
+        "marital_status": _pick(rng, ["Single", "Married", "Divorced", "Widowed"], size),
+        "annual_income": _dirty_amount(rng, np.round(rng.lognormal(10.8, 0.5, size=size), 2)),
+    })
+
+
+def customer_service_interactions(rng, start, size, n):
+    return pd.DataFrame({
+        "interaction_id": _with_duplicates(rng, _ids("INT", start, size)),
+        "interaction_date": _dates(rng, size),
+        "interaction_type": _pick(rng, ["Phone", "Email", "Chat", "In-Store"], size),
+        "issue_category": _pick(rng, ["Billing", "Product Quality", "Delivery", "Other"], size),
+        "description": _pick(rng, ["Late order", "Damaged item", "Refund request", "Question"], size),
+        "duration_minutes": rng.integers(1, 90, size=size),
+        "resolution_status": _pick(rng, ["Resolved", "Pending", "Escalated"], size, p=[0.7, 0.2, 0.1]),
+        "follow_up_required": _pick(rng, ["Yes", "No"], size),
+        "customer_satisfaction": rng.integers(1, 6, size=size),
+    })
+
+
+def logistics_and_shipping(rng, start, size, n):
+    ship = START + rng.integers(0, NB_DAYS, size=size).astype("timedelta64[D]")
+    return pd.DataFrame({
+        "shipment_id": _with_duplicates(rng, _ids("SHP", start, size)),
+        "order_id": rng.integers(1, max(n, 2), size=size),
+        "ship_date": ship.astype(str),
+        "estimated_delivery": (ship + rng.integers(1, 15, size=size).astype("timedelta64[D]")).astype(str),
+        "shipping_method": _pick(rng, ["Standard", "Express", "Overnight", "Freight"], size),
+        "status": _pick(rng, ["Delivered", "In Transit", "Returned", "Lost"], size, p=[0.8, 0.1, 0.08, 0.02]),
+        "shipping_cost": _dirty_amount(rng, np.round(rng.uniform(2, 200, size=size), 2)),
+        "destination_region": _pick(rng, REGIONS, size),
+        "destination_country": _pick(rng, COUNTRIES, size),
+        "carrier": _pick(rng, ["DHL", "UPS", "FedEx", "La Poste"], size),
+    })
+
+
+def supplier_information(rng, start, size, n):
+    return pd.DataFrame({
+        "supplier_id": _ids("SUP", start, size),
+        "supplier_name": np.char.add("Fournisseur ", np.arange(start, start + size).astype(str)),
+        "product_category": _pick(rng, CATEGORIES, size),
+        "region": _pick(rng, REGIONS, size),
+        "country": _pick(rng, COUNTRIES, size),
+        "city": _pick(rng, ["Paris", "Berlin", "Tokyo", "Lagos"], size),
+        "lead_time": rng.integers(1, 60, size=size),
+        "reliability_score": np.round(rng.uniform(0.5, 1.0, size=size), 2),
+        "quality_rating": _pick(rng, ["A", "B", "C", "D"], size),
+    })
+
+
+def employee_records(rng, start, size, n):
+    return pd.DataFrame({
+        "employee_id": _with_duplicates(rng, _ids("EMP", start, size)),
+        "name": np.char.add("Employé ", np.arange(start, start + size).astype(str)),
+        "date_of_birth": _dates(rng, size, np.datetime64("1960-01-01"), 40 * 365),
+        "hire_date": _dates(rng, size),
+        "department": _pick(rng, ["Sales", "Marketing", "Logistics", "Finance", "IT"], size),
+        "job_title": _pick(rng, ["Manager", "Analyst", "Associate", "Director"], size),
+        "salary": _dirty_amount(rng, np.round(rng.uniform(25_000, 150_000, size=size), 2)),
+        "region": _pick(rng, REGIONS, size),
+        "country": _pick(rng, COUNTRIES, size),
+        "email": np.char.add(np.char.add("emp", np.arange(start, start + size).astype(str)), "@anycompany.com"),
+    })
+
+
+def product_reviews(rng, start, size, n):
+    """Lignes brutes séparées par des espaces, comme product_reviews.csv (une colonne raw_line)."""
+    ids = np.arange(start, start + size).astype(str)
+    products = np.char.add("P", rng.integers(1, 5_000, size=size).astype(str))
+    reviewers = np.char.add("R", rng.integers(1, max(n // 10, 2), size=size).astype(str))
+    ratings = rng.integers(1, 6, size=size).astype(str)
+    titles = np.char.add(np.char.capitalize(_pick(rng, WORDS, size).astype(str)), " product.")
+    texts = [" ".join(w) for w in _pick(rng, WORDS, (size, 8)).tolist()]
+    parts = [ids, products, reviewers, ratings, _dates(rng, size), _times(rng, size), titles, np.array(texts)]
+    line = parts[0]
+    for part in parts[1:]:
+        line = np.char.add(np.char.add(line, " "), part)
+    return pd.DataFrame({"raw_line": line})
+
+
+def inventory(rng, start, size, n):
+    return pd.DataFrame({
+        "product_id": _ids("P", start, size),
+        "product_category": _pick(rng, CATEGORIES, size),
+        "warehouse": _pick(rng, ["WH-North", "WH-South", "WH-East", "WH-West"], size),
+        "region": _pick(rng, REGIONS, size),
+        "country": _pick(rng, COUNTRIES, size),
+        "current_stock": rng.integers(0, 1_000, size=size),
+        "reorder_point": rng.integers(10, 200, size=size),
+        "lead_time": rng.integers(1, 30, size=size),
+        "last_restock_date": _dates(rng, size),
+    })
+
+
+def store_locations(rng, start, size, n):
+    return pd.DataFrame({
+        "store_id": _ids("ST", start, size),
+        "store_name": np.char.add("Magasin ", np.arange(start, start + size).astype(str)),
+        "store_type": _pick(rng, ["Supermarket", "Convenience", "Hypermarket"], size),
+        "address": np.char.add(rng.integers(1, 200, size=size).astype(str), " rue du Commerce"),
+        "city": _pick(rng, ["Paris", "Lyon", "Berlin", "Tokyo", "Lagos", "Sydney", "Austin"], size),
+        "postal_code": rng.integers(10_000, 99_999, size=size).astype(str),
+        "region": _pick(rng, REGIONS, size),
+        "country": _pick(rng, COUNTRIES, size),
+        "square_footage": np.round(rng.uniform(200, 10_000, size=size), 2),
+        "employee_count": rng.integers(5, 300, size=size),
+    })
+
+
+# Fichier → (table, fonction, nombre de lignes en fonction de n_transactions)
+SOURCES = {
+    "financial_transactions.csv": ("FINANCIAL_TRANSACTIONS", financial_transactions, lambda n: n),
+    "promotions-data.csv": ("PROMOTIONS_DATA", promotions_data, lambda n: min(max(n // 500, 100), 20_000)),
+    "marketing_campaigns.csv": ("MARKETING_CAMPAIGNS", marketing_campaigns, lambda n: min(max(n // 1_000, 50), 10_000)),
+    "customer_demographics.csv": ("CUSTOMER_DEMOGRAPHICS", customer_demographics, lambda n: max(n // 20, 100)),
+    "customer_service_interactions.csv": ("CUSTOMER_SERVICE_INTERACTIONS", customer_service_interactions,
+                                          lambda n: max(n // 10, 100)),
+    "logistics_and_shipping.csv": ("LOGISTICS_AND_SHIPPING", logistics_and_shipping, lambda n: max(n // 5, 100)),
+    "supplier_information.csv": ("SUPPLIER_INFORMATION", supplier_information, lambda n: 500),
+    "employee_records.csv": ("EMPLOYEE_RECORDS", employee_records, lambda n: max(n // 1_000, 100)),
+    "product_reviews.csv": ("PRODUCT_REVIEWS", product_reviews, lambda n: max(n // 10, 100)),
+    "inventory.json": ("INVENTORY", inventory, lambda n: max(n // 100, 100)),
+    "store_locations.json": ("STORE_LOCATIONS", store_locations, lambda n: 1_000),
+}
+
+
+def _write(path, table, frames):
+    """Écrit les paquets d'une table au format de son fichier source ; renvoie le nombre de lignes."""
+    rows = 0
+    if table.file_format == "JSON":
+        records = [r for df in frames for r in df.to_dict(orient="records")]
+        path.write_text(json.dumps(records, default=lambda v: v.item()))
+        return len(records)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, df in enumerate(frames):
+            if table.file_format == "CSV_SPACE":
+                f.write("\n".join(df["raw_line"]) + "\n")
+            else:
+                df.to_csv(f, index=False, header=(i == 0))
+            rows += len(df)
+    return rows
+
+
+def _project(df, columns):
+    return df if columns is None else df[columns]
+
+
+def generate(output, n_transactions, seed=42, files=None):
+    """Écrit les fichiers sources dans `output` ; renvoie {fichier: nombre de lignes}."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    counts = {}
+    for file_name, (name, make, volume) in SOURCES.items():
+        if files and file_name not in files:
+            continue
+        table = get_table(name)
+        total = volume(n_transactions)
+        # fichiers CSV : colonnes Bronze, dans l'ordre ; fichiers JSON : champs des objets (Bronze n'a que raw_data)
+        columns = None if table.file_format == "JSON" else list(table.bronze_columns)
+        frames = (
+            _project(make(rng, start, min(CHUNK_ROWS, total - start), n_transactions), columns)
+            for start in range(0, total, CHUNK_ROWS)
+        )
+        counts[file_name] = _write(output / file_name, table, frames)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fichiers sources synthétiques au format Bronze")
+    parser.add_argument("--transactions", type=int, default=100_000, help="lignes de financial_transactions")
+    parser.add_argument("--output", default="data/stage")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for file_name, rows in generate(args.output, args.transactions, args.seed).items():
+        print(f"{file_name} : {rows} lignes")
+
+
+if __name__ == "__main__":
+    main()
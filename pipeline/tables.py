@@ -0,0 +1,371 @@
+"""Description déclarative des 11 tables Bronze → Silver.
+
+Reprend, table par table, les règles de sql/clean_data.sql (typage, nettoyage
+REGEXP_REPLACE des montants, extraction par regex des avis, champs JSON,
+dédoublonnage) sous une forme que le code Python sait traduire en SQL Snowflake
+ou DuckDB.
+"""
+from dataclasses import dataclass
+
+STAGE = "@BRONZE.food_beverage_stage"
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    type: str = "TEXT"          # type Silver, écrit comme dans clean_data.sql
+    source: str = None          # colonne (ou champ JSON) Bronze, par défaut `name`
+    digits_only: bool = False   # REGEXP_REPLACE(x, '[^0-9.]', '') avant le typage
+    pattern: str = None         # regex appliquée à raw_line (avis produits)
+    group: int = 0              # groupe capturé par `pattern` (0 = toute la correspondance)
+    trim: bool = False
+
+    @property
+    def src(self):
+        return self.source or self.name
+
+
+@dataclass(frozen=True)
+class Table:
+    bronze: str                 # table Bronze (toutes colonnes TEXT ou VARIANT)
+    silver: str                 # table Silver cible
+    file_pattern: str           # regex sur le nom des fichiers du stage
+    file_format: str            # CSV_COMMA, CSV_SPACE ou JSON
+    bronze_columns: tuple       # schéma Bronze, dans l'ordre de load_data.sql
+    columns: tuple              # colonnes Silver (Column)
+    keys: tuple                 # clé de dédoublonnage / de MERGE
+    keep: str = "first"         # first | min | max | last : quelle version garder en cas de doublon
+    order_by: str = None        # colonne départageant les doublons (keep = min / max)
+    required: tuple = ()        # colonnes Silver qui ne doivent pas être NULL
+    date_column: str = None     # date suivie comme « high-water mark »
+    on_error_continue: bool = False
+
+    @property
+    def column_names(self):
+        return [c.name for c in self.columns]
+
+
+def _csv(bronze, silver, file_pattern, bronze_columns, columns, keys, **kwargs):
+    return Table(bronze, silver, file_pattern, "CSV_COMMA", tuple(bronze_columns.split()),
+                 tuple(columns), tuple(keys), **kwargs)
+
+
+def _json(bronze, silver, file_pattern, columns, keys, **kwargs):
+    return Table(bronze, silver, file_pattern, "JSON", ("raw_data",), tuple(columns), tuple(keys), **kwargs)
+
+
+TABLES = [
+    _csv(
+        "BRONZE.CUSTOMER_DEMOGRAPHICS", "SILVER.CUSTOMER_DEMOGRAPHICS_CLEAN", r"customer_demographics.*\.csv",
+        "customer_id name date_of_birth gender region country city marital_status annual_income",
+        [
+            Column("customer_id", "NUMBER"),
+            Column("name"),
+            Column("date_of_birth", "DATE"),
+            Column("gender"),
+            Column("region"),
+            Column("country"),
+            Column("city"),
+            Column("marital_status"),
+            Column("annual_income", "NUMBER(12,2)", digits_only=True),
+        ],
+        keys=["customer_id"],
+    ),
+    _csv(
+        "BRONZE.CUSTOMER_SERVICE_INTERACTIONS", "SILVER.CUSTOMER_SERVICE_INTERACTIONS_CLEAN",
+        r"customer_service_interactions.*\.csv",
+        "interaction_id interaction_date interaction_type issue_category description duration_minutes "
+        "resolution_status follow_up_required customer_satisfaction",
+        [
+            Column("interaction_id"),
+            Column("interaction_date", "DATE"),
+            Column("interaction_type"),
+            Column("issue_category"),
+            Column("description"),
+            Column("duration_minutes", "NUMBER"),
+            Column("resolution_status"),
+            Column("follow_up_required"),
+            Column("customer_satisfaction", "NUMBER"),
+        ],
+        keys=["interaction_id"], keep="max", order_by="interaction_date", date_column="interaction_date",
+    ),
+    _csv(
+        "BRONZE.FINANCIAL_TRANSACTIONS", "SILVER.FINANCIAL_TRANSACTIONS_CLEAN", r"financial_transactions.*\.csv",
+        "transaction_id transaction_date transaction_type amount payment_method entity region account_code",
+        [
+            Column("transaction_id"),
+            Column("transaction_date", "DATE"),
+            Column("transaction_type"),
+            Column("amount", "NUMBER(12,2)", digits_only=True),
+            Column("payment_method"),
+            Column("entity"),
+            Column("region"),
+            Column("account_code"),
+        ],
+        keys=["transaction_id"], keep="min", order_by="transaction_date",
+        required=["transaction_id"], date_column="transaction_date",
+    ),
+    _csv(
+        "BRONZE.PROMOTIONS_DATA", "SILVER.PROMOTIONS_DATA_CLEAN", r"promotions[-_]data.*\.csv",
+        "promotion_id product_category promotion_type discount_percentage start_date end_date region",
+        [
+            Column("promotion_id"),
+            Column("product_category"),
+            Column("promotion_type"),
+            Column("discount_percentage", "NUMBER(5,4)", digits_only=True),
+            Column("start_date", "DATE"),
+            Column("end_date", "DATE"),
+            Column("region"),
+        ],
+        keys=["promotion_id"], keep="min", order_by="start_date", date_column="start_date",
+    ),
+    _csv(
+        "BRONZE.MARKETING_CAMPAIGNS", "SILVER.MARKETING_CAMPAIGNS_CLEAN", r"marketing_campaigns.*\.csv",
+        "campaign_id campaign_name campaign_type product_category target_audience start_date end_date "
+        "region budget reach conversion_rate",
+        [
+            Column("campaign_id"),
+            Column("campaign_name"),
+            Column("campaign_type"),
+            Column("product_category"),
+            Column("target_audience"),
+            Column("start_date", "DATE"),
+            Column("end_date", "DATE"),
+            Column("region"),
+            Column("budget", "NUMBER(12,2)", digits_only=True),
+            Column("reach", "NUMBER"),
+            Column("conversion_rate", "NUMBER(6,4)", digits_only=True),
+        ],
+        keys=["campaign_id"], keep="min", order_by="start_date", date_column="start_date",
+    ),
+    Table(
+        "BRONZE.PRODUCT_REVIEWS", "SILVER.PRODUCT_REVIEWS_CLEAN", r"product_reviews.*\.csv", "CSV_SPACE",
+        ("raw_line",),
+        (
+            Column("review_id", "INTEGER", "raw_line", pattern=r"^(\d+)"),
+            Column("product_id", "TEXT", "raw_line", pattern=r"^\d+\s+(\S+)", group=1),
+            Column("reviewer_id", "TEXT", "raw_line", pattern=r"^\d+\s+\S+\s+(\S+)", group=1),
+            Column("rating", "INTEGER", "raw_line", pattern=r"(\d+)\s+\d{4}-\d{2}-\d{2}", group=1),
+            Column("review_date", "DATE", "raw_line", pattern=r"\d{4}-\d{2}-\d{2}"),
+            Column("review_title", "TEXT", "raw_line",
+                   pattern=r"\d{2}:\d{2}:\d{2}\s+([^\.\!\?]+[\.\!\?])", group=1, trim=True),
+            Column("review_text", "TEXT", "raw_line", pattern=r"\d{2}:\d{2}:\d{2}\s+(.*)$", group=1, trim=True),
+        ),
+        ("review_id",), keep="last", required=("review_id",), date_column="review_date",
+        on_error_continue=True,
+    ),
+    _json(
+        "BRONZE.INVENTORY", "SILVER.INVENTORY_CLEAN", r"inventory.*\.json",
+        [
+            Column("product_id"),
+            Column("product_category"),
+            Column("warehouse"),
+            Column("region"),
+            Column("country"),
+            Column("current_stock", "INTEGER"),
+            Column("reorder_point", "INTEGER"),
+            Column("lead_time", "INTEGER"),
+            Column("last_restock_date", "DATE"),
+        ],
+        keys=["product_id", "warehouse"], keep="max", order_by="last_restock_date",
+        required=["product_id"], date_column="last_restock_date",
+    ),
+    _json(
+        "BRONZE.STORE_LOCATIONS", "SILVER.STORE_LOCATIONS_CLEAN", r"store_locations.*\.json",
+        [
+            Column("store_id"),
+            Column("store_name"),
+            Column("store_type"),
+            Column("address"),
+            Column("city"),
+            Column("postal_code"),
+            Column("region"),
+            Column("country"),
+            Column("square_footage", "NUMBER(10,2)"),
+            Column("employee_count", "INTEGER"),
+        ],
+        keys=["store_id"], required=["store_id"],
+    ),
+    _csv(
+        "BRONZE.LOGISTICS_AND_SHIPPING", "SILVER.LOGISTICS_AND_SHIPPING_CLEAN", r"logistics_and_shipping.*\.csv",
+        "shipment_id order_id ship_date estimated_delivery shipping_method status shipping_cost "
+        "destination_region destination_country carrier",
+        [
+            Column("shipment_id"),
+            Column("order_id", "INTEGER"),
+            Column("ship_date", "DATE"),
+            Column("estimated_delivery", "DATE"),
+            Column("shipping_method"),
+            Column("status"),
+            Column("shipping_cost", "FLOAT", digits_only=True),
+            Column("destination_region"),
+            Column("destination_country"),
+            Column("carrier"),
+        ],
+        keys=["shipment_id"], keep="min", order_by="ship_date", date_column="ship_date",
+    ),
+    _csv(
+        "BRONZE.SUPPLIER_INFORMATION", "SILVER.SUPPLIER_INFORMATION_CLEAN", r"supplier_information.*\.csv",
+        "supplier_id supplier_name product_category region country city lead_time reliability_score quality_rating",
+        [
+            Column("supplier_id"),
+            Column("supplier_name"),
+            Column("product_category"),
+            Column("region"),
+            Column("country"),
+            Column("city"),
+            Column("lead_time", "INTEGER"),
+            Column("reliability_score", "FLOAT"),
+            Column("quality_rating"),
+        ],
+        keys=["supplier_id"],
+    ),
+    _csv(
+        "BRONZE.EMPLOYEE_RECORDS", "SILVER.EMPLOYEE_RECORDS_CLEAN", r"employee_records.*\.csv",
+        "employee_id name date_of_birth hire_date department job_title salary region country email",
+        [
+            Column("employee_id"),
+            Column("name"),
+            Column("date_of_birth", "DATE"),
+            Column("hire_date", "DATE"),
+            Column("department"),
+            Column("job_title"),
+            Column("salary", "FLOAT", digits_only=True),
+            Column("region"),
+            Column("country"),
+            Column("email"),
+        ],
+        keys=["employee_id"], keep="max", order_by="hire_date", date_column="hire_date",
+    ),
+]
+
+TABLES_BY_SILVER = {t.silver: t for t in TABLES}
+
+
+def get_table(name):
+    """Retrouve une table par son nom Silver ou Bronze (avec ou sans schéma, casse indifférente)."""
+    name = name.upper()
+    for t in TABLES:
+        if name in (t.silver, t.bronze, t.silver.split(".")[1], t.bronze.split(".")[1]):
+            return t
+    raise KeyError(f"Table inconnue : {name}")
+
+
+# ---------------------------------------------------------
+# Traduction en SQL
+# ---------------------------------------------------------
+def sql_type(type_, dialect):
+    """Type Snowflake → type équivalent du dialecte."""
+    if dialect == "snowflake":
+        return type_
+    if type_ == "NUMBER":
+        return "DECIMAL(38,0)"
+    if type_.startswith("NUMBER("):
+        return "DECIMAL" + type_[len("NUMBER"):]
+    return {"FLOAT": "DOUBLE", "INTEGER": "BIGINT", "TEXT": "VARCHAR", "VARIANT": "JSON"}.get(type_, type_)
+
+
+def sql_string(value, dialect):
+    """Littéral chaîne SQL ; Snowflake interprète les antislashs, DuckDB non."""
+    if dialect == "snowflake":
+        value = value.replace("\\", "\\\\")
+    return "'" + value.replace("'", "''") + "'"
+
+
+def column_expr(table, column, dialect):
+    """Expression SQL qui calcule une colonne Silver à partir de la ligne Bronze."""
+    if table.file_format == "JSON":
+        if dialect == "snowflake":
+            expr = f"raw_data:{column.src}::TEXT"
+        else:
+            expr = f"raw_data->>{sql_string(column.src, dialect)}"
+    elif column.pattern:
+        pattern = sql_string(column.pattern, dialect)
+        if dialect == "snowflake":
+            if column.group:
+                expr = f"REGEXP_SUBSTR({column.src}, {pattern}, 1, 1, 'e', {column.group})"
+            else:
+                expr = f"REGEXP_SUBSTR({column.src}, {pattern})"
+        else:
+            expr = f"NULLIF(REGEXP_EXTRACT({column.src}, {pattern}, {column.group}), '')"
+    else:
+        expr = column.src
+
+    if column.digits_only:
+        flags = ", 'g'" if dialect != "snowflake" else ""
+        expr = f"REGEXP_REPLACE({expr}, '[^0-9.]', ''{flags})"
+    if column.trim:
+        expr = f"TRIM({expr})"
+    if column.type != "TEXT":
+        # TRY_CAST : une valeur mal formée (ex. « N/A ») donne NULL au lieu de bloquer le chargement
+        expr = f"TRY_CAST({expr} AS {sql_type(column.type, dialect)})"
+    return expr
+
+
+def bronze_ddl(table, dialect):
+    type_ = "VARIANT" if table.file_format == "JSON" else "TEXT"
+    cols = ",\n    ".join(f"{c} {sql_type(type_, dialect)}" for c in table.bronze_columns)
+    return f"CREATE TABLE IF NOT EXISTS {table.bronze} (\n    {cols}\n)"
+
+
+def silver_ddl(table, dialect):
+    cols = ",\n    ".join(f"{c.name} {sql_type(c.type, dialect)}" for c in table.columns)
+    return f"CREATE TABLE IF NOT EXISTS {table.silver} (\n    {cols}\n)"
+
+
+def clean_select(table, source, dialect, typed=False):
+    """SELECT typé et dédoublonné (équivalent du CREATE OR REPLACE ... QUALIFY de clean_data.sql).
+
+    typed=True : `source` a déjà les colonnes Silver typées (Parquet de validate.py),
+    il ne reste que le filtre des colonnes obligatoires et le dédoublonnage.
+    """
+    if typed:
+        exprs = ",\n        ".join(table.column_names)
+    else:
+        exprs = ",\n        ".join(f"{column_expr(table, c, dialect)} AS {c.name}" for c in table.columns)
+    where = " AND ".join(f"{c} IS NOT NULL" for c in table.required) or "TRUE"
+    keys = ", ".join(table.keys)
+    if table.keep == "min":
+        order = f"{table.order_by} ASC"
+    elif table.keep == "max":
+        order = f"{table.order_by} DESC"
+    else:
+        order = keys
+    return (
+        f"SELECT * FROM (\n"
+        f"    SELECT\n        {exprs}\n"
+        f"    FROM {source}\n"
+        f") WHERE {where}\n"
+        f"QUALIFY ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY {order}) = 1"
+    )
+
+
+def merge_sql(table, source, dialect, typed=False):
+    """MERGE des lignes nettoyées de `source` dans la table Silver.
+
+    En cas de clé déjà présente, la ligne existante n'est remplacée que si la
+    nouvelle aurait gagné le ROW_NUMBER() de clean_data.sql (keep = min / max),
+    toujours pour keep = last, jamais pour keep = first.
+    """
+    on = " AND ".join(f"t.{k} = s.{k}" for k in table.keys)
+    names = table.column_names
+    update = ", ".join(f"{c} = s.{c}" for c in names if c not in table.keys)
+    insert_cols = ", ".join(names)
+    insert_vals = ", ".join(f"s.{c}" for c in names)
+
+    if table.keep == "min":
+        matched = f"WHEN MATCHED AND s.{table.order_by} < t.{table.order_by} THEN UPDATE SET {update}\n"
+    elif table.keep == "max":
+        matched = f"WHEN MATCHED AND s.{table.order_by} > t.{table.order_by} THEN UPDATE SET {update}\n"
+    elif table.keep == "last":
+        matched = f"WHEN MATCHED THEN UPDATE SET {update}\n"
+    else:
+        matched = ""
+
+    return (
+        f"MERGE INTO {table.silver} t\n"
+        f"USING (\n{clean_select(table, source, dialect, typed)}\n) s\n"
+        f"ON {on}\n"
+        f"{matched}"
+        f"WHEN NOT MATCHED THEN INSERT ({insert_cols}) VALUES ({insert_vals})"
+    )
@@ -0,0 +1,333 @@
+"""Validation et typage locaux des fichiers du stage, avant chargement.
+
+load_data.sql charge tout en TEXT (ERROR_ON_COLUMN_COUNT_MISMATCH = FALSE) et
+clean_data.sql type ensuite dans le warehouse : les valeurs illisibles deviennent
+NULL et les lignes sans clé disparaissent sans trace. Ici, chaque fichier source
+(9 CSV, 2 JSON) est lu par paquets de lignes, en mémoire bornée, et les paquets
+sont typés en parallèle sur plusieurs processus avec les règles de tables.py
+(REGEXP_REPLACE des montants, extraction par regex des avis, champs JSON, TRY_CAST) :
+- les lignes valides sont écrites en Parquet typé, colonnes Silver
+  (data/validated/TABLE/fichier.parquet) ;
+- chaque anomalie va dans un fichier de rejets avec son motif
+  (data/validated/_rejets/fichier.csv) : ligne rejetée (clé obligatoire manquante,
+  objet JSON illisible, avec son texte) ou valeur mise à NULL (comme TRY_CAST), avec la valeur brute ;
+- un rapport (_rapport.json) donne, par fichier, lignes lues / valides / rejetées
+  et valeurs mises à NULL par colonne.
+
+Le dédoublonnage reste fait au MERGE (clés de tables.py). `python pipeline/ingestion.py
+--validated data/validated` charge ensuite ces Parquet directement dans Silver,
+sans repasser par Bronze ni par le typage SQL.
+
+Les CSV sont découpés par lignes physiques : un champ entre guillemets contenant
+un retour à la ligne n'est pas pris en charge (absent des fichiers du projet).
+
+Usage :
+    python pipeline/validate.py                          # fichiers de data/stage
+    python pipeline/validate.py --stage data/stage --output data/validated --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tables import TABLES, get_table
+from warehouse import ROOT, local_config
+
+DEFAULT_OUTPUT = ROOT / "data" / "validated"
+CHUNK_ROWS = 200_000
+JSON_BLOCK = 1 << 20                    # octets lus à la fois dans un tableau JSON
+JSON_LOOKAHEAD = 16 * JSON_BLOCK        # au-delà, un objet qui ne se décode pas est rejeté
+REJECT_VALUE_CHARS = 1000               # longueur max. d'une valeur brute dans le fichier de rejets
+NULL_STRINGS = ["NULL", "null", ""]     # NULL_IF du format CSV_COMMA de load_data.sql
+REJECT_COLUMNS = ["fichier", "ligne", "colonne", "valeur", "motif", "action"]
+
+_SEPARATORS = re.compile(r"[\s\[\],]*")
+_OBJECT_START = re.compile(r"[,\n]\s*\{")
+
+ARROW_TYPES = {"INTEGER": pa.int64(), "NUMBER": pa.int64(), "FLOAT": pa.float64(), "DATE": pa.date32()}
+
+
+def arrow_type(type_):
+    if type_.startswith("NUMBER("):
+        return pa.float64()             # arrondi à l'échelle ; retypé en NUMBER(p,s) au MERGE
+    return ARROW_TYPES.get(type_, pa.string())
+
+
+def arrow_schema(table):
+    return pa.schema([pa.field(c.name, arrow_type(c.type)) for c in table.columns])
+
+
+def output_path(root, table, file_name):
+    return Path(root) / table.silver.split(".")[1] / (Path(file_name).stem + ".parquet")
+
+
+# ---------------------------------------------------------
+# Lecture en paquets
+# ---------------------------------------------------------
+def _read_lines(path, skip_header):
+    """Paquets de (numéro de la première ligne, lignes) ; numéros de ligne du fichier, à partir de 1."""
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        first = 1
+        if skip_header:
+            next(f, None)
+            first = 2
+        batch = []
+        for line in f:
+            batch.append(line.rstrip("\r\n"))
+            if len(batch) == CHUNK_ROWS:
+                yield first, batch
+                first += len(batch)
+                batch = []
+        if batch:
+            yield first, batch
+
+
+class Unreadable(NamedTuple):
+    """Passage d'un tableau JSON qui ne se décode pas : rejeté avec son motif (voir _raw_frame)."""
+    texte: str
+    motif: str
+
+
+def _next_object(buffer, pos):
+    """Début du prochain élément « { » après `pos` (précédé d'une virgule ou d'un saut de ligne), ou -1."""
+    match = _OBJECT_START.search(buffer, pos + 1)
+    return match.end() - 1 if match else -1
+
+
+def _read_json_array(path):
+    """Paquets d'objets d'un tableau JSON (ou d'objets à la suite), sans charger tout le fichier.
+
+    Le tampon n'est recopié qu'une fois par bloc lu. Un objet illisible (ou plus long
+    que JSON_LOOKAHEAD) devient un élément Unreadable, rejeté avec son motif, et la
+    lecture reprend au prochain élément.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, first, batch, eof = "", 0, 1, [], False
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos == len(buffer):
+                if eof:
+                    break
+                chunk = f.read(JSON_BLOCK)
+                eof = not chunk
+                buffer, pos = chunk, 0
+                continue
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                if not eof and len(buffer) - pos < JSON_LOOKAHEAD:
+                    # objet coupé par la fin du bloc (ou illisible) : on lit la suite, dans la limite
+                    chunk = f.read(JSON_BLOCK)
+                    eof = not chunk
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+                end = _next_object(buffer, pos)
+                end = len(buffer) if end < 0 else end
+                motif = f"JSON illisible : {exc.msg}" if eof or end < len(buffer) else \
+                    f"objet JSON de plus de {JSON_LOOKAHEAD // (1 << 20)} Mo"
+                obj, pos = Unreadable(buffer[pos:end][:REJECT_VALUE_CHARS], motif), end
+            batch.append(obj)
+            if len(batch) == CHUNK_ROWS:
+                yield first, batch
+                first += len(batch)
+                batch = []
+    if batch:
+        yield first, batch
+
+
+def read_chunks(path, table):
+    if table.file_format == "JSON":
+        return _read_json_array(path)
+    return _read_lines(path, skip_header=table.file_format == "CSV_COMMA")
+
+
+# ---------------------------------------------------------
+# Typage d'un paquet (dans un processus du pool)
+# ---------------------------------------------------------
+def _raw_frame(table, rows):
+    """Colonnes Bronze d'un paquet, en texte, et motifs de lignes illisibles."""
+    problems = []
+    if table.file_format == "JSON":
+        # champ → texte comme raw_data:champ::TEXT (nombres et booléens écrits en JSON : 12, true)
+        fields = list(dict.fromkeys(c.src for c in table.columns))
+        records = []
+        for i, row in enumerate(rows):
+            if isinstance(row, Unreadable):
+                problems.append((i, row.motif, row.texte))
+                row = {}
+            elif not isinstance(row, dict):
+                problems.append((i, "objet JSON attendu", json.dumps(row)[:REJECT_VALUE_CHARS]))
+                row = {}
+            records.append([v if v is None or isinstance(v, str) else json.dumps(v)
+                            for v in (row.get(f) for f in fields)])
+        return pd.DataFrame(records, columns=fields, dtype="string"), problems
+    if table.file_format == "CSV_SPACE":
+        return pd.DataFrame({"raw_line": pd.array(rows, dtype="string")}), problems
+
+    width = len(table.bronze_columns)
+    parsed = []
+    for i, fields in enumerate(csv.reader(rows, delimiter=",", quotechar='"')):
+        if len(fields) != width:
+            # même tolérance que ERROR_ON_COLUMN_COUNT_MISMATCH = FALSE : on complète / tronque, en le signalant
+            problems.append((i, f"{len(fields)} colonnes au lieu de {width}", None))
+            fields = (fields + [None] * width)[:width]
+        parsed.append(fields)
+    frame = pd.DataFrame(parsed, columns=list(table.bronze_columns), dtype="string")
+    return frame.replace(NULL_STRINGS, pd.NA), problems
+
+
+def _column(table, column, raw):
+    """Valeur texte d'une colonne Silver avant typage (équivalent Python de tables.column_expr)."""
+    if table.file_format == "CSV_SPACE" and column.pattern:
+        values = raw["raw_line"].str.extract("(" + column.pattern + ")", expand=True)[column.group]
+        values = values.where(values != "")
+    else:
+        values = raw[column.src]
+    if column.digits_only:
+        values = values.str.replace(r"[^0-9.]", "", regex=True)
+    if column.trim:
+        values = values.str.strip()
+    return values
+
+
+def _cast(values, type_):
+    """TRY_CAST : valeur illisible → NULL."""
+    if type_ == "TEXT":
+        return values.astype(object).where(values.notna(), None)
+    if type_ == "DATE":
+        dates = pd.to_datetime(values, format="ISO8601", errors="coerce")
+        return dates.dt.date.astype(object).where(dates.notna(), None)
+    numbers = pd.to_numeric(values.replace("", pd.NA), errors="coerce")
+    if type_ in ("NUMBER", "INTEGER"):
+        return numbers.round().astype("Int64")
+    if type_.startswith("NUMBER("):
+        scale = int(type_.rstrip(")").split(",")[1]) if "," in type_ else 0
+        return numbers.astype("float64").round(scale)
+    return numbers.astype("float64")
+
+
+def validate_chunk(table_name, file_name, first_line, rows):
+    """Typage d'un paquet : (table Arrow des lignes valides, rejets, statistiques)."""
+    table = get_table(table_name)
+    raw, problems = _raw_frame(table, rows)
+    rejected = np.zeros(len(raw), dtype=bool)
+    # un objet JSON illisible est rejeté ; une ligne CSV au mauvais nombre de colonnes est gardée, complétée
+    action = "rejetée" if table.file_format == "JSON" else "complétée"
+    rejects = [(file_name, first_line + i, None, value, reason, action) for i, reason, value in problems]
+    if table.file_format == "JSON":
+        rejected[[i for i, _reason, _value in problems]] = True
+
+    typed, nulled = {}, {}
+    for column in table.columns:
+        text = _column(table, column, raw)
+        values = _cast(text, column.type)
+        given = (text.notna() & (text.str.strip() != "")).to_numpy(dtype=bool, na_value=False)
+        bad = given & pd.isna(values).to_numpy()
+        if bad.any():
+            nulled[column.name] = int(bad.sum())
+            for i in np.flatnonzero(bad):
+                rejects.append((file_name, first_line + i, column.name, str(text.iloc[i]),
+                                f"valeur illisible ({column.type})", "NULL"))
+        typed[column.name] = values
+
+    frame = pd.DataFrame(typed)
+    for name in table.required:
+        missing = frame[name].isna().to_numpy() & ~rejected
+        for i in np.flatnonzero(missing):
+            rejects.append((file_name, first_line + i, name, None, "valeur obligatoire manquante", "rejetée"))
+        rejected |= missing
+
+    valid = frame[~rejected]
+    arrow = pa.Table.from_pandas(valid, schema=arrow_schema(table), preserve_index=False)
+    stats = {"lignes": len(raw), "valides": int((~rejected).sum()), "rejetees": int(rejected.sum()),
+             "valeurs_mises_a_null": nulled}
+    return arrow, rejects, stats
+
+
+# ---------------------------------------------------------
+# Fichiers
+# ---------------------------------------------------------
+def _merge_stats(total, stats):
+    for key in ("lignes", "valides", "rejetees"):
+        total[key] += stats[key]
+    for name, count in stats["valeurs_mises_a_null"].items():
+        total["valeurs_mises_a_null"][name] = total["valeurs_mises_a_null"].get(name, 0) + count
+
+
+def validate_file(path, table, output, pool, max_pending):
+    """Valide un fichier ; les paquets partent sur le pool, les résultats sont écrits dans l'ordre."""
+    start = time.perf_counter()
+    target = output_path(output, table, path.name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    reject_path = Path(output) / "_rejets" / (path.name + ".csv")
+    reject_path.parent.mkdir(parents=True, exist_ok=True)
+
+    total = {"table": table.silver, "lignes": 0, "valides": 0, "rejetees": 0, "valeurs_mises_a_null": {}}
+    writer = pq.ParquetWriter(target, arrow_schema(table))
+    pending = deque()
+    try:
+        with open(reject_path, "w", encoding="utf-8", newline="") as f:
+            rejects_out = csv.writer(f)
+            rejects_out.writerow(REJECT_COLUMNS)
+
+            def drain(limit):
+                while len(pending) > limit:
+                    arrow, rejects, stats = pending.popleft().result()
+                    writer.write_table(arrow)
+                    rejects_out.writerows(rejects)
+                    _merge_stats(total, stats)
+
+            for first_line, rows in read_chunks(path, table):
+                pending.append(pool.submit(validate_chunk, table.silver, path.name, first_line, rows))
+                drain(max_pending)          # mémoire bornée : au plus max_pending paquets en vol
+            drain(0)
+    finally:
+        writer.close()
+    total["secondes"] = round(time.perf_counter() - start, 2)
+    return total
+
+
+def validate_stage(stage_dir, output=DEFAULT_OUTPUT, workers=None, tables=TABLES):
+    """Valide tous les fichiers du stage reconnus par `tables` ; renvoie {fichier: statistiques}."""
+    workers = workers or os.cpu_count()
+    report = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in sorted(Path(stage_dir).iterdir()):
+            table = next((t for t in tables if re.fullmatch(t.file_pattern, path.name)), None)
+            if table is None or not path.is_file():
+                continue
+            report[path.name] = validate_file(path, table, output, pool, max_pending=2 * workers)
+            s = report[path.name]
+            print(f"{path.name:<40} {s['lignes']:>10} lignes, {s['valides']:>10} valides, "
+                  f"{s['rejetees']:>8} rejetées, {sum(s['valeurs_mises_a_null'].values()):>8} valeurs à NULL "
+                  f"({s['secondes']} s)")
+    Path(output, "_rapport.json").write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation et typage locaux des fichiers du stage")
+    parser.add_argument("--stage", default=None, help="dossier des fichiers sources (par défaut : [local] stage_dir)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--workers", type=int, default=None, help="processus de validation (par défaut : nb de cœurs)")
+    parser.add_argument("--tables", nargs="*", help="tables à valider (par défaut : toutes)")
+    args = parser.parse_args()
+
+    tables = [get_table(name) for name in args.tables] if args.tables else TABLES
+    validate_stage(args.stage or local_config()["stage_dir"], args.output, args.workers, tables)
+
+
+if __name__ == "__main__":
+    main()
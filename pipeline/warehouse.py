@@ -0,0 +1,108 @@
+"""Connexion au warehouse pour les traitements Python du pipeline.
+
+Deux backends partagent la même interface :
+- « snowflake » : le compte du projet, avec les identifiants de .streamlit/secrets.toml ;
+- « duckdb » : une base locale (section [local] du même fichier) pour travailler
+  et tester hors ligne, avec les mêmes schémas BRONZE / SILVER / ANALYTICS.
+"""
+import tomllib
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+ROOT = Path(__file__).resolve().parents[1]
+SECRETS_FILE = ROOT / ".streamlit" / "secrets.toml"
+
+DEFAULT_LOCAL = {
+    "database": "data/anycompany_lab.duckdb",   # le nom du fichier sert de nom de catalogue (ANYCOMPANY_LAB)
+    "stage_dir": "data/stage",                  # équivalent local de @BRONZE.food_beverage_stage
+}
+
+
+def load_config(section):
+    """Section de .streamlit/secrets.toml ({} si le fichier ou la section n'existe pas)."""
+    if not SECRETS_FILE.exists():
+        return {}
+    with open(SECRETS_FILE, "rb") as f:
+        return tomllib.load(f).get(section, {})
+
+
+def local_config():
+    conf = {**DEFAULT_LOCAL, **load_config("local")}
+    return {key: ROOT / value if key in DEFAULT_LOCAL else value for key, value in conf.items()}
+
+
+class Warehouse:
+    """Connexion DB-API minimale, identique pour Snowflake et DuckDB (paramètres « ? »)."""
+
+    def __init__(self, conn, dialect):
+        self.conn = conn
+        self.dialect = dialect
+        self._cursor = conn if dialect == "duckdb" else conn.cursor()
+
+    def execute(self, sql, params=None):
+        if params:
+            self._cursor.execute(sql, params)
+        else:
+            self._cursor.execute(sql)
+        return self._cursor.fetchall() if self._cursor.description else []
+
+    def executemany(self, sql, rows):
+        """Même requête pour chaque ligne de `rows` (insertion par lots, liaison de tableaux sur Snowflake)."""
+        if rows:
+            self._cursor.executemany(sql, rows)
+
+    def query_df(self, sql, params=None):
+        rows = self.execute(sql, params)
+        columns = [d[0].upper() for d in self._cursor.description]
+        return pd.DataFrame(rows, columns=columns)
+
+    def arrow_batches(self, sql, params=None):
+        """Résultat sous forme de lots Arrow (pyarrow.Table), sans passer par des tuples Python."""
+        if self.dialect == "snowflake":
+            self._cursor.execute(sql, params)
+            yield from self._cursor.fetch_arrow_batches()
+        else:
+            reader = self.conn.execute(sql, params).fetch_record_batch()
+            for batch in reader:
+                yield pa.Table.from_batches([batch])
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def connect(backend="snowflake", database=None):
+    """Connexion au backend ; `database` remplace le fichier DuckDB de [local] (benchmarks)."""
+    if backend == "snowflake":
+        import snowflake.connector
+
+        snowflake.connector.paramstyle = "qmark"
+        conf = load_config("snowflake")
+        conn = snowflake.connector.connect(
+            user=conf["user"],
+            password=conf["password"],
+            account=conf["account"],
+            warehouse=conf["warehouse"],
+            database=conf["database"],
+            schema=conf.get("schema", "SILVER"),
+        )
+        return Warehouse(conn, "snowflake")
+
+    if backend == "duckdb":
+        import duckdb
+
+        path = Path(database) if database else local_config()["database"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = duckdb.connect(str(path))
+        for schema in ("BRONZE", "SILVER", "ANALYTICS"):
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        return Warehouse(conn, "duckdb")
+
+    raise ValueError(f"Backend inconnu : {backend}")
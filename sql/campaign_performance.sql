@@ -13,19 +13,51 @@ USE SCHEMA SILVER;
 -- Objectif : Comparer le CA généré par euro investi pour chaque canal.
 -- ==========================================================
 
-SELECT 
-    CAMPAIGN_TYPE,
-    -- Performance déclarée dans la table marketing
-    ROUND(AVG(CONVERSION_RATE) * 100, 2) AS TAUX_CONV_THEORIQUE_PCT,
-    -- Performance calculée (ce qui donne 0.02 actuellement)
-    ROUND(SUM(v.AMOUNT) / NULLIF(SUM(c.BUDGET), 0), 4) AS ROI_CALCULE,
-    -- Regardons le panier moyen par canal pour voir une différence
-    ROUND(AVG(v.AMOUNT), 2) AS PANIER_MOYEN_PAR_CANAL
-FROM ANYCOMPANY_LAB.SILVER.MARKETING_CAMPAIGNS_CLEAN c
-LEFT JOIN ANYCOMPANY_LAB.SILVER.FINANCIAL_TRANSACTIONS_CLEAN v 
-    ON UPPER(TRIM(v.REGION)) = UPPER(TRIM(c.REGION))
-    AND v.TRANSACTION_DATE BETWEEN c.START_DATE AND c.END_DATE
-WHERE v.TRANSACTION_TYPE = 'Sale'
+-- Attention : la version précédente (jointure campagne × transaction, puis SUM(v.AMOUNT) / SUM(c.BUDGET))
+-- comptait le budget d'une campagne une fois par transaction jointe, et le CA d'un jour couvert par deux
+-- campagnes deux fois. On agrège d'abord les ventes par (région, jour), on partage chaque jour à parts égales
+-- entre les campagnes actives (ANALYTICS.CAMPAIGN_CALENDAR, promo_calendar.sql), et chaque budget n'est compté
+-- qu'une fois. Autres règles (prorata du budget, dernière campagne lancée) : dashboard Marketing ROI.
+WITH ventes AS (
+    SELECT UPPER(TRIM(region)) AS region_key, jour, SUM(montant_total) AS montant, SUM(nb_montants) AS nb_montants
+    FROM ANYCOMPANY_LAB.ANALYTICS.DAILY_SALES_CUBE
+    WHERE transaction_type = 'Sale'
+    GROUP BY 1, 2
+),
+parts AS (
+    SELECT
+        cal.campaign_id,
+        cal.campaign_type,
+        1 / COUNT(*) OVER (PARTITION BY cal.region_key, cal.jour) AS part,
+        v.montant,
+        v.nb_montants
+    FROM ANYCOMPANY_LAB.ANALYTICS.CAMPAIGN_CALENDAR cal
+    JOIN ventes v
+        ON v.region_key = cal.region_key
+        AND v.jour = cal.jour
+),
+par_campagne AS (
+    SELECT
+        c.campaign_id,
+        c.campaign_type,
+        c.conversion_rate,
+        c.budget,
+        COALESCE(SUM(p.part * p.montant), 0) AS ca_attribue,
+        COALESCE(SUM(p.part * p.nb_montants), 0) AS nb_montants_attribues
+    FROM ANYCOMPANY_LAB.SILVER.MARKETING_CAMPAIGNS_CLEAN c
+    LEFT JOIN parts p ON p.campaign_id = c.campaign_id
+    WHERE c.start_date IS NOT NULL
+      AND c.end_date >= c.start_date
+    GROUP BY 1, 2, 3, 4
+)
+SELECT
+    campaign_type,
+    -- Performance déclarée dans la table marketing (une voix par campagne)
+    ROUND(AVG(conversion_rate) * 100, 2) AS TAUX_CONV_THEORIQUE_PCT,
+    -- CA attribué par euro investi, chaque budget compté une fois
+    ROUND(SUM(ca_attribue) / NULLIF(SUM(budget), 0), 4) AS ROI_CALCULE,
+    ROUND(SUM(ca_attribue) / NULLIF(SUM(nb_montants_attribues), 0), 2) AS PANIER_MOYEN_PAR_CANAL
+FROM par_campagne
 GROUP BY 1
 ORDER BY TAUX_CONV_THEORIQUE_PCT DESC;
 
@@ -0,0 +1,92 @@
+-- Phase 2 – Agrégats logistiques pour les dashboards-------------------------------------------------------------------------------
+
+--Cube journalier ANALYTICS.LOGISTICS_DAILY------------------------------------------------------------------------------------------
+--Grain : (ship_date, destination_region, shipping_method, delivery_days). La dernière colonne est la durée de livraison
+--en jours (DATEDIFF ship_date → estimated_delivery) : chaque groupe (jour, région, mode) garde ainsi l'histogramme complet
+--de ses durées, un « sketch » de quantiles exact puisque les durées sont des jours entiers.
+--Ces histogrammes se fusionnent par simple somme : pour n'importe quelle période, p50 / p90 / p99 se lisent sur le cumul
+--des nb_expeditions par durée, sans relire SILVER.LOGISTICS_AND_SHIPPING_CLEAN.
+--Comme pour DAILY_SALES_CUBE, les autres mesures sont additives (comptages, sommes) : moyenne = somme / nombre.
+USE DATABASE ANYCOMPANY_LAB;
+
+--1. Création du cube (une seule fois)
+CREATE TABLE IF NOT EXISTS ANALYTICS.LOGISTICS_DAILY (
+    ship_date DATE,
+    destination_region TEXT,
+    shipping_method TEXT,
+    delivery_days NUMBER,          -- NULL si la date de livraison estimée manque
+    nb_expeditions NUMBER,
+    nb_retours NUMBER,             -- status = 'Returned'
+    nb_couts NUMBER,               -- COUNT(shipping_cost) : dénominateur du coût moyen
+    cout_total FLOAT,              -- SUM(shipping_cost)
+    updated_at TIMESTAMP_NTZ
+);
+
+--2. Rafraîchissement incrémental (à chaque chargement)
+--Même principe que sales_cube.sql : seuls les jours postérieurs au dernier jour agrégé sont recalculés,
+--avec 3 jours de recouvrement pour les expéditions arrivées en retard.
+MERGE INTO ANALYTICS.LOGISTICS_DAILY c
+USING (
+    SELECT
+        ship_date,
+        destination_region,
+        shipping_method,
+        DATEDIFF('day', ship_date, estimated_delivery) AS delivery_days,
+        COUNT(*) AS nb_expeditions,
+        COUNT(CASE WHEN status = 'Returned' THEN 1 END) AS nb_retours,
+        COUNT(shipping_cost) AS nb_couts,
+        COALESCE(SUM(shipping_cost), 0) AS cout_total
+    FROM SILVER.LOGISTICS_AND_SHIPPING_CLEAN
+    WHERE ship_date >= (
+        SELECT COALESCE(DATEADD('day', -3, MAX(ship_date)), '1900-01-01'::DATE)
+        FROM ANALYTICS.LOGISTICS_DAILY
+    )
+    GROUP BY 1, 2, 3, 4
+) s
+    ON c.ship_date = s.ship_date
+    AND EQUAL_NULL(c.destination_region, s.destination_region)
+    AND EQUAL_NULL(c.shipping_method, s.shipping_method)
+    AND EQUAL_NULL(c.delivery_days, s.delivery_days)
+WHEN MATCHED THEN UPDATE SET
+    nb_expeditions = s.nb_expeditions,
+    nb_retours = s.nb_retours,
+    nb_couts = s.nb_couts,
+    cout_total = s.cout_total,
+    updated_at = CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+WHEN NOT MATCHED THEN INSERT (ship_date, destination_region, shipping_method, delivery_days,
+                              nb_expeditions, nb_retours, nb_couts, cout_total, updated_at)
+VALUES (s.ship_date, s.destination_region, s.shipping_method, s.delivery_days,
+        s.nb_expeditions, s.nb_retours, s.nb_couts, s.cout_total, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ);
+
+--3. Reconstruction complète (uniquement si SILVER.LOGISTICS_AND_SHIPPING_CLEAN a été corrigée dans le passé)
+-- TRUNCATE TABLE ANALYTICS.LOGISTICS_DAILY;   -- puis relancer le MERGE ci-dessus
+
+--Vérification : le cube doit retrouver le nombre d'expéditions et de retours de la table source
+SELECT
+    (SELECT SUM(nb_expeditions) FROM ANALYTICS.LOGISTICS_DAILY) AS expeditions_cube,
+    (SELECT COUNT(*) FROM SILVER.LOGISTICS_AND_SHIPPING_CLEAN WHERE ship_date IS NOT NULL) AS expeditions_source,
+    (SELECT SUM(nb_retours) FROM ANALYTICS.LOGISTICS_DAILY) AS retours_cube,
+    (SELECT COUNT(*) FROM SILVER.LOGISTICS_AND_SHIPPING_CLEAN WHERE ship_date IS NOT NULL AND status = 'Returned') AS retours_source;
+
+--Exemple : p50 / p90 / p99 du délai de livraison par mode d'expédition sur une période quelconque
+WITH histogramme AS (
+    SELECT shipping_method, delivery_days, SUM(nb_expeditions) AS nb
+    FROM ANALYTICS.LOGISTICS_DAILY
+    WHERE ship_date BETWEEN '2024-01-01' AND '2024-03-31'
+      AND delivery_days IS NOT NULL
+    GROUP BY 1, 2
+),
+cumul AS (
+    SELECT
+        *,
+        SUM(nb) OVER (PARTITION BY shipping_method ORDER BY delivery_days ROWS UNBOUNDED PRECEDING) AS nb_cumule,
+        SUM(nb) OVER (PARTITION BY shipping_method) AS nb_total
+    FROM histogramme
+)
+SELECT
+    shipping_method,
+    MIN(CASE WHEN nb_cumule >= 0.50 * nb_total THEN delivery_days END) AS p50_jours,
+    MIN(CASE WHEN nb_cumule >= 0.90 * nb_total THEN delivery_days END) AS p90_jours,
+    MIN(CASE WHEN nb_cumule >= 0.99 * nb_total THEN delivery_days END) AS p99_jours
+FROM cumul
+GROUP BY 1;
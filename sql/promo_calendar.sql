@@ -0,0 +1,84 @@
+-- Phase 2 – Calendriers promotions / campagnes-------------------------------------------------------------------------------------
+
+--Pourquoi : rattacher une vente à une promotion ou à une campagne demandait une jointure par intervalle
+--(UPPER(TRIM(region)) + BETWEEN start_date AND end_date) sur toute la table des transactions, à chaque chargement de page.
+--Objectif : déplier une fois pour toutes chaque promotion / campagne en une ligne par (région, jour) actif.
+--L'attribution devient une équi-jointure sur (region_key, jour), que Snowflake sait élaguer.
+--À relancer après clean_data.sql (les tables sources sont petites : reconstruction complète).
+USE DATABASE ANYCOMPANY_LAB;
+
+--1. Calendrier des promotions : une ligne par (region_key, jour, promotion_id)
+CREATE OR REPLACE TABLE ANALYTICS.PROMO_CALENDAR AS
+WITH promos AS (
+    SELECT
+        promotion_id,
+        product_category,
+        promotion_type,
+        discount_percentage,
+        UPPER(TRIM(region)) AS region_key,
+        start_date,
+        end_date
+    FROM SILVER.PROMOTIONS_DATA_CLEAN
+    WHERE start_date IS NOT NULL
+      AND end_date >= start_date
+),
+decalages AS (
+    -- 0, 1, 2, ... : couvre des périodes jusqu'à 10 ans
+    SELECT ROW_NUMBER() OVER (ORDER BY SEQ4()) - 1 AS decalage
+    FROM TABLE(GENERATOR(ROWCOUNT => 3660))
+)
+SELECT
+    p.region_key,
+    DATEADD('day', d.decalage, p.start_date) AS jour,
+    p.promotion_id,
+    p.product_category,
+    p.promotion_type,
+    p.discount_percentage
+FROM promos p
+JOIN decalages d
+    ON d.decalage <= DATEDIFF('day', p.start_date, p.end_date)
+ORDER BY jour, region_key;
+
+--2. Calendrier des campagnes marketing : une ligne par (region_key, jour, campaign_id)
+CREATE OR REPLACE TABLE ANALYTICS.CAMPAIGN_CALENDAR AS
+WITH campagnes AS (
+    SELECT
+        campaign_id,
+        campaign_type,
+        product_category,
+        budget,
+        conversion_rate,
+        UPPER(TRIM(region)) AS region_key,
+        start_date,
+        end_date
+    FROM SILVER.MARKETING_CAMPAIGNS_CLEAN
+    WHERE start_date IS NOT NULL
+      AND end_date >= start_date
+),
+decalages AS (
+    SELECT ROW_NUMBER() OVER (ORDER BY SEQ4()) - 1 AS decalage
+    FROM TABLE(GENERATOR(ROWCOUNT => 3660))
+)
+SELECT
+    c.region_key,
+    DATEADD('day', d.decalage, c.start_date) AS jour,
+    c.campaign_id,
+    c.campaign_type,
+    c.product_category,
+    c.budget,
+    c.conversion_rate
+FROM campagnes c
+JOIN decalages d
+    ON d.decalage <= DATEDIFF('day', c.start_date, c.end_date)
+ORDER BY jour, region_key;
+
+--Vérification : une promotion de N jours doit apparaître sur N lignes
+SELECT
+    p.promotion_id,
+    DATEDIFF('day', p.start_date, p.end_date) + 1 AS jours_attendus,
+    COUNT(c.jour) AS jours_calendrier
+FROM SILVER.PROMOTIONS_DATA_CLEAN p
+LEFT JOIN ANALYTICS.PROMO_CALENDAR c ON c.promotion_id = p.promotion_id
+WHERE p.end_date >= p.start_date
+GROUP BY 1, 2
+HAVING jours_attendus <> jours_calendrier;
@@ -0,0 +1,63 @@
+-- Phase 2 – Agrégats de ventes pour les dashboards----------------------------------------------------------------------------------
+
+--Cube journalier ANALYTICS.DAILY_SALES_CUBE---------------------------------------------------------------------------------------
+--Grain : (jour, region, transaction_type). Les dashboards lisent ce cube au lieu de scanner SILVER.FINANCIAL_TRANSACTIONS_CLEAN :
+--le coût d'une page dépend alors du nombre de jours × régions, et non plus du nombre de transactions.
+--On stocke des mesures additives (sommes et comptages) pour pouvoir ré-agréger au mois, à l'année ou à la région ;
+--une moyenne se recalcule par montant_total / nb_montants.
+--Les transactions sans transaction_date n'entrent pas dans le cube (aucun jour auquel les rattacher) :
+--elles sont exclues explicitement du MERGE comme de la vérification.
+USE DATABASE ANYCOMPANY_LAB;
+
+--1. Création du cube (une seule fois)
+CREATE TABLE IF NOT EXISTS ANALYTICS.DAILY_SALES_CUBE (
+    jour DATE,
+    region TEXT,
+    transaction_type TEXT,
+    nb_transactions NUMBER,      -- COUNT(*) : transaction_id est déjà dédoublonné dans SILVER
+    nb_montants NUMBER,          -- COUNT(amount) : dénominateur des paniers moyens
+    montant_total NUMBER(18,2),  -- SUM(amount)
+    updated_at TIMESTAMP_NTZ
+);
+
+--2. Rafraîchissement incrémental (à chaque chargement)
+--On ne recalcule que les jours postérieurs au dernier jour déjà agrégé, avec 3 jours de recouvrement
+--pour absorber les transactions arrivées en retard. Les jours déjà présents sont mis à jour, les nouveaux insérés.
+MERGE INTO ANALYTICS.DAILY_SALES_CUBE c
+USING (
+    SELECT
+        transaction_date AS jour,
+        region,
+        transaction_type,
+        COUNT(*) AS nb_transactions,
+        COUNT(amount) AS nb_montants,
+        COALESCE(SUM(amount), 0) AS montant_total
+    FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+    WHERE transaction_date IS NOT NULL
+    AND transaction_date >= (
+        SELECT COALESCE(DATEADD('day', -3, MAX(jour)), '1900-01-01'::DATE)
+        FROM ANALYTICS.DAILY_SALES_CUBE
+    )
+    GROUP BY 1, 2, 3
+) s
+    ON c.jour = s.jour
+    AND EQUAL_NULL(c.region, s.region)
+    AND EQUAL_NULL(c.transaction_type, s.transaction_type)
+WHEN MATCHED THEN UPDATE SET
+    nb_transactions = s.nb_transactions,
+    nb_montants = s.nb_montants,
+    montant_total = s.montant_total,
+    updated_at = CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+WHEN NOT MATCHED THEN INSERT (jour, region, transaction_type, nb_transactions, nb_montants, montant_total, updated_at)
+VALUES (s.jour, s.region, s.transaction_type, s.nb_transactions, s.nb_montants, s.montant_total, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ);
+
+--3. Reconstruction complète (uniquement si SILVER.FINANCIAL_TRANSACTIONS_CLEAN a été corrigée dans le passé)
+-- TRUNCATE TABLE ANALYTICS.DAILY_SALES_CUBE;   -- puis relancer le MERGE ci-dessus
+
+--Vérification : le cube doit retrouver exactement les totaux de la table source (hors transactions sans date)
+SELECT
+    (SELECT SUM(montant_total) FROM ANALYTICS.DAILY_SALES_CUBE WHERE transaction_type = 'Sale') AS ca_cube,
+    (SELECT SUM(amount) FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+     WHERE transaction_type = 'Sale' AND transaction_date IS NOT NULL) AS ca_source,
+    (SELECT COUNT(*) FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+     WHERE transaction_type = 'Sale' AND transaction_date IS NULL) AS nb_ventes_sans_date;
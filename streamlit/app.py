@@ -0,0 +1,20 @@
+"""Point d'entrée unique des trois dashboards (navigation multipage).
+
+    streamlit run streamlit/app.py
+
+Chaque page n'exécute que l'onglet affiché (voir db.lazy_sections) : changer de
+page ou d'onglet ne lance que les requêtes de la section qui s'affiche, et le
+cache de db.run_query sert les suivantes.
+"""
+import streamlit as st
+
+st.set_page_config(page_title="AnyCompany Food & Beverage", layout="wide", page_icon="📊")
+
+# url_path = nom du script : le journal des temps de requête (perf.py) garde les mêmes noms de page
+page = st.navigation([
+    st.Page("sales_dashboard.py", title="Ventes & clients", icon="📊", url_path="sales_dashboard", default=True),
+    st.Page("promotion_analysis.py", title="Promotions & logistique", icon="🏷️", url_path="promotion_analysis"),
+    st.Page("marketing_roi.py", title="Marketing ROI", icon="💰", url_path="marketing_roi"),
+])
+st.session_state["_page"] = page.url_path
+page.run()
@@ -0,0 +1,134 @@
+"""Mode approché : KPI globaux estimés à partir des résumés par strate, avec leur marge d'erreur.
+
+Entrées (tables de pipeline/kpi_sketches.py) : les strates (source × région × mois)
+qui touchent la période choisie, avec comptages, sommes et registres HyperLogLog,
+et les lignes d'échantillon comprises dans la période pour les mois qu'elle coupe.
+
+- Mois entièrement compris dans la période : comptages et sommes exacts (somme
+  des strates) ; identifiants distincts estimés par HyperLogLog sur les registres
+  fusionnés (maximum registre par registre), écart-type relatif 1,04 / √m.
+- Mois coupés (premier et dernier mois de la période) : une strate de N lignes a
+  un échantillon aléatoire de n lignes ; sa part dans la période est estimée par
+  N / n × Σ (lignes de l'échantillon dans la période), de variance
+  N² (1 − n / N) s² / n (estimateur stratifié). Les identifiants étant uniques dans
+  SILVER, leurs distincts sur ces jours-là sont estimés de la même façon.
+- Moyennes et taux (note, panier, taux de résolution) : estimateur par le ratio,
+  variance par linéarisation.
+
+Chaque KPI est renvoyé avec sa marge à 95 % (± 1,96 écart-type) : nulle pour les
+comptages et sommes quand la période tombe sur des mois entiers.
+"""
+import numpy as np
+import pandas as pd
+
+REGISTRES = 2048                # = kpi_sketches.REGISTRES
+TAILLE_ECHANTILLON = 500        # = kpi_sketches.TAILLE_ECHANTILLON
+Z = 1.96
+
+
+def mois_coupes(date_min, date_max):
+    """Premiers jours des mois que la période ne couvre qu'en partie (aucun si la période n'est pas filtrée)."""
+    if date_min is None:
+        return []
+    debut, fin = pd.Timestamp(date_min), pd.Timestamp(date_max)
+    coupes = set()
+    if debut.day != 1:
+        coupes.add(debut.replace(day=1).date())
+    if not fin.is_month_end:
+        coupes.add(fin.replace(day=1).date())
+    return sorted(coupes)
+
+
+def hll_estimate(registres):
+    """Nombre de distincts estimé à partir de registres HyperLogLog (strates × REGISTRES), fusionnés par maximum."""
+    if len(registres) == 0:
+        return 0.0
+    fusion = registres.max(axis=0).astype(np.float64)
+    m = fusion.size
+    alpha = 0.7213 / (1 + 1.079 / m)
+    brut = alpha * m * m / np.sum(2.0 ** -fusion)
+    vides = np.count_nonzero(fusion == 0)
+    if brut <= 2.5 * m and vides:
+        return m * np.log(m / vides)    # petites cardinalités : comptage linéaire
+    return brut
+
+
+def _decode(hexa):
+    if len(hexa) == 0:
+        return np.empty((0, REGISTRES), dtype=np.uint8)
+    return np.frombuffer(bytes.fromhex("".join(hexa)), dtype=np.uint8).reshape(-1, REGISTRES)
+
+
+def _stratified(strate, population, tirage, y):
+    """Total estimé de `y` (une valeur par ligne d'échantillon dans la période) et sa variance.
+
+    `strate` : indice de la strate de chaque ligne ; `population` / `tirage` : N et n
+    de chaque strate. Les lignes tirées hors période comptent pour 0.
+    """
+    k = len(population)
+    somme = np.bincount(strate, y, k)
+    carres = np.bincount(strate, y * y, k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s2 = np.where(tirage > 1, (carres - somme ** 2 / tirage) / (tirage - 1), 0.0)
+        total = np.sum(np.where(tirage > 0, population / tirage * somme, 0.0))
+        variance = np.sum(np.where(tirage > 0, population ** 2 * (1 - tirage / population) * s2 / tirage, 0.0))
+    return total, max(variance, 0.0)
+
+
+def estimate(strates, echantillon=None, date_min=None, date_max=None):
+    """KPI d'une source sur la sélection : {nom: (valeur, marge à 95 %)}.
+
+    `strates` : lignes (REGION_KEY, MOIS, NB, NB_VALEURS, SOMME, NB_CIBLE, REGISTRES)
+    des mois qui touchent la période ; `echantillon` : lignes (REGION_KEY, MOIS, JOUR,
+    VALEUR, CIBLE) comprises dans la période, pour les mois coupés.
+    KPI : nb, distincts, nb_valeurs, somme, moyenne (somme / nb_valeurs), nb_cible, taux_cible (nb_cible / nb).
+    """
+    strates = strates.assign(MOIS=pd.to_datetime(strates["MOIS"]))
+    if date_min is None:
+        complet = np.ones(len(strates), dtype=bool)
+    else:
+        fin_mois = strates["MOIS"] + pd.offsets.MonthEnd(0)
+        complet = ((strates["MOIS"] >= pd.Timestamp(date_min)) & (fin_mois <= pd.Timestamp(date_max))).to_numpy()
+    pleins, coupes = strates[complet], strates[~complet].reset_index(drop=True)
+
+    exact = {c: float(pleins[c].astype(np.float64).sum()) for c in ("NB", "NB_VALEURS", "SOMME", "NB_CIBLE")}
+
+    # lignes d'échantillon rattachées à leur strate coupée
+    if echantillon is None or echantillon.empty or coupes.empty:
+        echantillon = pd.DataFrame({"VALEUR": pd.Series(dtype=np.float64), "CIBLE": pd.Series(dtype=np.float64)})
+        strate = np.empty(0, dtype=np.int64)
+    else:
+        index = pd.MultiIndex.from_frame(coupes[["REGION_KEY", "MOIS"]])
+        strate = index.get_indexer(pd.MultiIndex.from_arrays(
+            [echantillon["REGION_KEY"].to_numpy(), pd.to_datetime(echantillon["MOIS"]).to_numpy()]))
+        echantillon, strate = echantillon[strate >= 0], strate[strate >= 0]
+    population = coupes["NB"].to_numpy(dtype=np.float64)
+    tirage = np.minimum(population, TAILLE_ECHANTILLON)
+
+    valeurs = echantillon["VALEUR"].to_numpy(dtype=np.float64)
+    y = {
+        "NB": np.ones(len(valeurs)),
+        "NB_VALEURS": (~np.isnan(valeurs)).astype(np.float64),
+        "SOMME": np.nan_to_num(valeurs),
+        "NB_CIBLE": echantillon["CIBLE"].to_numpy(dtype=np.float64),
+    }
+    totaux, variances = {}, {}
+    for c, values in y.items():
+        partiel, variances[c] = _stratified(strate, population, tirage, values)
+        totaux[c] = exact[c] + partiel
+
+    def ratio(numerateur, denominateur):
+        if totaux[denominateur] <= 0:
+            return np.nan, np.nan
+        r = totaux[numerateur] / totaux[denominateur]
+        _, v = _stratified(strate, population, tirage, y[numerateur] - r * y[denominateur])
+        return r, Z * np.sqrt(v) / totaux[denominateur]
+
+    distincts = hll_estimate(_decode(pleins["REGISTRES"].tolist()))
+    variance_distincts = (1.04 / np.sqrt(REGISTRES) * distincts) ** 2 + variances["NB"]
+
+    result = {c.lower(): (totaux[c], Z * np.sqrt(variances[c])) for c in totaux}
+    result["distincts"] = (distincts + totaux["NB"] - exact["NB"], Z * np.sqrt(variance_distincts))
+    result["moyenne"] = ratio("SOMME", "NB_VALEURS")
+    result["taux_cible"] = ratio("NB_CIBLE", "NB")
+    return result
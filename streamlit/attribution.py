@@ -0,0 +1,115 @@
+"""Attribution des ventes aux campagnes marketing et ROI par campagne / par canal.
+
+Entrées : les ventes journalières par région (uplift.prepare_daily), le calendrier
+des campagnes (ANALYTICS.CAMPAIGN_CALENDAR : une ligne par région, jour et
+campagne active) et la liste des campagnes (budget, dates, type...).
+
+L'ancienne requête joignait chaque campagne à chaque transaction de sa région et
+de sa période, puis divisait SUM(montant) par SUM(budget) : le budget d'une
+campagne était compté une fois par transaction, et le CA d'un jour couvert par
+deux campagnes était compté deux fois. Ici :
+- les ventes restent agrégées par (région, jour) ;
+- chaque cellule (région, jour) est répartie entre ses campagnes actives selon
+  une règle (parts dont la somme vaut 1) :
+    « egal »    : parts égales ;
+    « budget »  : au prorata du budget journalier (budget / durée) de chaque campagne ;
+    « dernier » : tout à la campagne lancée le plus récemment (égalité : parts égales) ;
+- le budget de chaque campagne n'est compté qu'une fois, au prorata de ses jours
+  compris dans la sélection (filtres de période et de région).
+
+Tout est calculé sur des tableaux NumPy (np.bincount par cellule, par campagne,
+par canal), sans déplier les transactions.
+"""
+import numpy as np
+import pandas as pd
+
+REGLES = ("egal", "budget", "dernier")
+
+
+def _shares(cells, n_cells, daily_budget, starts, rule):
+    """Part de chaque ligne du calendrier dans la vente de sa cellule (région, jour)."""
+    if rule == "egal":
+        weights = np.ones(len(cells))
+    elif rule == "budget":
+        weights = np.nan_to_num(daily_budget, nan=0.0)
+        # cellule dont aucune campagne n'a de budget : parts égales
+        no_budget = np.bincount(cells, weights, n_cells)[cells] == 0
+        weights = np.where(no_budget, 1.0, weights)
+    elif rule == "dernier":
+        latest = np.full(n_cells, np.iinfo(np.int64).min)
+        np.maximum.at(latest, cells, starts)
+        weights = (starts == latest[cells]).astype(np.float64)
+    else:
+        raise ValueError(f"Règle d'attribution inconnue : {rule} (attendu : {', '.join(REGLES)})")
+    return weights / np.bincount(cells, weights, n_cells)[cells]
+
+
+def attribute(daily, calendar, campaigns, rule="egal"):
+    """ROI de chaque campagne (DataFrame, une ligne par campagne active dans la sélection).
+
+    `daily` : sortie de uplift.prepare_daily (REGION_KEY, JOUR, MONTANT_TOTAL, NB_MONTANTS) ;
+    `calendar` : lignes (REGION_KEY, JOUR, CAMPAIGN_ID) ; `campaigns` : une ligne par campagne
+    (CAMPAIGN_ID, CAMPAIGN_TYPE, BUDGET, CONVERSION_RATE, START_DATE, END_DATE).
+    """
+    columns = ["CAMPAIGN_ID", "CAMPAIGN_TYPE", "NB_JOURS", "BUDGET_PERIODE", "CA_ATTRIBUE",
+               "NB_MONTANTS_ATTRIBUES", "CONVERSION_RATE", "ROI"]
+    campaigns = campaigns.drop_duplicates("CAMPAIGN_ID").set_index("CAMPAIGN_ID")
+    calendar = calendar[calendar["CAMPAIGN_ID"].isin(campaigns.index)]
+    if calendar.empty:
+        return pd.DataFrame(columns=columns)
+
+    # cellule (région, jour) de chaque ligne du calendrier, -1 si aucune vente ce jour-là
+    daily = daily.reset_index(drop=True)
+    cell_index = pd.MultiIndex.from_frame(daily[["REGION_KEY", "JOUR"]])
+    cells = cell_index.get_indexer(pd.MultiIndex.from_arrays(
+        [calendar["REGION_KEY"].to_numpy(), pd.to_datetime(calendar["JOUR"]).to_numpy()]))
+
+    ids, id_codes = np.unique(calendar["CAMPAIGN_ID"].to_numpy(), return_inverse=True)
+    info = campaigns.loc[ids]
+    start = pd.to_datetime(info["START_DATE"]).to_numpy().astype("datetime64[D]")
+    end = pd.to_datetime(info["END_DATE"]).to_numpy().astype("datetime64[D]")
+    duration = (end - start).astype(np.int64) + 1
+    budget = info["BUDGET"].to_numpy(dtype=np.float64)
+    daily_budget = budget / duration
+    active_days = np.bincount(id_codes, minlength=len(ids))
+
+    sold = cells >= 0
+    cells, codes = cells[sold], id_codes[sold]
+    shares = _shares(cells, len(daily), daily_budget[codes], start.astype(np.int64)[codes], rule)
+    amounts = daily["MONTANT_TOTAL"].to_numpy(dtype=np.float64)
+    counts = daily["NB_MONTANTS"].to_numpy(dtype=np.float64)
+
+    result = pd.DataFrame({
+        "CAMPAIGN_ID": ids,
+        "CAMPAIGN_TYPE": info["CAMPAIGN_TYPE"].to_numpy(),
+        "NB_JOURS": active_days,
+        # budget compté une fois, au prorata des jours de la campagne dans la sélection
+        "BUDGET_PERIODE": daily_budget * active_days,
+        "CA_ATTRIBUE": np.bincount(codes, amounts[cells] * shares, len(ids)),
+        "NB_MONTANTS_ATTRIBUES": np.bincount(codes, counts[cells] * shares, len(ids)),
+        "CONVERSION_RATE": info["CONVERSION_RATE"].to_numpy(dtype=np.float64),
+    })
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result["ROI"] = result["CA_ATTRIBUE"] / result["BUDGET_PERIODE"].where(result["BUDGET_PERIODE"] > 0)
+    return result[columns]
+
+
+def roi_by_type(per_campaign):
+    """Agrégat par CAMPAIGN_TYPE des résultats de attribute() (mêmes noms de colonnes que la page)."""
+    grouped = per_campaign.groupby("CAMPAIGN_TYPE", as_index=False, observed=True).agg(
+        NB_CAMPAGNES=("CAMPAIGN_ID", "size"),
+        TAUX_CONV=("CONVERSION_RATE", "mean"),
+        BUDGET_PERIODE=("BUDGET_PERIODE", "sum"),
+        CA_ATTRIBUE=("CA_ATTRIBUE", "sum"),
+        NB_MONTANTS=("NB_MONTANTS_ATTRIBUES", "sum"),
+    )
+    budget = grouped["BUDGET_PERIODE"].where(grouped["BUDGET_PERIODE"] > 0)
+    montants = grouped["NB_MONTANTS"].where(grouped["NB_MONTANTS"] > 0)
+    result = grouped.assign(
+        TAUX_CONV_THEORIQUE_PCT=(grouped["TAUX_CONV"] * 100).round(2),
+        ROI_CALCULE=(grouped["CA_ATTRIBUE"] / budget).round(4),
+        PANIER_MOYEN_PAR_CANAL=(grouped["CA_ATTRIBUE"] / montants).round(2),
+    )
+    return result[["CAMPAIGN_TYPE", "NB_CAMPAGNES", "TAUX_CONV_THEORIQUE_PCT", "ROI_CALCULE",
+                   "PANIER_MOYEN_PAR_CANAL", "BUDGET_PERIODE", "CA_ATTRIBUE"]] \
+        .sort_values("TAUX_CONV_THEORIQUE_PCT", ascending=False, ignore_index=True)
@@ -0,0 +1,101 @@
+"""Fiches client : lectures ponctuelles dans ANALYTICS.CUSTOMER_FEATURES, avec cache local.
+
+Les caractéristiques de chaque client (pipeline/customer_features.py) sont
+gardées dans un cache SQLite indexé par customer_id, partagé par toutes les
+sessions : une fiche déjà consultée se relit sans requête tant qu'elle a moins
+de CACHE_TTL secondes ; seuls les identifiants absents ou périmés partent au
+warehouse, en une seule requête.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from db import CACHE_TTL, ROOT, run_query
+
+DEFAULT_CACHE = ROOT / "data" / "customer_cache.sqlite"
+
+# préfixe sql_ : {ids} est rempli par lookup(), le banc d'essai (query_* sans paramètres) l'ignore
+sql_fiches = """
+SELECT
+    customer_id, gender, marital_status, region, country, age, age_group,
+    annual_income, income_band, vip, computed_at
+FROM ANALYTICS.CUSTOMER_FEATURES
+WHERE customer_id IN ({ids});
+"""
+
+
+class CustomerCache:
+    """Cache local des fiches client, indexé par customer_id (SQLite)."""
+
+    def __init__(self, path=DEFAULT_CACHE, ttl=CACHE_TTL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fiches (customer_id INTEGER PRIMARY KEY, fiche TEXT, fetched_at REAL)"
+        )
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def get_many(self, ids):
+        """Fiches encore valides pour `ids`, indexées par customer_id (les absentes sont omises)."""
+        ids = list(ids)
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), 900):      # limite de variables d'une requête SQLite
+                batch = ids[i:i + 900]
+                marks = ", ".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT customer_id, fiche FROM fiches WHERE customer_id IN ({marks}) AND fetched_at >= ?",
+                    [*batch, time.time() - self.ttl],
+                ).fetchall()
+                found.update((customer_id, json.loads(fiche)) for customer_id, fiche in rows)
+        return found
+
+    def put_many(self, fiches):
+        """Enregistre des fiches (dicts de records(), une par client)."""
+        now = time.time()
+        rows = [(int(r["CUSTOMER_ID"]), json.dumps(r), now) for r in fiches]
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO fiches VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM fiches")
+            self.conn.commit()
+
+
+def records(fiches):
+    """Lignes d'un DataFrame de fiches en dicts JSON (dates ISO) : même forme qu'elles viennent
+    du warehouse ou du cache."""
+    return json.loads(fiches.to_json(orient="records", date_format="iso"))
+
+
+@st.cache_resource
+def get_customer_cache():
+    return CustomerCache()
+
+
+def lookup(customer_ids):
+    """Fiches des clients demandés (DataFrame), dans l'ordre de la demande ; les inconnus sont omis."""
+    ids = list(dict.fromkeys(int(i) for i in customer_ids))
+    if not ids:
+        return pd.DataFrame()
+    cache = get_customer_cache()
+    found = cache.get_many(ids)
+    missing = [i for i in ids if i not in found]
+    if missing:
+        fetched = run_query(sql_fiches.format(ids=", ".join("?" * len(missing))), tuple(missing),
+                            panel="Fiche client")
+        if not fetched.empty:
+            fiches = records(fetched)
+            cache.put_many(fiches)
+            found.update((int(r["CUSTOMER_ID"]), r) for r in fiches)
+    result = pd.DataFrame([found[i] for i in ids if i in found])
+    if "COMPUTED_AT" in result:
+        result["COMPUTED_AT"] = pd.to_datetime(result["COMPUTED_AT"])
+    return result
@@ -0,0 +1,362 @@
+"""Couche d'accès aux données partagée par les trois dashboards Streamlit.
+
+Elle porte la connexion Snowflake (autrefois copiée dans chaque script) et met en
+cache les résultats des requêtes, avec pour clé le texte SQL et ses paramètres :
+une interaction avec un widget ne relance plus le warehouse.
+
+Avec `backend = "duckdb"` (section [app] de secrets.toml, ou variable
+ANYCOMPANY_BACKEND), les mêmes requêtes tournent en local avec DuckDB sur le
+snapshot Parquet produit par pipeline/snapshot.py : aucune connexion réseau.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import perf
+from gateway import QueryGateway
+
+
+def _secrets_section(name):
+    """Section optionnelle de .streamlit/secrets.toml ({} si absente)."""
+    try:
+        return dict(st.secrets.get(name, {}))
+    except FileNotFoundError:
+        return {}
+
+
+# ---------------------------------------------------------
+# Paramètres du cache (section [cache] de secrets.toml)
+# ---------------------------------------------------------
+_cache_conf = _secrets_section("cache")
+CACHE_TTL = int(_cache_conf.get("ttl", 600))                  # durée de vie d'un résultat (secondes)
+CACHE_MAX_ENTRIES = int(_cache_conf.get("max_entries", 128))  # au-delà, les plus anciens sont évincés
+
+# ---------------------------------------------------------
+# Choix du backend (section [app] de secrets.toml)
+# ---------------------------------------------------------
+ROOT = Path(__file__).resolve().parents[1]
+_app_conf = _secrets_section("app")
+BACKEND = os.environ.get("ANYCOMPANY_BACKEND", _app_conf.get("backend", "snowflake"))
+SNAPSHOT_DIR = ROOT / _app_conf.get("snapshot_dir", "data/snapshot")
+MAX_PARALLEL_QUERIES = int(_app_conf.get("max_parallel_queries", 8))   # threads de chargement des panneaux
+POOL_SIZE = int(_app_conf.get("pool_size", 4))                         # connexions au warehouse, toutes sessions
+
+# ---------------------------------------------------------
+# Journal des temps de requête (section [perf] de secrets.toml)
+# ---------------------------------------------------------
+_perf_conf = _secrets_section("perf")
+PERF_LOG = ROOT / _perf_conf.get("log_file", "data/query_log.jsonl")
+PERF_ENABLED = bool(_perf_conf.get("enabled", True))
+PERF_HISTORY_BYTES = int(_perf_conf.get("history_bytes", 5 << 20))    # fin du journal lue pour l'historique
+PERF_HISTORY_TTL = int(_perf_conf.get("history_ttl", 60))             # historique recalculé au plus une fois par période
+
+
+def _snowflake_connect():
+    import snowflake.connector
+
+    # variables liées « ? » comme DuckDB : les mêmes requêtes paramétrées servent aux deux backends
+    snowflake.connector.paramstyle = "qmark"
+    return snowflake.connector.connect(
+        user=st.secrets["snowflake"]["user"],
+        password=st.secrets["snowflake"]["password"],
+        account=st.secrets["snowflake"]["account"],
+        warehouse=st.secrets["snowflake"]["warehouse"],
+        database=st.secrets["snowflake"]["database"],
+        schema=st.secrets["snowflake"]["schema"]
+    )
+
+
+@st.cache_resource
+def get_duckdb_connection():
+    """Base DuckDB en mémoire dont les tables sont des vues sur le snapshot Parquet.
+
+    Le catalogue s'appelle ANYCOMPANY_LAB et le schéma courant est SILVER, comme
+    la connexion Snowflake : les requêtes des dashboards s'exécutent telles quelles
+    (sur un curseur obtenu par duckdb_cursor()).
+    """
+    import duckdb
+
+    if not SNAPSHOT_DIR.exists():
+        raise FileNotFoundError(f"Snapshot introuvable ({SNAPSHOT_DIR}) : lancer d'abord python pipeline/snapshot.py")
+    conn = duckdb.connect()
+    conn.execute("ATTACH ':memory:' AS ANYCOMPANY_LAB")
+    for schema_dir in sorted(p for p in SNAPSHOT_DIR.iterdir() if p.is_dir()):
+        conn.execute(f"CREATE SCHEMA IF NOT EXISTS ANYCOMPANY_LAB.{schema_dir.name}")
+        for table_dir in sorted(p for p in schema_dir.iterdir() if p.is_dir()):
+            files = (table_dir / "**" / "*.parquet").as_posix()
+            conn.execute(
+                f"CREATE VIEW ANYCOMPANY_LAB.{schema_dir.name}.{table_dir.name} AS "
+                f"SELECT * FROM read_parquet('{files}', hive_partitioning = true, union_by_name = true)"
+            )
+    conn.execute("CREATE SCHEMA IF NOT EXISTS ANYCOMPANY_LAB.SILVER")
+    conn.execute("USE ANYCOMPANY_LAB.SILVER")
+    return conn
+
+
+def duckdb_cursor():
+    """Curseur sur la base du snapshot, positionné sur ANYCOMPANY_LAB.SILVER.
+
+    Un curseur DuckDB ne reprend pas le USE de la connexion dont il est issu : sans
+    ce USE, il resterait sur le catalogue par défaut, où ANALYTICS n'existe pas.
+    """
+    cursor = get_duckdb_connection().cursor()
+    cursor.execute("USE ANYCOMPANY_LAB.SILVER")
+    return cursor
+
+
+def snapshot_info():
+    """Contenu du manifeste du snapshot (date de création, lignes par table), ou {}."""
+    manifest = SNAPSHOT_DIR / "_snapshot.json"
+    return json.loads(manifest.read_text()) if manifest.exists() else {}
+
+
+# ---------------------------------------------------------
+# Résultats : lots Arrow → DataFrame aux types compacts
+# ---------------------------------------------------------
+# Dimensions à peu de valeurs distinctes, répétées sur toutes les lignes
+CATEGORY_COLUMNS = {"REGION", "DESTINATION_REGION", "PRODUCT_CATEGORY", "SHIPPING_METHOD"}
+# En deçà, un float32 garde une erreur absolue < 0,01 : sans effet sur des taux, notes ou coûts unitaires
+FLOAT32_MAX = 1e5
+
+
+@st.cache_resource
+def get_gateway():
+    """Passerelle partagée par toutes les sessions du serveur : pool de connexions + fusion des requêtes."""
+    if BACKEND == "duckdb":
+        # un curseur DuckDB par connexion du pool, tous sur la même base en mémoire (et sur SILVER)
+        return QueryGateway(duckdb_cursor, POOL_SIZE)
+    return QueryGateway(_snowflake_connect, POOL_SIZE)
+
+
+def _arrow_result(conn, sql, params):
+    """Exécute `sql` et renvoie le résultat en table Arrow, sans passer par des tuples Python."""
+    if BACKEND == "duckdb":
+        # .arrow() renvoie un RecordBatchReader depuis DuckDB 1.4 : on demande une table ;
+        # to_arrow_table remplace fetch_arrow_table (obsolète) à partir de DuckDB 1.5
+        result = conn.execute(sql, params)
+        return result.to_arrow_table() if hasattr(result, "to_arrow_table") else result.fetch_arrow_table()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        table = cursor.fetch_arrow_all()
+        if table is None:   # résultat vide : le connecteur ne renvoie pas de lot
+            table = pa.table({d[0]: pa.array([], pa.null()) for d in cursor.description})
+        return table
+    finally:
+        cursor.close()
+
+
+def _decimals_to_numbers(table):
+    """NUMBER / DECIMAL → int64 si l'échelle est nulle (et que ça tient), float64 sinon."""
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_decimal(field.type):
+            try:
+                column = column.cast(pa.int64() if field.type.scale == 0 else pa.float64())
+            except pa.ArrowInvalid:
+                column = column.cast(pa.float64(), safe=False)
+        columns.append(column)
+    return pa.table(columns, names=[name.upper() for name in table.column_names])
+
+
+def _compact(df):
+    """Catégories pour les dimensions connues, float32 pour les petites valeurs décimales."""
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS and df[col].dtype == object:
+            df[col] = df[col].astype("category")
+        elif df[col].dtype == np.float64:
+            values = df[col].to_numpy()
+            finite = values[np.isfinite(values)]
+            if finite.size == 0 or np.abs(finite).max() < FLOAT32_MAX:
+                df[col] = values.astype(np.float32)
+    return df
+
+
+def _execute(sql, params):
+    # la table Arrow, immuable, peut être partagée entre sessions ; chacune en tire son propre DataFrame
+    table, _miss.shared = get_gateway().fetch((sql, params), lambda conn: _arrow_result(conn, sql, params))
+    # dates Arrow → datetime64 (et non des objets date Python)
+    df = _decimals_to_numbers(table).to_pandas(date_as_object=False, split_blocks=True)
+    return _compact(df)
+
+
+# _cached_query positionne `flag` quand le résultat ne vient pas du cache, et `shared`
+# quand il vient d'une exécution identique lancée par une autre session
+_miss = threading.local()
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_query(sql, params):
+    _miss.flag = True
+    return _execute(sql, params)
+
+
+def _page_name():
+    # app.py indique la page affichée ; sinon `streamlit run page.py` place le script de la page dans sys.argv[0]
+    return st.session_state.get("_page") or Path(sys.argv[0]).stem
+
+
+def _page_timings():
+    """Mesures de l'exécution en cours de la page (affichées par performance_panel)."""
+    return st.session_state.setdefault("_query_timings", [])
+
+
+def run_query(sql, params=None, panel=None):
+    """Exécute `sql` sur le backend, ou renvoie le résultat en cache s'il est encore frais.
+
+    Le cache est partagé entre les sessions : un même couple (SQL, paramètres)
+    n'est envoyé au warehouse qu'une fois par période de TTL.
+    `panel` nomme le panneau du dashboard dans le journal des temps de requête.
+    """
+    if isinstance(params, list):
+        params = tuple(params)
+    _miss.flag = False
+    _miss.shared = False
+    start = time.perf_counter()
+    df = _cached_query(sql, params)
+    if PERF_ENABLED:
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "page": _page_name(),
+            "panel": panel or sql.strip().splitlines()[0][:60],
+            "seconds": round(time.perf_counter() - start, 4),
+            "rows": len(df),
+            "bytes": int(df.memory_usage(deep=True).sum()),
+            "cache": ("shared" if _miss.shared else "miss") if _miss.flag else "hit",
+            "backend": BACKEND,
+        }
+        _page_timings().append(record)
+        perf.log_timing(record, PERF_LOG)
+    return df
+
+
+@st.cache_resource
+def _query_pool():
+    # Partagé entre les sessions : borne le nombre de requêtes envoyées en même temps au warehouse
+    return ThreadPoolExecutor(max_workers=MAX_PARALLEL_QUERIES, thread_name_prefix="panel-query")
+
+
+class PanelLoader:
+    """Requêtes d'une page, lancées à la demande et en parallèle.
+
+    `queries` associe un nom de panneau à un SQL (ou à un couple (SQL, paramètres)).
+    Rien ne part à la construction : chaque section annonce ses panneaux avec
+    prefetch(), qui les lance ensemble, puis lit chacun avec get(panneau). Une
+    section qui n'est pas affichée ne coûte donc aucune requête, et une section
+    affichée met le temps de sa requête la plus lente, non la somme de toutes.
+    """
+
+    def __init__(self, queries):
+        self._queries = queries
+        self._futures = {}
+
+    def prefetch(self, *panels):
+        """Lance en parallèle les requêtes des panneaux qui ne sont pas déjà partis."""
+        ctx = get_script_run_ctx()
+        pool = _query_pool()
+        for panel in panels:
+            if panel not in self._futures:
+                query = self._queries[panel]
+                sql, params = query if isinstance(query, tuple) else (query, None)
+                self._futures[panel] = pool.submit(self._run, ctx, sql, params, panel)
+
+    @staticmethod
+    def _run(ctx, sql, params, panel):
+        # le thread du pool agit pour le compte de la session (cache, session_state)
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return run_query(sql, params, panel)
+
+    def get(self, panel):
+        """Résultat du panneau ; affiche un indicateur de chargement tant qu'il n'est pas prêt."""
+        self.prefetch(panel)
+        future = self._futures[panel]
+        if future.done():
+            return future.result()
+        with st.spinner(f"Chargement : {panel}…"):
+            return future.result()
+
+
+def lazy_sections(sections, key):
+    """Onglets de la page, dont seul celui qui est affiché est exécuté.
+
+    st.tabs exécute le contenu de tous les onglets à chaque passage ; ici `sections`
+    associe un titre d'onglet à une fonction, et seule la fonction de l'onglet choisi
+    est appelée. Ses requêtes partent à son premier affichage, puis sont servies par
+    le cache ; une section décorée par @st.fragment ne se réexécute qu'elle-même
+    quand l'un de ses widgets change.
+    """
+    choice = st.radio("Section", list(sections), horizontal=True, key=key, label_visibility="collapsed")
+    sections[choice]()
+
+
+def clear_cache():
+    """Vide le cache des requêtes et celui des fiches client."""
+    from customer_store import get_customer_cache    # import local : customer_store importe db
+    _cached_query.clear()
+    get_customer_cache().clear()
+
+
+def refresh_button():
+    """Bouton « Rafraîchir » dans la barre latérale : vide le cache et relance la page."""
+    with st.sidebar:
+        if BACKEND == "duckdb":
+            created_at = snapshot_info().get("created_at", "date inconnue")
+            st.info(f"💾 Mode local : snapshot Parquet du {created_at}, sans connexion Snowflake.")
+        st.caption(f"Données mises en cache pendant {CACHE_TTL // 60} min.")
+        if st.button("🔄 Rafraîchir les données"):
+            clear_cache()
+            st.rerun()
+
+
+@st.cache_data(ttl=PERF_HISTORY_TTL, show_spinner=False)
+def _history():
+    # le journal grossit à chaque affichage : on n'en lit que la fin, et le résumé est
+    # partagé entre les pages et les sessions pendant PERF_HISTORY_TTL secondes
+    return perf.summarize(perf.load_log(PERF_LOG, tail_bytes=PERF_HISTORY_BYTES))
+
+
+def performance_panel():
+    """Panneau repliable, en bas de page : temps de chaque requête de cette exécution + p50 / p95 historiques."""
+    timings = _page_timings()
+    with st.expander("⏱️ Performance de la page"):
+        if not timings:
+            st.caption("Aucune requête mesurée.")
+        else:
+            df = pd.DataFrame(timings)
+            # les réexécutions de sections (@st.fragment) s'ajoutent jusqu'au prochain affichage complet
+            st.caption(
+                f"{len(df)} requêtes depuis le dernier affichage complet de la page : "
+                f"{(df['cache'] == 'miss').sum()} envoyées au warehouse, "
+                f"{(df['cache'] == 'hit').sum()} servies par le cache, "
+                f"{(df['cache'] == 'shared').sum()} partagées avec une autre session – "
+                f"la plus lente : {df['seconds'].max():.2f} s ({df['seconds'].sum():.2f} s cumulées)."
+            )
+            st.dataframe(
+                df.assign(ms=(df["seconds"] * 1000).round(1), ko=(df["bytes"] / 1024).round(1))
+                  [["panel", "ms", "rows", "ko", "cache"]]
+                  .sort_values("ms", ascending=False),
+                hide_index=True,
+            )
+        history = _history()
+        history = history[history["page"] == _page_name()]
+        if not history.empty:
+            st.caption(f"Historique récent (fin du journal local, mis à jour toutes les {PERF_HISTORY_TTL} s) : "
+                       "p50 / p95 par panneau")
+            st.dataframe(history.drop(columns="page"), hide_index=True)
+        stats = get_gateway().stats()
+        st.caption(
+            f"Passerelle (depuis le démarrage du serveur) : {stats['executees']} requêtes envoyées au warehouse, "
+            f"{stats['fusionnees']} fusionnées avec une requête identique en cours, pool de {stats['pool']} connexions."
+        )
+    timings.clear()
@@ -0,0 +1,106 @@
+"""Filtres globaux des dashboards (période, régions, catégories), appliqués côté warehouse.
+
+Les requêtes des pages contiennent des emplacements nommés, par exemple :
+
+    WHERE transaction_type = 'Sale' AND {ventes}
+
+Filters.bind() remplace chaque emplacement par la condition correspondant à la
+sélection de l'utilisateur, avec des variables liées (« ? ») : le texte SQL ne
+dépend que de la forme de la sélection, les valeurs passent en paramètres.
+Le cache de db.run_query est donc indexé par jeu de paramètres, et seules les
+lignes utiles quittent le warehouse.
+"""
+import string
+from dataclasses import dataclass
+from datetime import date
+
+import streamlit as st
+
+from db import run_query
+
+query_periode = """
+SELECT MIN(jour) AS date_min, MAX(jour) AS date_max
+FROM ANALYTICS.DAILY_SALES_CUBE;
+"""
+
+query_regions = """
+SELECT DISTINCT TRIM(region) AS region
+FROM ANALYTICS.DAILY_SALES_CUBE
+WHERE region IS NOT NULL
+ORDER BY 1;
+"""
+
+query_categories = """
+SELECT DISTINCT product_category
+FROM ANALYTICS.PROMO_CALENDAR
+WHERE product_category IS NOT NULL
+ORDER BY 1;
+"""
+
+
+def _marks(values):
+    return ", ".join("?" * len(values))
+
+
+@dataclass(frozen=True)
+class Filters:
+    date_min: date = None       # None : toute la période (aucune condition)
+    date_max: date = None
+    regions: tuple = ()         # () : toutes les régions
+    categories: tuple = ()      # () : toutes les catégories
+
+    def clause(self, date=None, region=None, category=None):
+        """Condition SQL sur les colonnes indiquées, et ses paramètres (« TRUE » si rien n'est filtré)."""
+        conditions, params = [], []
+        if date and self.date_min is not None:
+            conditions.append(f"{date} BETWEEN ? AND ?")
+            params += [self.date_min, self.date_max]
+        if region and self.regions:
+            # les régions sont comparées normalisées, comme dans les calendriers promo / campagnes
+            conditions.append(f"UPPER(TRIM({region})) IN ({_marks(self.regions)})")
+            params += [r.strip().upper() for r in self.regions]
+        if category and self.categories:
+            conditions.append(f"{category} IN ({_marks(self.categories)})")
+            params += list(self.categories)
+        return " AND ".join(conditions) or "TRUE", params
+
+    def bind(self, template, **fields):
+        """(SQL, paramètres) : chaque {emplacement} du modèle devient la condition de `fields[emplacement]`.
+
+        Exemple : filters.bind(sql, ventes=dict(date="jour", region="region")).
+        Les paramètres sont rangés dans l'ordre d'apparition des emplacements.
+        """
+        parts, params = [], []
+        for literal, field, _spec, _conversion in string.Formatter().parse(template):
+            parts.append(literal)
+            if field is not None:
+                clause, values = self.clause(**fields[field])
+                parts.append(clause)
+                params += values
+        return "".join(parts), tuple(params)
+
+
+def region_options():
+    return run_query(query_regions, panel="Filtres")["REGION"].tolist()
+
+
+def sidebar_filters(categories=False):
+    """Widgets de filtre dans la barre latérale ; la sélection s'applique à tous les panneaux de la page."""
+    periode_totale = run_query(query_periode, panel="Filtres").iloc[0]
+    first, last = periode_totale["DATE_MIN"].date(), periode_totale["DATE_MAX"].date()
+    regions = region_options()
+
+    with st.sidebar:
+        st.subheader("🔎 Filtres")
+        periode = st.date_input("Période", value=(first, last), min_value=first, max_value=last)
+        regions_sel = st.multiselect("Régions", regions, placeholder="Toutes les régions")
+        categories_sel = []
+        if categories:
+            liste = run_query(query_categories, panel="Filtres")["PRODUCT_CATEGORY"].tolist()
+            categories_sel = st.multiselect("Catégories produit", liste, placeholder="Toutes les catégories")
+
+    # pendant la saisie, date_input ne renvoie que la date de début : on garde toute la période
+    date_min, date_max = periode if len(periode) == 2 else (first, last)
+    if (date_min, date_max) == (first, last):
+        date_min = date_max = None
+    return Filters(date_min, date_max, tuple(regions_sel), tuple(categories_sel))
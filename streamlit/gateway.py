@@ -0,0 +1,105 @@
+"""Passerelle unique entre les sessions Streamlit et le warehouse.
+
+Toutes les sessions d'un même serveur Streamlit passent par une seule instance
+(créée par db.get_gateway) :
+- une requête identique (même SQL, mêmes paramètres) déjà en cours n'est pas
+  relancée : les sessions arrivées pendant l'exécution attendent et partagent
+  son résultat (« single flight ») ;
+- les connexions sont prises dans un pool borné : au plus `size` requêtes
+  touchent le warehouse en même temps, quel que soit le nombre d'utilisateurs.
+
+Le cache des résultats (st.cache_data, dans db.py) reste au-dessus : la
+passerelle ne voit que les requêtes qu'il n'a pas pu servir.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Pool de connexions créé à la demande, borné à `size` connexions."""
+
+    def __init__(self, factory, size=4):
+        self._factory = factory
+        self._idle = queue.LifoQueue()              # la plus récemment rendue d'abord : sessions encore chaudes
+        self._slots = threading.BoundedSemaphore(size)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._factory()
+            try:
+                yield conn
+            except Exception:
+                # connexion peut-être inutilisable (réseau, session expirée) : on ne la remet pas dans le pool
+                _close_quietly(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                _close_quietly(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class QueryGateway:
+    """Exécute les requêtes via le pool, en fusionnant les requêtes identiques simultanées."""
+
+    def __init__(self, factory, size=4):
+        self.pool = ConnectionPool(factory, size)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.executed = 0       # requêtes réellement envoyées au warehouse
+        self.coalesced = 0      # appels servis par une exécution déjà en cours
+
+    def fetch(self, key, run):
+        """Résultat de `run(connexion)` pour `key` ; renvoie (résultat, partagé).
+
+        `partagé` vaut True quand l'appel a attendu l'exécution lancée par une autre session.
+        Le résultat est remis tel quel à tous les appelants : il doit être immuable (table Arrow).
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            with self.pool.connection() as conn:
+                result = run(conn)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            return {"executees": self.executed, "fusionnees": self.coalesced, "en_cours": len(self._in_flight),
+                    "pool": self.pool.size}
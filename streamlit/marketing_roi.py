@@ -1,92 +1,54 @@
+from dataclasses import replace
+
 import streamlit as st
-import pandas as pd
-import snowflake.connector
 import plotly.express as px
 
-st.set_page_config(page_title="Marketing ROI & Expérience Client", layout="wide", page_icon="💰")
+from db import PanelLoader, lazy_sections, refresh_button, performance_panel
+from approx import estimate, mois_coupes
+from attribution import REGLES, attribute, roi_by_type
+from filters import sidebar_filters
+from uplift import prepare_daily
 
 st.title("💰 Marketing ROI & Expérience Client")
 st.markdown("Analyse de la rentabilité des campagnes marketing et de l'impact des avis / service client sur les ventes.")
 st.markdown("---")
 
-@st.cache_resource
-def get_snowflake_connection():
-    return snowflake.connector.connect(
-        user=st.secrets["snowflake"]["user"],
-        password=st.secrets["snowflake"]["password"],
-        account=st.secrets["snowflake"]["account"],
-        warehouse=st.secrets["snowflake"]["warehouse"],
-        database=st.secrets["snowflake"]["database"],
-        schema=st.secrets["snowflake"]["schema"]
+refresh_button()
+filters = sidebar_filters()
+with st.sidebar:
+    exact = st.toggle(
+        "Valeurs exactes (reporting)", value=True,
+        help="Désactivé : les indicateurs globaux sont estimés à partir de résumés par mois et "
+             "d'échantillons (ANALYTICS.KPI_SKETCHES), avec leur marge d'erreur à 95 %.",
     )
 
-conn = get_snowflake_connection()
-
-# =========================================================
-# 1) ROI par type de campagne (canal)
-# =========================================================
-st.header("📺 ROI par type de campagne marketing")
-
-query_roi_canal = """
-SELECT 
-    CAMPAIGN_TYPE,
-    ROUND(AVG(CONVERSION_RATE) * 100, 2) AS TAUX_CONV_THEORIQUE_PCT,
-    ROUND(SUM(v.AMOUNT) / NULLIF(SUM(c.BUDGET), 0), 4) AS ROI_CALCULE,
-    ROUND(AVG(v.AMOUNT), 2) AS PANIER_MOYEN_PAR_CANAL
-FROM ANYCOMPANY_LAB.SILVER.MARKETING_CAMPAIGNS_CLEAN c
-LEFT JOIN ANYCOMPANY_LAB.SILVER.FINANCIAL_TRANSACTIONS_CLEAN v 
-    ON UPPER(TRIM(v.REGION)) = UPPER(TRIM(c.REGION))
-    AND v.TRANSACTION_DATE BETWEEN c.START_DATE AND c.END_DATE
-WHERE v.TRANSACTION_TYPE = 'Sale'
-GROUP BY 1
-ORDER BY TAUX_CONV_THEORIQUE_PCT DESC;
+# ---------------------------------------------------------
+# Requêtes de la page : chaque onglet lance les siennes en parallèle
+# quand il est affiché, les autres ne coûtent rien. Les {emplacements}
+# reçoivent les filtres de la barre latérale (voir filters.py).
+# ---------------------------------------------------------
+# Entrées du moteur d'attribution (attribution.py) : ventes par (région, jour), jours actifs
+# de chaque campagne et liste des campagnes ; le ROI est calculé sans jointure campagne × vente.
+query_ventes_jour = """
+SELECT JOUR, REGION, SUM(MONTANT_TOTAL) AS MONTANT_TOTAL, SUM(NB_MONTANTS) AS NB_MONTANTS
+FROM ANALYTICS.DAILY_SALES_CUBE
+WHERE TRANSACTION_TYPE = 'Sale'
+  AND {ventes}
+GROUP BY 1, 2;
 """
-df_roi_canal = pd.read_sql(query_roi_canal, conn)
-
-col1, col2 = st.columns([1, 2])
-
-with col1:
-    st.subheader("Résumé par canal")
-    st.dataframe(df_roi_canal)
-
-with col2:
-    fig_roi = px.bar(
-        df_roi_canal,
-        x="CAMPAIGN_TYPE",
-        y="ROI_CALCULE",
-        title="ROI calculé par type de campagne (CA / Budget)",
-        labels={"ROI_CALCULE": "ROI (€/€ investi)", "CAMPAIGN_TYPE": "Type de campagne"}
-    )
-    st.plotly_chart(fig_roi, use_container_width=True)
-
-st.markdown("---")
-
-# =========================================================
-# 2) Comparaison taux de conversion théorique vs ROI réel
-# =========================================================
-st.header("🎯 Conversion théorique vs ROI réel")
-
-fig_conv_vs_roi = px.scatter(
-    df_roi_canal,
-    x="TAUX_CONV_THEORIQUE_PCT",
-    y="ROI_CALCULE",
-    size="PANIER_MOYEN_PAR_CANAL",
-    color="CAMPAIGN_TYPE",
-    hover_name="CAMPAIGN_TYPE",
-    title="Taux de conversion théorique vs ROI réel",
-    labels={
-        "TAUX_CONV_THEORIQUE_PCT": "Taux conv. théorique (%)",
-        "ROI_CALCULE": "ROI réel (CA/Budget)"
-    }
-)
-st.plotly_chart(fig_conv_vs_roi, use_container_width=True)
 
-st.markdown("---")
+query_calendrier_campagnes = """
+SELECT REGION_KEY, JOUR, CAMPAIGN_ID
+FROM ANALYTICS.CAMPAIGN_CALENDAR
+WHERE {campagnes};
+"""
 
-# =========================================================
-# 3) Impact des avis produits sur les ventes (global)
-# =========================================================
-st.header("⭐ Impact des avis produits sur les ventes")
+query_campagnes = """
+SELECT campaign_id, campaign_type, budget, conversion_rate, start_date, end_date
+FROM SILVER.MARKETING_CAMPAIGNS_CLEAN
+WHERE start_date IS NOT NULL
+  AND end_date >= start_date;
+"""
 
 query_reviews = """
 WITH review_metrics AS (
@@ -94,14 +56,17 @@ WITH review_metrics AS (
         COUNT(review_id) AS total_reviews,
         AVG(rating) AS avg_rating
     FROM SILVER.product_reviews_clean
+    WHERE {avis}
 ),
 sales_metrics AS (
+    -- transaction_id est unique dans SILVER : le COUNT(DISTINCT) devient une somme de comptages
     SELECT
-        COUNT(DISTINCT transaction_id) AS number_of_transactions,
-        SUM(amount) AS total_sales_amount,
-        AVG(amount) AS avg_transaction_amount
-    FROM SILVER.financial_transactions_clean
+        SUM(nb_transactions) AS number_of_transactions,
+        SUM(montant_total) AS total_sales_amount,
+        SUM(montant_total) / NULLIF(SUM(nb_montants), 0) AS avg_transaction_amount
+    FROM ANALYTICS.daily_sales_cube
     WHERE transaction_type = 'Sale'
+      AND {ventes}
 )
 SELECT
     r.total_reviews,
@@ -112,28 +77,6 @@ SELECT
 FROM review_metrics r
 CROSS JOIN sales_metrics s;
 """
-df_reviews = pd.read_sql(query_reviews, conn)
-
-col1, col2, col3 = st.columns(3)
-row = df_reviews.iloc[0]
-
-with col1:
-    st.metric("Nombre total d'avis", f"{int(row['TOTAL_REVIEWS']):,}")
-with col2:
-    st.metric("Note moyenne produits", f"{row['AVG_RATING']:.2f} / 5")
-with col3:
-    st.metric("Montant total des ventes", f"{row['TOTAL_SALES_AMOUNT']:,.0f} €")
-
-st.markdown("Nombre de transactions : **{:,}** – Panier moyen : **{:,.0f} €**".format(
-    int(row["NUMBER_OF_TRANSACTIONS"]), row["AVG_TRANSACTION_AMOUNT"])
-)
-
-st.markdown("---")
-
-# =========================================================
-# 4) Influence des interactions service client (global)
-# =========================================================
-st.header("📞 Influence du service client sur les ventes")
 
 query_service = """
 WITH service_metrics AS (
@@ -141,14 +84,17 @@ WITH service_metrics AS (
         COUNT(interaction_id) AS total_interactions,
         COUNT(CASE WHEN resolution_status = 'Resolved' THEN 1 END) AS resolved_interactions
     FROM SILVER.customer_service_interactions_clean
+    WHERE {service}
 ),
 sales_metrics AS (
+    -- transaction_id est unique dans SILVER : le COUNT(DISTINCT) devient une somme de comptages
     SELECT
-        COUNT(DISTINCT transaction_id) AS number_of_transactions,
-        SUM(amount) AS total_sales_amount,
-        AVG(amount) AS avg_transaction_amount
-    FROM SILVER.financial_transactions_clean
+        SUM(nb_transactions) AS number_of_transactions,
+        SUM(montant_total) AS total_sales_amount,
+        SUM(montant_total) / NULLIF(SUM(nb_montants), 0) AS avg_transaction_amount
+    FROM ANALYTICS.daily_sales_cube
     WHERE transaction_type = 'Sale'
+      AND {ventes}
 )
 SELECT
     sm.total_interactions,
@@ -163,22 +109,232 @@ SELECT
 FROM service_metrics sm
 CROSS JOIN sales_metrics s;
 """
-df_service = pd.read_sql(query_service, conn)
-row_s = df_service.iloc[0]
 
-col1, col2, col3 = st.columns(3)
+# Mode approché : résumés par strate (source × région × mois) et échantillons des mois
+# coupés par la période, écrits par pipeline/kpi_sketches.py (voir approx.py). Préfixe sql_ :
+# la source et les mois coupés sont des paramètres fournis par la page, le banc d'essai
+# (qui exécute les query_* sans paramètres) les ignore.
+sql_strates = """
+SELECT REGION_KEY, MOIS, NB, NB_VALEURS, SOMME, NB_CIBLE, REGISTRES
+FROM ANALYTICS.KPI_SKETCHES
+WHERE SOURCE = ?
+  AND {strates};
+"""
+
+sql_echantillon = """
+SELECT REGION_KEY, MOIS, JOUR, VALEUR, CIBLE
+FROM ANALYTICS.KPI_SAMPLE
+WHERE SOURCE = ?
+  AND {echantillon}
+  AND (MOIS = ? OR MOIS = ?);
+"""
+
+ventes = dict(date="jour", region="region")
+
+# source → filtrée par région ?
+SOURCES_APPROCHEES = {"ventes": True, "avis": False, "service": False}
+bords = mois_coupes(filters.date_min, filters.date_max)
+# les strates sont mensuelles : la période est élargie au premier jour de son premier mois
+filtres_mois = replace(filters, date_min=filters.date_min.replace(day=1)) if filters.date_min else filters
+
+
+def requetes_approchees():
+    requetes = {}
+    for source, regional in SOURCES_APPROCHEES.items():
+        region = "REGION_KEY" if regional else None
+        sql, params = filtres_mois.bind(sql_strates, strates=dict(date="MOIS", region=region))
+        requetes[f"Résumés {source}"] = (sql, (source,) + params)
+        if bords:
+            sql, params = filters.bind(sql_echantillon, echantillon=dict(date="JOUR", region=region))
+            requetes[f"Échantillon {source}"] = (sql, (source,) + params + (bords[0], bords[-1]))
+    return requetes
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def calcul_roi(daily, calendar, campaigns, rule):
+    return attribute(daily, calendar, campaigns, rule)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def calcul_approche(strates, echantillon, date_min, date_max):
+    return estimate(strates, echantillon, date_min, date_max)
+
+
+panels = PanelLoader({
+    "Ventes journalières": filters.bind(query_ventes_jour, ventes=ventes),
+    "Calendrier campagnes": filters.bind(query_calendrier_campagnes, campagnes=dict(date="JOUR", region="REGION_KEY")),
+    "Campagnes": query_campagnes,
+    "Avis et ventes": filters.bind(query_reviews, avis=dict(date="review_date"), ventes=ventes),
+    "Service client": filters.bind(query_service, service=dict(date="interaction_date"), ventes=ventes),
+    **requetes_approchees(),
+})
+
 
-with col1:
-    st.metric("Interactions service client", f"{int(row_s['TOTAL_INTERACTIONS']):,}")
-with col2:
-    st.metric("Demandes résolues", f"{int(row_s['RESOLVED_INTERACTIONS']):,}")
-with col3:
-    st.metric("Taux de résolution", f"{row_s['RESOLUTION_RATE_PCT']:.1f} %")
+def estimations(*sources):
+    """KPI approchés des sources : une liste de {nom: (valeur, marge à 95 %)}."""
+    prefixes = ("Résumés", "Échantillon") if bords else ("Résumés",)
+    panels.prefetch(*[f"{prefixe} {source}" for source in sources for prefixe in prefixes])
+    return [
+        calcul_approche(panels.get(f"Résumés {source}"),
+                        panels.get(f"Échantillon {source}") if bords else None,
+                        filters.date_min, filters.date_max)
+        for source in sources
+    ]
 
-st.markdown("Nombre de transactions : **{:,}** – CA total : **{:,.0f} €** – Panier moyen : **{:,.0f} €**".format(
-    int(row_s["NUMBER_OF_TRANSACTIONS"]),
-    row_s["TOTAL_SALES_AMOUNT"],
-    row_s["AVG_TRANSACTION_AMOUNT"]
-))
+
+def kpis_ventes(estimation):
+    return dict(NUMBER_OF_TRANSACTIONS=estimation["distincts"], TOTAL_SALES_AMOUNT=estimation["somme"],
+                AVG_TRANSACTION_AMOUNT=estimation["moyenne"])
+
+
+def texte(kpi, fmt):
+    """Valeur formatée ; en mode approché, précédée de « ≈ » et suivie de sa marge."""
+    valeur, marge = kpi
+    if marge is None:
+        return fmt.format(valeur)
+    return f"≈ {fmt.format(valeur)} ± {fmt.format(marge)}"
+
+
+NOTE_APPROCHE = ("Mode approché : identifiants distincts par HyperLogLog, jours des mois coupés par la période "
+                 "estimés sur échantillon. Activer « Valeurs exactes » pour le reporting.")
+
+
+def metrique(label, kpi, fmt, suffixe=""):
+    valeur, marge = kpi
+    st.metric(label, ("≈ " if marge is not None else "") + fmt.format(valeur) + suffixe)
+    if marge is not None:
+        st.caption(f"± {fmt.format(marge)}{suffixe} (intervalle de confiance à 95 %)")
+
+
+# =========================================================
+# 1) ROI par type de campagne (canal) et conversion théorique vs ROI réel
+# =========================================================
+@st.fragment
+def section_roi():
+    panels.prefetch("Ventes journalières", "Calendrier campagnes", "Campagnes")
+    st.header("📺 ROI par type de campagne marketing")
+
+    regle = st.radio(
+        "Répartition des ventes d'un jour entre les campagnes actives",
+        REGLES,
+        format_func={"egal": "Parts égales", "budget": "Au prorata du budget", "dernier": "Dernière campagne lancée"}.get,
+        horizontal=True,
+    )
+    daily = prepare_daily(panels.get("Ventes journalières"))
+    df_roi_campagne = calcul_roi(daily, panels.get("Calendrier campagnes"), panels.get("Campagnes"), regle)
+    df_roi_canal = roi_by_type(df_roi_campagne)
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        st.subheader("Résumé par canal")
+        st.dataframe(df_roi_canal)
+
+    with col2:
+        fig_roi = px.bar(
+            df_roi_canal,
+            x="CAMPAIGN_TYPE",
+            y="ROI_CALCULE",
+            title="ROI calculé par type de campagne (CA / Budget)",
+            labels={"ROI_CALCULE": "ROI (€/€ investi)", "CAMPAIGN_TYPE": "Type de campagne"}
+        )
+        st.plotly_chart(fig_roi, use_container_width=True)
+
+    total_ventes = daily["MONTANT_TOTAL"].sum()
+    if total_ventes:
+        st.caption(f"Part du CA couverte par au moins une campagne : {df_roi_canal['CA_ATTRIBUE'].sum() / total_ventes:.1%} "
+                   "(budget de chaque campagne compté une fois, au prorata de ses jours dans la période).")
+
+    with st.expander("Détail par campagne"):
+        st.dataframe(df_roi_campagne.sort_values("ROI", ascending=False), use_container_width=True, hide_index=True)
+
+    st.header("🎯 Conversion théorique vs ROI réel")
+
+    fig_conv_vs_roi = px.scatter(
+        df_roi_canal,
+        x="TAUX_CONV_THEORIQUE_PCT",
+        y="ROI_CALCULE",
+        size="PANIER_MOYEN_PAR_CANAL",
+        color="CAMPAIGN_TYPE",
+        hover_name="CAMPAIGN_TYPE",
+        title="Taux de conversion théorique vs ROI réel",
+        labels={
+            "TAUX_CONV_THEORIQUE_PCT": "Taux conv. théorique (%)",
+            "ROI_CALCULE": "ROI réel (CA/Budget)"
+        }
+    )
+    st.plotly_chart(fig_conv_vs_roi, use_container_width=True)
+
+
+# =========================================================
+# 2) Impact des avis produits sur les ventes (global)
+# =========================================================
+def section_avis():
+    st.header("⭐ Impact des avis produits sur les ventes")
+
+    if exact:
+        row = panels.get("Avis et ventes").iloc[0]
+        kpi = {nom: (row[nom], None) for nom in row.index}
+    else:
+        avis, ventes_estimees = estimations("avis", "ventes")
+        kpi = dict(TOTAL_REVIEWS=avis["nb"], AVG_RATING=avis["moyenne"], **kpis_ventes(ventes_estimees))
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        metrique("Nombre total d'avis", kpi["TOTAL_REVIEWS"], "{:,.0f}")
+    with col2:
+        metrique("Note moyenne produits", kpi["AVG_RATING"], "{:.2f}", " / 5")
+    with col3:
+        metrique("Montant total des ventes", kpi["TOTAL_SALES_AMOUNT"], "{:,.0f}", " €")
+
+    st.markdown("Nombre de transactions : **{}** – Panier moyen : **{} €**".format(
+        texte(kpi["NUMBER_OF_TRANSACTIONS"], "{:,.0f}"), texte(kpi["AVG_TRANSACTION_AMOUNT"], "{:,.0f}"))
+    )
+    if not exact:
+        st.caption(NOTE_APPROCHE)
+
+
+# =========================================================
+# 3) Influence des interactions service client (global)
+# =========================================================
+def section_service():
+    st.header("📞 Influence du service client sur les ventes")
+
+    if exact:
+        row_s = panels.get("Service client").iloc[0]
+        kpi = {nom: (row_s[nom], None) for nom in row_s.index}
+    else:
+        service, ventes_estimees = estimations("service", "ventes")
+        taux, marge = service["taux_cible"]
+        kpi = dict(TOTAL_INTERACTIONS=service["nb"], RESOLVED_INTERACTIONS=service["nb_cible"],
+                   RESOLUTION_RATE_PCT=(taux * 100, marge * 100), **kpis_ventes(ventes_estimees))
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        metrique("Interactions service client", kpi["TOTAL_INTERACTIONS"], "{:,.0f}")
+    with col2:
+        metrique("Demandes résolues", kpi["RESOLVED_INTERACTIONS"], "{:,.0f}")
+    with col3:
+        metrique("Taux de résolution", kpi["RESOLUTION_RATE_PCT"], "{:.1f}", " %")
+
+    st.markdown("Nombre de transactions : **{}** – CA total : **{} €** – Panier moyen : **{} €**".format(
+        texte(kpi["NUMBER_OF_TRANSACTIONS"], "{:,.0f}"),
+        texte(kpi["TOTAL_SALES_AMOUNT"], "{:,.0f}"),
+        texte(kpi["AVG_TRANSACTION_AMOUNT"], "{:,.0f}")
+    ))
+    if not exact:
+        st.caption(NOTE_APPROCHE)
+
+
+# Onglets : seule la section affichée est exécutée (requêtes, calculs et figures)
+lazy_sections({
+    "📺 ROI des campagnes": section_roi,
+    "⭐ Avis produits": section_avis,
+    "📞 Service client": section_service,
+}, key="onglet_marketing")
 
 st.success("✅ Dashboard Marketing ROI & Expérience Client chargé avec succès !")
+
+performance_panel()
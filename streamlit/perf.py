@@ -0,0 +1,88 @@
+"""Journal des temps de requête des dashboards.
+
+Chaque appel à db.run_query produit une mesure (page, panneau, durée, lignes,
+taille du résultat, cache : hit / shared / miss) ajoutée en JSON Lines dans un fichier local.
+Le journal sert au panneau « Performance » de chaque page et peut être résumé
+hors Streamlit :
+
+    python streamlit/perf.py                 # p50 / p95 par panneau, du plus lent au plus rapide
+    python streamlit/perf.py --since 2024-06-01
+"""
+import argparse
+import io
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_LOG = ROOT / "data" / "query_log.jsonl"
+
+_lock = threading.Lock()
+
+
+def log_timing(record, path=DEFAULT_LOG):
+    """Ajoute une mesure au journal (une ligne JSON)."""
+    path = Path(path)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def load_log(path=DEFAULT_LOG, since=None, tail_bytes=None):
+    """Journal sous forme de DataFrame (vide si aucun fichier).
+
+    `tail_bytes` : ne lit que la fin du journal (les mesures les plus récentes), pour
+    un coût de lecture borné quelle que soit la taille du fichier.
+    """
+    path = Path(path)
+    empty = pd.DataFrame(columns=["ts", "page", "panel", "seconds", "rows", "bytes", "cache"])
+    if not path.exists():
+        return empty
+    if tail_bytes and path.stat().st_size > tail_bytes:
+        with open(path, "rb") as f:
+            f.seek(-tail_bytes, os.SEEK_END)
+            f.readline()                    # première ligne coupée
+            text = f.read().decode("utf-8", errors="replace")
+        if not text.strip():
+            return empty
+        df = pd.read_json(io.StringIO(text), lines=True, convert_dates=["ts"])
+    else:
+        df = pd.read_json(path, lines=True, convert_dates=["ts"])
+    if since is not None:
+        df = df[df["ts"] >= pd.Timestamp(since)]
+    return df
+
+
+def summarize(df):
+    """p50 / p95 / max des durées par (page, panneau), avec la part d'appels sans requête au warehouse."""
+    if df.empty:
+        return pd.DataFrame(columns=["page", "panel", "nb_appels", "p50_ms", "p95_ms", "max_ms", "taux_cache_pct"])
+    grouped = df.assign(ms=df["seconds"] * 1000, hit=df["cache"].isin(["hit", "shared"])).groupby(["page", "panel"])
+    summary = grouped.agg(
+        nb_appels=("ms", "size"),
+        p50_ms=("ms", "median"),
+        p95_ms=("ms", lambda s: s.quantile(0.95)),
+        max_ms=("ms", "max"),
+        lignes=("rows", "median"),
+        taille_ko=("bytes", lambda s: s.median() / 1024),
+        taux_cache_pct=("hit", lambda s: s.mean() * 100),
+    )
+    return summary.round(1).sort_values("p95_ms", ascending=False).reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résumé p50 / p95 du journal des requêtes des dashboards")
+    parser.add_argument("--log", default=str(DEFAULT_LOG))
+    parser.add_argument("--since", help="date de début (AAAA-MM-JJ)")
+    args = parser.parse_args()
+    summary = summarize(load_log(args.log, args.since))
+    print(summary.to_string(index=False) if not summary.empty else "Journal vide.")
+
+
+if __name__ == "__main__":
+    main()
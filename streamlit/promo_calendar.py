@@ -0,0 +1,128 @@
+"""Index d'intervalles des promotions et campagnes, pour les simulations locales.
+
+Pendant Python de sql/promo_calendar.sql : pour chaque région normalisée
+(UPPER(TRIM(region))), les dates de début et de fin sont triées une fois, puis
+chaque question « quelles promotions sont actives ce jour-là ? » se résout par
+recherche dichotomique (np.searchsorted), sans jointure par intervalle.
+"""
+import numpy as np
+import pandas as pd
+
+
+def normalize_region(regions):
+    """Équivalent de UPPER(TRIM(region)) ; les valeurs manquantes restent NaN."""
+    return pd.Series(regions, dtype="object").str.strip().str.upper()
+
+
+def to_days(values):
+    """Convertit des dates (str, datetime, Timestamp...) en datetime64[D]."""
+    return pd.to_datetime(pd.Series(values)).to_numpy().astype("datetime64[D]")
+
+
+def _group_positions(keys):
+    """Itère sur (clé, positions) pour chaque valeur distincte de `keys` (NaN ignorés)."""
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    for i, key in enumerate(uniques):
+        yield key, order[bounds[i]:bounds[i + 1]]
+
+
+class _RegionIntervals:
+    def __init__(self, starts, ends, positions):
+        self.starts = starts                    # dans l'ordre d'origine
+        self.ends = ends
+        self.positions = positions              # indices dans l'index global
+        self.sorted_starts = np.sort(starts)
+        self.sorted_ends = np.sort(ends)
+
+
+class IntervalIndex:
+    """Intervalles [start, end] (bornes incluses) rattachés à une région.
+
+    `ids` identifie chaque intervalle (promotion_id, campaign_id...) ; les
+    intervalles sans début ou avec fin < début sont ignorés, comme dans le SQL.
+    """
+
+    def __init__(self, regions, starts, ends, ids):
+        keys = normalize_region(regions).to_numpy()
+        starts = to_days(starts)
+        ends = to_days(ends)
+        ids = np.asarray(ids)
+
+        valid = pd.notna(keys) & ~np.isnat(starts) & ~np.isnat(ends) & (ends >= starts)
+        self.region_keys = keys[valid]
+        self.starts = starts[valid]
+        self.ends = ends[valid]
+        self.ids = ids[valid]
+
+        self._by_region = {
+            key: _RegionIntervals(self.starts[pos], self.ends[pos], pos)
+            for key, pos in _group_positions(self.region_keys)
+        }
+
+    @classmethod
+    def from_frame(cls, df, id_col, region_col="REGION", start_col="START_DATE", end_col="END_DATE"):
+        """Construit l'index depuis PROMOTIONS_DATA_CLEAN ou MARKETING_CAMPAIGNS_CLEAN."""
+        return cls(df[region_col], df[start_col], df[end_col], df[id_col])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count_active(self, regions, days):
+        """Nombre d'intervalles actifs pour chaque couple (région, jour).
+
+        #(début <= jour) - #(fin < jour) : deux recherches dichotomiques par point.
+        """
+        keys = normalize_region(regions).to_numpy()
+        days = to_days(days)
+        counts = np.zeros(len(days), dtype=np.int64)
+        for key, pos in _group_positions(keys):
+            region = self._by_region.get(key)
+            if region is None:
+                continue
+            d = days[pos]
+            counts[pos] = (np.searchsorted(region.sorted_starts, d, side="right")
+                           - np.searchsorted(region.sorted_ends, d, side="left"))
+        return counts
+
+    def is_active(self, regions, days):
+        return self.count_active(regions, days) > 0
+
+    def pairs(self, regions, days):
+        """Toutes les correspondances (point, intervalle actif).
+
+        Renvoie deux tableaux alignés : la position du point dans l'entrée et
+        l'indice de l'intervalle dans l'index (self.ids[...] pour l'identifiant).
+        Chaque intervalle couvre une tranche contiguë des points triés par date.
+        """
+        keys = normalize_region(regions).to_numpy()
+        days = to_days(days)
+        point_parts, interval_parts = [], []
+        for key, pos in _group_positions(keys):
+            region = self._by_region.get(key)
+            if region is None:
+                continue
+            order = np.argsort(days[pos], kind="stable")
+            sorted_days = days[pos][order]
+            lo = np.searchsorted(sorted_days, region.starts, side="left")
+            hi = np.searchsorted(sorted_days, region.ends, side="right")
+            lengths = hi - lo
+            which = np.repeat(np.arange(len(lo)), lengths)
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            point_parts.append(pos[order[lo[which] + offsets]])
+            interval_parts.append(region.positions[which])
+        if not point_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(point_parts), np.concatenate(interval_parts)
+
+    def calendar(self):
+        """Déplie l'index en (REGION_KEY, JOUR, ID), comme ANALYTICS.PROMO_CALENDAR."""
+        lengths = (self.ends - self.starts).astype(np.int64) + 1
+        which = np.repeat(np.arange(len(self.ids)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return pd.DataFrame({
+            "REGION_KEY": self.region_keys[which],
+            "JOUR": self.starts[which] + offsets.astype("timedelta64[D]"),
+            "ID": self.ids[which],
+        })
@@ -1,309 +1,428 @@
 import streamlit as st
-import pandas as pd
-import snowflake.connector
 import plotly.express as px
 
-st.set_page_config(page_title="Promotion & Logistique", layout="wide", page_icon="🏷️")
+from db import PanelLoader, lazy_sections, refresh_button, performance_panel
+from filters import sidebar_filters
+from uplift import classify_lift, prepare_daily, uplift
 
 st.title("🏷️ Analyses Promotions & Opérations")
 st.markdown("Impact des promotions, sensibilité des catégories, ruptures de stock et performance logistique.")
 st.markdown("---")
 
-@st.cache_resource
-def get_snowflake_connection():
-    return snowflake.connector.connect(
-        user=st.secrets["snowflake"]["user"],
-        password=st.secrets["snowflake"]["password"],
-        account=st.secrets["snowflake"]["account"],
-        warehouse=st.secrets["snowflake"]["warehouse"],
-        database=st.secrets["snowflake"]["database"],
-        schema=st.secrets["snowflake"]["schema"]
-    )
-
-conn = get_snowflake_connection()
-
-# =========================================================
-# 1) Performance globale par région
-# =========================================================
-st.header("🌍 Performance globale par région")
+refresh_button()
+filters = sidebar_filters(categories=True)
 
+# ---------------------------------------------------------
+# Requêtes de la page : chaque onglet lance les siennes en parallèle
+# quand il est affiché, les autres ne coûtent rien. Les {emplacements}
+# reçoivent les filtres de la barre latérale (voir filters.py).
+# ---------------------------------------------------------
 query_region_perf = """
 SELECT 
     REGION, 
-    SUM(AMOUNT) AS TOTAL_VENTES,
-    COUNT(*) AS NB_TRANSACTIONS
-FROM FINANCIAL_TRANSACTIONS_CLEAN
+    SUM(MONTANT_TOTAL) AS TOTAL_VENTES,
+    SUM(NB_TRANSACTIONS) AS NB_TRANSACTIONS
+FROM ANALYTICS.DAILY_SALES_CUBE
 WHERE TRANSACTION_TYPE = 'Sale'
+  AND {ventes}
 GROUP BY 1 
 ORDER BY 2 DESC;
 """
-df_region_perf = pd.read_sql(query_region_perf, conn)
-
-col1, col2 = st.columns([1, 2])
-with col1:
-    st.metric("Chiffre d'affaires total", f"{df_region_perf['TOTAL_VENTES'].sum():,.0f} €")
-    st.metric("Nombre total de transactions", f"{df_region_perf['NB_TRANSACTIONS'].sum():,}")
-
-with col2:
-    fig_region_perf = px.bar(
-        df_region_perf,
-        x="REGION",
-        y="TOTAL_VENTES",
-        title="Chiffre d'affaires par région",
-        labels={"TOTAL_VENTES": "CA total (€)"}
-    )
-    fig_region_perf.update_layout(xaxis_title="", yaxis_title="CA total (€)")
-    st.plotly_chart(fig_region_perf, use_container_width=True)
-
-st.markdown("---")
-
-# =========================================================
-# 2) Ventes avec vs sans promotion
-# =========================================================
-st.header("🚀 Ventes moyennes avec vs sans promotion")
 
 query_ventes_promo = """
 WITH ventes_journalieres AS (
-    SELECT TRANSACTION_DATE::DATE AS jour, REGION, SUM(AMOUNT) AS total
-    FROM FINANCIAL_TRANSACTIONS_CLEAN 
+    SELECT JOUR AS jour, REGION, SUM(MONTANT_TOTAL) AS total
+    FROM ANALYTICS.DAILY_SALES_CUBE 
     WHERE TRANSACTION_TYPE = 'Sale' 
+      AND {ventes}
     GROUP BY 1, 2
+),
+jours_promo AS (
+    SELECT DISTINCT REGION_KEY, JOUR
+    FROM ANALYTICS.PROMO_CALENDAR
+    WHERE {promos}
 )
 SELECT 
-    CASE WHEN p.PROMOTION_ID IS NOT NULL 
+    CASE WHEN p.JOUR IS NOT NULL 
          THEN 'Période Promo' 
          ELSE 'Période Normale' 
     END AS type_periode,
     ROUND(AVG(total), 2) AS ventes_moyennes_par_jour
 FROM ventes_journalieres v
-LEFT JOIN PROMOTIONS_DATA_CLEAN p 
-    ON v.REGION = p.REGION AND v.jour BETWEEN p.START_DATE AND p.END_DATE
+LEFT JOIN jours_promo p 
+    ON UPPER(TRIM(v.REGION)) = p.REGION_KEY AND v.jour = p.JOUR
 GROUP BY 1;
 """
-df_ventes_promo = pd.read_sql(query_ventes_promo, conn)
-
-col1, col2 = st.columns([1, 2])
-
-with col1:
-    try:
-        v_promo = df_ventes_promo.loc[
-            df_ventes_promo["TYPE_PERIODE"] == "Période Promo",
-            "VENTES_MOYENNES_PAR_JOUR"
-        ].values[0]
-        v_normale = df_ventes_promo.loc[
-            df_ventes_promo["TYPE_PERIODE"] == "Période Normale",
-            "VENTES_MOYENNES_PAR_JOUR"
-        ].values[0]
-        uplift_pct = ((v_promo - v_normale) / v_normale) * 100 if v_normale != 0 else 0
-    except IndexError:
-        v_promo, v_normale, uplift_pct = 0, 0, 0
-
-    st.metric("Ventes moyennes (Période Promo)", f"{v_promo:,.0f} €")
-    st.metric("Ventes moyennes (Période Normale)", f"{v_normale:,.0f} €")
-    st.metric("Effet Boost (Uplift)", f"{uplift_pct:+.1f} %")
-
-with col2:
-    fig_ventes_promo = px.bar(
-        df_ventes_promo,
-        x="TYPE_PERIODE",
-        y="VENTES_MOYENNES_PAR_JOUR",
-        title="Ventes moyennes par jour : promo vs normal",
-        labels={"VENTES_MOYENNES_PAR_JOUR": "Ventes moyennes/jour (€)"}
-    )
-    fig_ventes_promo.update_layout(xaxis_title="", yaxis_title="Ventes moyennes/jour (€)")
-    st.plotly_chart(fig_ventes_promo, use_container_width=True)
-
-st.markdown("---")
 
-# =========================================================
-# 3) Sensibilité des catégories aux promotions (Lift)
-# =========================================================
-st.header("📈 Sensibilité des catégories aux promotions (Lift)")
-
-query_lift_categories = """
-WITH stats_globales_region AS (
-    SELECT 
-        REGION,
-        AVG(AMOUNT) AS PANIER_MOYEN_REGION_GLOBAL
-    FROM ANYCOMPANY_LAB.SILVER.FINANCIAL_TRANSACTIONS_CLEAN
-    WHERE TRANSACTION_TYPE = 'Sale'
-    GROUP BY 1
-),
-ventes_promo AS (
-    SELECT 
-        p.PRODUCT_CATEGORY,
-        v.REGION,
-        AVG(v.AMOUNT) AS PANIER_MOYEN_PROMO,
-        COUNT(*) AS NB_VENTES_PROMO
-    FROM ANYCOMPANY_LAB.SILVER.FINANCIAL_TRANSACTIONS_CLEAN v
-    INNER JOIN ANYCOMPANY_LAB.SILVER.PROMOTIONS_DATA_CLEAN p 
-        ON UPPER(TRIM(v.REGION)) = UPPER(TRIM(p.REGION))
-        AND v.TRANSACTION_DATE BETWEEN p.START_DATE AND p.END_DATE
-    WHERE v.TRANSACTION_TYPE = 'Sale'
-    GROUP BY 1, 2
-)
-SELECT 
-    vp.PRODUCT_CATEGORY,
-    ROUND(AVG(vp.PANIER_MOYEN_PROMO), 2) AS PANIER_MOYEN_EN_PROMO,
-    ROUND(AVG(sgr.PANIER_MOYEN_REGION_GLOBAL), 2) AS PANIER_MOYEN_BASE_REGION,
-    ROUND(
-        ((PANIER_MOYEN_EN_PROMO - PANIER_MOYEN_BASE_REGION)
-         / NULLIF(PANIER_MOYEN_BASE_REGION, 0)) * 100, 
-    2) AS LIFT_PERFORMANCE_PCT
-FROM ventes_promo vp
-JOIN stats_globales_region sgr ON vp.REGION = sgr.REGION
-GROUP BY 1
-ORDER BY LIFT_PERFORMANCE_PCT DESC;
+# Entrées du moteur d'uplift (uplift.py) : ventes journalières et calendrier des promotions
+query_ventes_jour = """
+SELECT JOUR, REGION, SUM(MONTANT_TOTAL) AS MONTANT_TOTAL, SUM(NB_MONTANTS) AS NB_MONTANTS
+FROM ANALYTICS.DAILY_SALES_CUBE
+WHERE TRANSACTION_TYPE = 'Sale'
+  AND {ventes}
+GROUP BY 1, 2;
 """
-df_lift = pd.read_sql(query_lift_categories, conn)
-
-df_lift["SENSIBILITE"] = df_lift["LIFT_PERFORMANCE_PCT"].apply(
-    lambda x: "Forte" if x > 5 else ("Modérée" if x >= 0 else "Négative")
-)
-
-fig_lift = px.bar(
-    df_lift,
-    x="PRODUCT_CATEGORY",
-    y="LIFT_PERFORMANCE_PCT",
-    color="SENSIBILITE",
-    title="Sensibilité aux promotions par catégorie (Lift %)",
-    labels={"LIFT_PERFORMANCE_PCT": "Lift (%)"}
-)
-fig_lift.update_layout(xaxis_title="", yaxis_title="Lift (%)")
-st.plotly_chart(fig_lift, use_container_width=True)
-
-st.markdown("---")
 
-# =========================================================
-# 4) Ruptures de stock – visuel amélioré
-# =========================================================
-st.header("📦 Ruptures de stock par catégorie")
+query_calendrier_promo = """
+SELECT REGION_KEY, JOUR, PROMOTION_ID, PRODUCT_CATEGORY
+FROM ANALYTICS.PROMO_CALENDAR
+WHERE {promos};
+"""
 
+# Projection des ruptures (pipeline/stockout.py) : table groupée par catégorie et entrepôt
 query_stock = """
 SELECT
     product_category,
     COUNT(*) AS total_products,
-    COUNT(
-        CASE
-            WHEN current_stock <= reorder_point THEN 1
-        END
-    ) AS products_in_stockout,
+    COUNT(CASE WHEN risk_status IN ('Rupture', 'Critique') THEN 1 END) AS products_in_stockout,
     ROUND(
-        COUNT(
-            CASE
-                WHEN current_stock <= reorder_point THEN 1
-            END
-        ) / NULLIF(COUNT(*), 0) * 100,
+        COUNT(CASE WHEN risk_status IN ('Rupture', 'Critique') THEN 1 END) / NULLIF(COUNT(*), 0) * 100,
         2
-    ) AS stockout_rate_pct
-FROM SILVER.inventory_clean
+    ) AS stockout_rate_pct,
+    COUNT(CASE WHEN risk_status = 'À commander' THEN 1 END) AS products_to_reorder,
+    ROUND(MEDIAN(days_until_stockout), 1) AS median_days_until_stockout
+FROM ANALYTICS.STOCKOUT_PROJECTION
+WHERE {stock}
 GROUP BY product_category
 ORDER BY stockout_rate_pct DESC;
 """
-df_stock = pd.read_sql(query_stock, conn)
-
-st.subheader("Vue détaillée des catégories")
-st.dataframe(df_stock)
 
-top_stock = df_stock.sort_values("STOCKOUT_RATE_PCT", ascending=False).head(5)
-
-col1, col2 = st.columns(2)
-
-with col1:
-    fig_stock_rate = px.bar(
-        top_stock,
-        x="PRODUCT_CATEGORY",
-        y="STOCKOUT_RATE_PCT",
-        title="Top 5 catégories – taux de rupture (%)",
-        labels={"STOCKOUT_RATE_PCT": "Taux de rupture (%)"}
-    )
-    fig_stock_rate.update_layout(xaxis_title="", yaxis_title="Taux de rupture (%)")
-    st.plotly_chart(fig_stock_rate, use_container_width=True)
-
-with col2:
-    fig_stock_count = px.bar(
-        top_stock,
-        x="PRODUCT_CATEGORY",
-        y="PRODUCTS_IN_STOCKOUT",
-        title="Top 5 catégories – nb de produits en rupture",
-        labels={"PRODUCTS_IN_STOCKOUT": "Nb produits en rupture"}
-    )
-    fig_stock_count.update_layout(xaxis_title="", yaxis_title="Nb produits en rupture")
-    st.plotly_chart(fig_stock_count, use_container_width=True)
-
-st.markdown("---")
-
-# =========================================================
-# 5) Impact des délais de livraison – visuel amélioré
-# =========================================================
-st.header("🚚 Impact des délais de livraison et retours")
+query_stock_alertes = """
+SELECT
+    warehouse,
+    product_id,
+    product_category,
+    region,
+    current_stock,
+    reorder_point,
+    ROUND(daily_demand, 2) AS daily_demand,
+    ROUND(days_until_stockout, 1) AS days_until_stockout,
+    ROUND(supplier_lead_time, 1) AS supplier_lead_time,
+    risk_status
+FROM ANALYTICS.STOCKOUT_PROJECTION
+WHERE risk_status <> 'OK'
+  AND {stock}
+ORDER BY days_until_stockout;
+"""
 
+# Cube logistique (sql/logistics_cube.sql) : l'histogramme des durées de chaque jour se fusionne par somme,
+# les quantiles de la période sélectionnée se lisent sur son cumul
 query_logistique = """
-WITH delivery_performance AS (
-    SELECT 
-        shipment_id,
-        order_id,
+WITH groupes AS (
+    SELECT
         destination_region,
         shipping_method,
-        ship_date,
-        estimated_delivery,
-        DATEDIFF('day', ship_date, estimated_delivery) AS planned_duration,
-        status,
-        shipping_cost
-    FROM SILVER.LOGISTICS_AND_SHIPPING_CLEAN
+        delivery_days,
+        SUM(nb_expeditions) AS nb,
+        SUM(nb_retours) AS retours,
+        SUM(nb_couts) AS nb_couts,
+        SUM(cout_total) AS cout
+    FROM ANALYTICS.LOGISTICS_DAILY
+    WHERE {logistique}
+    GROUP BY 1, 2, 3
 ),
-delivery_impact_analysis AS (
-    SELECT 
-        lp.destination_region,
-        lp.shipping_method,
-        AVG(lp.planned_duration) AS avg_delivery_time,
-        AVG(lp.shipping_cost) AS avg_cost,
-        COUNT(CASE WHEN lp.status = 'Returned' THEN 1 END) AS total_returns,
-        (COUNT(CASE WHEN lp.status = 'Returned' THEN 1 END) / COUNT(lp.shipment_id)) * 100 AS return_rate_percentage
-    FROM delivery_performance lp
+cumul AS (
+    SELECT
+        *,
+        SUM(nb) OVER (
+            PARTITION BY destination_region, shipping_method ORDER BY delivery_days ROWS UNBOUNDED PRECEDING
+        ) AS nb_cumule,
+        SUM(nb) OVER (PARTITION BY destination_region, shipping_method) AS nb_total
+    FROM groupes
+    WHERE delivery_days IS NOT NULL
+),
+quantiles AS (
+    SELECT
+        destination_region,
+        shipping_method,
+        SUM(delivery_days * nb) / NULLIF(SUM(nb), 0) AS avg_delivery_time,
+        MIN(CASE WHEN nb_cumule >= 0.50 * nb_total THEN delivery_days END) AS p50,
+        MIN(CASE WHEN nb_cumule >= 0.90 * nb_total THEN delivery_days END) AS p90,
+        MIN(CASE WHEN nb_cumule >= 0.99 * nb_total THEN delivery_days END) AS p99
+    FROM cumul
+    GROUP BY 1, 2
+),
+totaux AS (
+    SELECT
+        destination_region,
+        shipping_method,
+        SUM(cout) / NULLIF(SUM(nb_couts), 0) AS avg_cost,
+        SUM(retours) AS total_returns,
+        SUM(retours) / NULLIF(SUM(nb), 0) * 100 AS return_rate_percentage
+    FROM groupes
     GROUP BY 1, 2
 )
-SELECT 
-    destination_region,
-    shipping_method,
-    ROUND(avg_delivery_time, 2) AS delai_moyen_jours,
-    ROUND(avg_cost, 2) AS cout_moyen_transport,
-    total_returns,
-    ROUND(return_rate_percentage, 2) AS taux_de_retour_pourcent
-FROM delivery_impact_analysis
+SELECT
+    t.destination_region,
+    t.shipping_method,
+    ROUND(q.avg_delivery_time, 2) AS delai_moyen_jours,
+    q.p50 AS delai_p50_jours,
+    q.p90 AS delai_p90_jours,
+    q.p99 AS delai_p99_jours,
+    ROUND(t.avg_cost, 2) AS cout_moyen_transport,
+    t.total_returns,
+    ROUND(t.return_rate_percentage, 2) AS taux_de_retour_pourcent
+FROM totaux t
+LEFT JOIN quantiles q
+    ON q.destination_region IS NOT DISTINCT FROM t.destination_region
+    AND q.shipping_method IS NOT DISTINCT FROM t.shipping_method
 ORDER BY taux_de_retour_pourcent DESC;
 """
-df_logistique = pd.read_sql(query_logistique, conn)
 
-st.subheader("Vue détaillée des performances logistiques")
-st.dataframe(df_logistique)
+ventes = dict(date="JOUR", region="REGION")
+stock = dict(region="region", category="product_category")
+promos = dict(date="JOUR", region="REGION_KEY")
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def calcul_uplift(daily, calendar, by=(), weight=None, categories=()):
+    # même tranche (filtres) et même regroupement : le bootstrap n'est pas relancé
+    return uplift(daily, calendar, by=by, weight=weight, categories=categories)
+
+
+panels = PanelLoader({
+    "Performance régionale": filters.bind(query_region_perf, ventes=ventes),
+    "Promo vs normal": filters.bind(query_ventes_promo, ventes=ventes, promos=promos),
+    "Ventes journalières": filters.bind(query_ventes_jour, ventes=ventes),
+    # sans filtre de catégorie : les ventes n'en portent pas, et la référence (jours sans
+    # aucune promotion) doit exclure les promotions de toutes les catégories ; la sélection
+    # de catégories est appliquée aux jours promo par uplift()
+    "Calendrier promotions": filters.bind(query_calendrier_promo, promos=promos),
+    "Ruptures de stock": filters.bind(query_stock, stock=stock),
+    "Alertes stock": filters.bind(query_stock_alertes, stock=stock),
+    "Logistique": filters.bind(query_logistique, logistique=dict(date="ship_date", region="destination_region")),
+})
+
+
+def donnees_uplift():
+    """Entrées du moteur d'uplift (sections 2 et 3) : ventes par région et jour, calendrier des promotions."""
+    return prepare_daily(panels.get("Ventes journalières")), panels.get("Calendrier promotions")
+
+
+# =========================================================
+# 1) Performance globale par région
+# =========================================================
+def section_regions():
+    st.header("🌍 Performance globale par région")
+
+    df_region_perf = panels.get("Performance régionale")
 
-top_log = df_logistique.sort_values("TAUX_DE_RETOUR_POURCENT", ascending=False).head(10)
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.metric("Chiffre d'affaires total", f"{df_region_perf['TOTAL_VENTES'].sum():,.0f} €")
+        st.metric("Nombre total de transactions", f"{df_region_perf['NB_TRANSACTIONS'].sum():,}")
 
-col1, col2 = st.columns(2)
+    with col2:
+        fig_region_perf = px.bar(
+            df_region_perf,
+            x="REGION",
+            y="TOTAL_VENTES",
+            title="Chiffre d'affaires par région",
+            labels={"TOTAL_VENTES": "CA total (€)"}
+        )
+        fig_region_perf.update_layout(xaxis_title="", yaxis_title="CA total (€)")
+        st.plotly_chart(fig_region_perf, use_container_width=True)
 
-with col1:
-    fig_retours = px.bar(
-        top_log,
-        x="DESTINATION_REGION",
-        y="TAUX_DE_RETOUR_POURCENT",
-        color="SHIPPING_METHOD",
-        title="Top régions – taux de retour (%) par méthode",
-        labels={"TAUX_DE_RETOUR_POURCENT": "Taux de retour (%)"}
+
+# =========================================================
+# 2) Ventes avec vs sans promotion
+# =========================================================
+def section_promo():
+    panels.prefetch("Promo vs normal", "Ventes journalières", "Calendrier promotions")
+    st.header("🚀 Ventes moyennes avec vs sans promotion")
+
+    df_ventes_promo = panels.get("Promo vs normal")
+
+    col1, col2 = st.columns([1, 2])
+
+    # uplift calculé par le moteur (uplift.py) : chaque jour promo est comparé aux jours sans promo de sa région
+    daily, calendrier = donnees_uplift()
+
+    with col1:
+        try:
+            v_promo = df_ventes_promo.loc[
+                df_ventes_promo["TYPE_PERIODE"] == "Période Promo",
+                "VENTES_MOYENNES_PAR_JOUR"
+            ].values[0]
+            v_normale = df_ventes_promo.loc[
+                df_ventes_promo["TYPE_PERIODE"] == "Période Normale",
+                "VENTES_MOYENNES_PAR_JOUR"
+            ].values[0]
+        except IndexError:
+            v_promo, v_normale = 0, 0
+
+        st.metric("Ventes moyennes (Période Promo)", f"{v_promo:,.0f} €")
+        st.metric("Ventes moyennes (Période Normale)", f"{v_normale:,.0f} €")
+        df_uplift = calcul_uplift(daily, calendrier, categories=filters.categories)
+        if df_uplift.empty:
+            st.metric("Effet Boost (Uplift)", "n.d.")
+        else:
+            u = df_uplift.iloc[0]
+            st.metric("Effet Boost (Uplift)", f"{u['LIFT_PCT']:+.1f} %")
+            st.caption(f"IC 95 % : [{u['IC_BAS_PCT']:+.1f} % ; {u['IC_HAUT_PCT']:+.1f} %] "
+                       f"sur {u['NB_JOURS']:,} jours promo × région")
+
+    with col2:
+        fig_ventes_promo = px.bar(
+            df_ventes_promo,
+            x="TYPE_PERIODE",
+            y="VENTES_MOYENNES_PAR_JOUR",
+            title="Ventes moyennes par jour : promo vs normal",
+            labels={"VENTES_MOYENNES_PAR_JOUR": "Ventes moyennes/jour (€)"}
+        )
+        fig_ventes_promo.update_layout(xaxis_title="", yaxis_title="Ventes moyennes/jour (€)")
+        st.plotly_chart(fig_ventes_promo, use_container_width=True)
+
+
+# =========================================================
+# 3) Sensibilité des catégories aux promotions (Lift)
+# =========================================================
+def section_lift():
+    panels.prefetch("Ventes journalières", "Calendrier promotions")
+    st.header("📈 Sensibilité des catégories aux promotions (Lift)")
+
+    # lift du panier moyen : montant par transaction les jours promo vs jours sans promo de la même région
+    daily, calendrier = donnees_uplift()
+    df_lift = calcul_uplift(daily, calendrier, by=("PRODUCT_CATEGORY",), weight="NB_MONTANTS",
+                             categories=filters.categories)
+    df_lift["SENSIBILITE"] = classify_lift(df_lift["LIFT_PCT"])
+
+    fig_lift = px.bar(
+        df_lift,
+        x="PRODUCT_CATEGORY",
+        y="LIFT_PCT",
+        color="SENSIBILITE",
+        error_y=df_lift["IC_HAUT_PCT"] - df_lift["LIFT_PCT"],
+        error_y_minus=df_lift["LIFT_PCT"] - df_lift["IC_BAS_PCT"],
+        title="Sensibilité aux promotions par catégorie (Lift %, IC 95 %)",
+        labels={"LIFT_PCT": "Lift (%)"}
     )
-    fig_retours.update_layout(xaxis_title="", yaxis_title="Taux de retour (%)")
-    st.plotly_chart(fig_retours, use_container_width=True)
-
-with col2:
-    fig_delai = px.bar(
-        top_log,
-        x="DESTINATION_REGION",
-        y="DELAI_MOYEN_JOURS",
-        color="SHIPPING_METHOD",
-        title="Top régions – délai moyen de livraison (jours)",
-        labels={"DELAI_MOYEN_JOURS": "Délai moyen (jours)"}
+    fig_lift.update_layout(xaxis_title="", yaxis_title="Lift (%)")
+    st.plotly_chart(fig_lift, use_container_width=True)
+
+    with st.expander("Détail par catégorie, région et promotion"):
+        st.dataframe(
+            calcul_uplift(daily, calendrier, by=("PRODUCT_CATEGORY", "REGION_KEY", "PROMOTION_ID"), weight="NB_MONTANTS",
+                          categories=filters.categories)
+            .sort_values("LIFT_PCT", ascending=False),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.caption("SIGNIFICATIF : l'intervalle de confiance à 95 % (bootstrap) ne contient pas 0.")
+
+
+# =========================================================
+# 4) Ruptures de stock – visuel amélioré
+# =========================================================
+@st.fragment
+def section_stock():
+    panels.prefetch("Ruptures de stock", "Alertes stock")
+    st.header("📦 Ruptures de stock par catégorie")
+
+    df_stock = panels.get("Ruptures de stock")
+
+    st.subheader("Vue détaillée des catégories")
+    st.dataframe(df_stock)
+
+    top_stock = df_stock.sort_values("STOCKOUT_RATE_PCT", ascending=False).head(5)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig_stock_rate = px.bar(
+            top_stock,
+            x="PRODUCT_CATEGORY",
+            y="STOCKOUT_RATE_PCT",
+            title="Top 5 catégories – taux de rupture ou rupture imminente (%)",
+            labels={"STOCKOUT_RATE_PCT": "Taux de rupture (%)"}
+        )
+        fig_stock_rate.update_layout(xaxis_title="", yaxis_title="Taux de rupture (%)")
+        st.plotly_chart(fig_stock_rate, use_container_width=True)
+
+    with col2:
+        fig_stock_count = px.bar(
+            top_stock,
+            x="PRODUCT_CATEGORY",
+            y="PRODUCTS_IN_STOCKOUT",
+            title="Top 5 catégories – nb de produits en rupture ou critiques",
+            labels={"PRODUCTS_IN_STOCKOUT": "Nb produits en rupture"}
+        )
+        fig_stock_count.update_layout(xaxis_title="", yaxis_title="Nb produits en rupture")
+        st.plotly_chart(fig_stock_count, use_container_width=True)
+
+    st.subheader("Produits à risque par entrepôt")
+    st.caption("Jours avant rupture : stock actuel / demande journalière estimée ; "
+               "« Critique » : la rupture arrive avant la livraison d'un réassort lancé aujourd'hui.")
+
+    df_alertes = panels.get("Alertes stock")
+    entrepots_sel = st.multiselect("Entrepôts", sorted(df_alertes["WAREHOUSE"].dropna().unique()),
+                                   placeholder="Tous les entrepôts")
+    if entrepots_sel:
+        df_alertes = df_alertes[df_alertes["WAREHOUSE"].isin(entrepots_sel)]
+    st.dataframe(df_alertes, use_container_width=True, hide_index=True)
+
+
+# =========================================================
+# 5) Impact des délais de livraison – visuel amélioré
+# =========================================================
+def section_logistique():
+    st.header("🚚 Impact des délais de livraison et retours")
+
+    df_logistique = panels.get("Logistique")
+
+    st.subheader("Vue détaillée des performances logistiques")
+    st.dataframe(df_logistique)
+
+    top_log = df_logistique.sort_values("TAUX_DE_RETOUR_POURCENT", ascending=False).head(10)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig_retours = px.bar(
+            top_log,
+            x="DESTINATION_REGION",
+            y="TAUX_DE_RETOUR_POURCENT",
+            color="SHIPPING_METHOD",
+            title="Top régions – taux de retour (%) par méthode",
+            labels={"TAUX_DE_RETOUR_POURCENT": "Taux de retour (%)"}
+        )
+        fig_retours.update_layout(xaxis_title="", yaxis_title="Taux de retour (%)")
+        st.plotly_chart(fig_retours, use_container_width=True)
+
+    with col2:
+        fig_delai = px.bar(
+            top_log,
+            x="DESTINATION_REGION",
+            y="DELAI_MOYEN_JOURS",
+            color="SHIPPING_METHOD",
+            title="Top régions – délai moyen de livraison (jours)",
+            labels={"DELAI_MOYEN_JOURS": "Délai moyen (jours)"}
+        )
+        fig_delai.update_layout(xaxis_title="", yaxis_title="Délai moyen (jours)")
+        st.plotly_chart(fig_delai, use_container_width=True)
+
+    top_queue = df_logistique.sort_values("DELAI_P99_JOURS", ascending=False).head(10)
+    fig_queue = px.bar(
+        top_queue.assign(SEGMENT=top_queue["DESTINATION_REGION"].astype(str) + " · "
+                         + top_queue["SHIPPING_METHOD"].astype(str)),
+        x="SEGMENT",
+        y=["DELAI_P50_JOURS", "DELAI_P90_JOURS", "DELAI_P99_JOURS"],
+        barmode="group",
+        title="Top régions × méthodes – délais extrêmes p50 / p90 / p99 (jours)",
     )
-    fig_delai.update_layout(xaxis_title="", yaxis_title="Délai moyen (jours)")
-    st.plotly_chart(fig_delai, use_container_width=True)
+    fig_queue.update_layout(xaxis_title="", yaxis_title="Délai (jours)", legend_title="")
+    st.plotly_chart(fig_queue, use_container_width=True)
+
+
+# Onglets : seule la section affichée est exécutée (requêtes, calculs et figures)
+lazy_sections({
+    "🌍 Régions": section_regions,
+    "🚀 Promo vs normal": section_promo,
+    "📈 Lift par catégorie": section_lift,
+    "📦 Ruptures de stock": section_stock,
+    "🚚 Logistique": section_logistique,
+}, key="onglet_promotions")
 
 st.success("✅ Dashboard Promotions & Logistique chargé avec succès !")
+
+performance_panel()
@@ -1,257 +1,372 @@
+from dataclasses import replace
+
 import streamlit as st
 import pandas as pd
-import snowflake.connector
 import plotly.express as px
 
+from db import PanelLoader, lazy_sections, run_query, refresh_button, performance_panel
+from customer_store import lookup
+from filters import region_options, sidebar_filters
+
 # ---------------------------------------------------------
 # Configuration générale
 # ---------------------------------------------------------
-st.set_page_config(page_title="Sales Dashboard", layout="wide", page_icon="📊")
-
 st.title("📊 Sales Dashboard – AnyCompany Food & Beverage")
 st.markdown("Vue d'ensemble des ventes, de la dynamique régionale, des profils clients et de l'effet des promotions.")
 st.markdown("---")
 
-@st.cache_resource
-def get_snowflake_connection():
-    return snowflake.connector.connect(
-        user=st.secrets["snowflake"]["user"],
-        password=st.secrets["snowflake"]["password"],
-        account=st.secrets["snowflake"]["account"],
-        warehouse=st.secrets["snowflake"]["warehouse"],
-        database=st.secrets["snowflake"]["database"],
-        schema=st.secrets["snowflake"]["schema"]
-    )
-
-conn = get_snowflake_connection()
-
-# =========================================================
-# 1) Ventes annuelles
-# =========================================================
-st.header("📈 Ventes annuelles")
+refresh_button()
+filters = sidebar_filters()
 
+# ---------------------------------------------------------
+# Requêtes de la page : chaque onglet lance les siennes en parallèle
+# quand il est affiché, les autres ne coûtent rien. Les {emplacements}
+# reçoivent les filtres de la barre latérale (voir filters.py).
+# ---------------------------------------------------------
 query_ventes_annuelles = """
 SELECT 
-    YEAR(transaction_date) AS annee, 
-    COUNT(*) AS nombre_vraies_ventes,
-    SUM(amount) AS chiffre_affaires_total
-FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+    YEAR(jour) AS annee, 
+    SUM(nb_transactions) AS nombre_vraies_ventes,
+    SUM(montant_total) AS chiffre_affaires_total
+FROM ANALYTICS.DAILY_SALES_CUBE
 WHERE transaction_type = 'Sale'
+  AND {ventes}
 GROUP BY 1
 ORDER BY annee;
 """
-df_ventes_annuelles = pd.read_sql(query_ventes_annuelles, conn)
-
-col1, col2 = st.columns([1, 2])
-
-with col1:
-    st.metric("CA total (toutes années)", f"{df_ventes_annuelles['CHIFFRE_AFFAIRES_TOTAL'].sum():,.0f} €")
-    st.metric("Nombre total de ventes", f"{df_ventes_annuelles['NOMBRE_VRAIES_VENTES'].sum():,}")
-
-with col2:
-    fig_ca_annee = px.bar(
-        df_ventes_annuelles,
-        x="ANNEE",
-        y="CHIFFRE_AFFAIRES_TOTAL",
-        title="Chiffre d'affaires par année",
-        labels={"CHIFFRE_AFFAIRES_TOTAL": "CA (€)", "ANNEE": "Année"}
-    )
-    fig_ca_annee.update_layout(yaxis_tickformat=",")
-    st.plotly_chart(fig_ca_annee, use_container_width=True)
-
-st.markdown("---")
-
-# =========================================================
-# 2) Ventes mensuelles par région
-# =========================================================
-st.header("🌍 Ventes mensuelles par région")
 
 query_ventes_region = """
 SELECT 
-    DATE_TRUNC('MONTH', transaction_date) AS mois,
+    DATE_TRUNC('MONTH', jour) AS mois,
     region,
-    SUM(amount) AS chiffre_affaires,
-    COUNT(transaction_id) AS nb_ventes,
+    SUM(montant_total) AS chiffre_affaires,
+    SUM(nb_transactions) AS nb_ventes,
     ROUND(
-        (SUM(amount) 
-         - LAG(SUM(amount)) OVER (PARTITION BY region ORDER BY DATE_TRUNC('MONTH', transaction_date)))
-        / NULLIF(LAG(SUM(amount)) OVER (PARTITION BY region ORDER BY DATE_TRUNC('MONTH', transaction_date)), 0)
+        (SUM(montant_total) 
+         - LAG(SUM(montant_total)) OVER (PARTITION BY region ORDER BY DATE_TRUNC('MONTH', jour)))
+        / NULLIF(LAG(SUM(montant_total)) OVER (PARTITION BY region ORDER BY DATE_TRUNC('MONTH', jour)), 0)
         * 100,
         2
     ) AS croissance_pct
-FROM SILVER.FINANCIAL_TRANSACTIONS_CLEAN
+FROM ANALYTICS.DAILY_SALES_CUBE
 WHERE transaction_type = 'Sale'
+  AND {ventes}
 GROUP BY 1, region
 ORDER BY 1, region;
 """
-df_ventes_region = pd.read_sql(query_ventes_region, conn)
-
-regions = sorted(df_ventes_region["REGION"].unique())
-region_sel = st.selectbox("Choisir une région", regions)
 
-df_region_sel = df_ventes_region[df_ventes_region["REGION"] == region_sel].sort_values("MOIS").copy()
-
-col1, col2 = st.columns(2)
-
-with col1:
-    fig_mois = px.line(
-        df_region_sel,
-        x="MOIS",
-        y="CHIFFRE_AFFAIRES",
-        title=f"CA mensuel – {region_sel}",
-        markers=True,
-        labels={"CHIFFRE_AFFAIRES": "CA (€)", "MOIS": ""}
-    )
-    fig_mois.update_layout(yaxis_tickformat=",")
-    st.plotly_chart(fig_mois, use_container_width=True)
-
-with col2:
-    # on limite l'échelle pour mieux voir, sans regrouper les données
-    df_region_sel["CROISSANCE_PCT_CLIPPED"] = df_region_sel["CROISSANCE_PCT"].clip(-100, 100)
-    fig_croissance = px.bar(
-        df_region_sel,
-        x="MOIS",
-        y="CROISSANCE_PCT_CLIPPED",
-        title=f"Croissance mensuelle du CA – {region_sel} (entre -100% et +100%)",
-        labels={"CROISSANCE_PCT_CLIPPED": "Croissance (%)", "MOIS": ""}
-    )
-    st.plotly_chart(fig_croissance, use_container_width=True)
-
-st.markdown("---")
-
-# =========================================================
-# 3) Segmentation démographique clients
-# =========================================================
-st.header("👥 Segmentation démographique clients")
+# Prévisions (pipeline/forecast.py) : 6 mois par région, avec le modèle retenu et son erreur de backtest
+query_prevision = """
+SELECT
+    f.mois,
+    f.prevision,
+    f.prevision_basse,
+    f.prevision_haute,
+    m.modele,
+    m.mape_pct
+FROM ANALYTICS.SALES_FORECAST f
+JOIN ANALYTICS.FORECAST_MODELS m ON m.region_key = f.region_key
+WHERE {prevision}
+ORDER BY f.mois;
+"""
 
+# Segments pré-agrégés (pipeline/customer_features.py) : une ligne par combinaison de caractéristiques
 query_segmentation = """
-WITH customer_age AS (
-    SELECT
-        customer_id,
-        gender,
-        marital_status,
-        region,
-        country,
-        annual_income,
-        DATE_PART('year', CURRENT_DATE) - DATE_PART('year', date_of_birth) AS age
-    FROM SILVER.customer_demographics_clean
-)
 SELECT
     gender,
     marital_status,
     region,
     country,
-    CASE
-        WHEN age < 25 THEN 'Under 25'
-        WHEN age BETWEEN 25 AND 34 THEN '25-34'
-        WHEN age BETWEEN 35 AND 44 THEN '35-44'
-        WHEN age BETWEEN 45 AND 54 THEN '45-54'
-        WHEN age BETWEEN 55 AND 64 THEN '55-64'
-        ELSE '65+'
-    END AS age_group,
-    COUNT(customer_id) AS total_customers,
-    AVG(annual_income) AS avg_annual_income
-FROM customer_age
+    age_group,
+    income_band,
+    SUM(nb_clients) AS total_customers,
+    SUM(nb_revenus) AS nb_revenus,
+    SUM(revenu_total) AS revenu_total,
+    SUM(revenu_total) / NULLIF(SUM(nb_revenus), 0) AS avg_annual_income
+FROM ANALYTICS.CUSTOMER_SEGMENTS
+WHERE {clients}
 GROUP BY
     gender,
     marital_status,
     region,
     country,
-    age_group
+    age_group,
+    income_band
 ORDER BY
     total_customers DESC;
 """
-df_seg = pd.read_sql(query_segmentation, conn)
-
-# Répartition par tranche d'âge et genre
-ordre_age = ["Under 25", "25-34", "35-44", "45-54", "55-64", "65+"]
 
-df_age = (
-    df_seg.groupby(["AGE_GROUP", "GENDER"], as_index=False)
-    .agg({"TOTAL_CUSTOMERS": "sum"})
-)
-df_age["AGE_GROUP"] = pd.Categorical(df_age["AGE_GROUP"], categories=ordre_age, ordered=True)
-df_age = df_age.sort_values("AGE_GROUP")
-
-st.subheader("Répartition par tranche d'âge et genre")
-fig_age = px.bar(
-    df_age,
-    x="AGE_GROUP",
-    y="TOTAL_CUSTOMERS",
-    color="GENDER",
-    barmode="group",
-    title="Nombre de clients par tranche d'âge et genre",
-    labels={"TOTAL_CUSTOMERS": "Nb clients", "AGE_GROUP": "Tranche d'âge"}
+query_ventes_promo = """
+WITH jours_promo AS (
+    -- un jour couvert par plusieurs promotions ne compte qu'une fois
+    SELECT DISTINCT REGION_KEY, JOUR
+    FROM ANALYTICS.PROMO_CALENDAR
 )
-st.plotly_chart(fig_age, use_container_width=True)
+SELECT 
+    CASE WHEN p.JOUR IS NOT NULL 
+         THEN 'Période Promo' 
+         ELSE 'Période hors promo' 
+    END AS SITUATION,
+    SUM(v.NB_TRANSACTIONS) AS nombre_de_ventes,
+    ROUND(SUM(v.MONTANT_TOTAL), 2) AS chiffre_affaires_total,
+    ROUND(SUM(v.MONTANT_TOTAL) / NULLIF(SUM(v.NB_MONTANTS), 0), 2) AS panier_moyen
+FROM ANALYTICS.DAILY_SALES_CUBE v
+LEFT JOIN jours_promo p 
+    ON UPPER(TRIM(v.REGION)) = p.REGION_KEY
+    AND v.JOUR = p.JOUR
+WHERE v.TRANSACTION_TYPE = 'Sale'
+  AND {ventes}
+GROUP BY 1;
+"""
 
-# Revenu moyen par genre
-st.subheader("Revenu moyen par genre")
+# Anomalies détectées chaque jour (pipeline/anomalies.py) : ventes et retours par région, service client par catégorie
+query_anomalies = """
+SELECT jour, metrique, serie, valeur, attendu, z_score, sens
+FROM ANALYTICS.ANOMALIES
+WHERE {anomalies}
+ORDER BY jour DESC, ABS(z_score) DESC
+LIMIT 1000;
+"""
 
-df_revenu_genre = (
-    df_seg.groupby("GENDER", as_index=False)
-    .agg({"AVG_ANNUAL_INCOME": "mean"})
-)
+panels = PanelLoader({
+    "Ventes annuelles": filters.bind(query_ventes_annuelles, ventes=dict(date="jour", region="region")),
+    "Segmentation clients": filters.bind(query_segmentation, clients=dict(region="region")),
+    "Ventes promo vs hors promo": filters.bind(query_ventes_promo, ventes=dict(date="v.JOUR", region="v.REGION")),
+    "Anomalies": filters.bind(query_anomalies, anomalies=dict(date="jour", region="region")),
+})
 
-fig_revenu = px.bar(
-    df_revenu_genre,
-    x="GENDER",
-    y="AVG_ANNUAL_INCOME",
-    title="Revenu annuel moyen par genre",
-    labels={"AVG_ANNUAL_INCOME": "Revenu moyen (€)"}
-)
-fig_revenu.update_layout(yaxis_tickformat=",")
-st.plotly_chart(fig_revenu, use_container_width=True)
 
-st.markdown("---")
+# =========================================================
+# 1) Ventes annuelles
+# =========================================================
+def section_annuelles():
+    st.header("📈 Ventes annuelles")
+
+    df_ventes_annuelles = panels.get("Ventes annuelles")
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        st.metric("CA total (toutes années)", f"{df_ventes_annuelles['CHIFFRE_AFFAIRES_TOTAL'].sum():,.0f} €")
+        st.metric("Nombre total de ventes", f"{df_ventes_annuelles['NOMBRE_VRAIES_VENTES'].sum():,}")
+
+    with col2:
+        fig_ca_annee = px.bar(
+            df_ventes_annuelles,
+            x="ANNEE",
+            y="CHIFFRE_AFFAIRES_TOTAL",
+            title="Chiffre d'affaires par année",
+            labels={"CHIFFRE_AFFAIRES_TOTAL": "CA (€)", "ANNEE": "Année"}
+        )
+        fig_ca_annee.update_layout(yaxis_tickformat=",")
+        st.plotly_chart(fig_ca_annee, use_container_width=True)
+
+
+# =========================================================
+# 2) Ventes mensuelles par région
+# =========================================================
+@st.fragment
+def section_regions():
+    st.header("🌍 Ventes mensuelles par région")
+
+    region_sel = st.selectbox("Choisir une région", list(filters.regions) or region_options())
+
+    # seule la région choisie est lue dans le cube (filtre transmis au warehouse)
+    filtre_region = replace(filters, regions=(region_sel,))
+    df_region_sel = run_query(
+        *filtre_region.bind(query_ventes_region, ventes=dict(date="jour", region="region")),
+        panel="Ventes mensuelles par région",
+    ).sort_values("MOIS")
+    # la prévision part du dernier mois complet, quelle que soit la période filtrée
+    df_prevision = run_query(*filtre_region.bind(query_prevision, prevision=dict(region="f.region_key")),
+                             panel="Prévisions")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig_mois = px.line(
+            df_region_sel,
+            x="MOIS",
+            y="CHIFFRE_AFFAIRES",
+            title=f"CA mensuel – {region_sel}",
+            markers=True,
+            labels={"CHIFFRE_AFFAIRES": "CA (€)", "MOIS": ""}
+        )
+        if not df_prevision.empty:
+            fig_mois.add_scatter(x=df_prevision["MOIS"], y=df_prevision["PREVISION_HAUTE"], mode="lines",
+                                 line_width=0, showlegend=False, hoverinfo="skip")
+            fig_mois.add_scatter(x=df_prevision["MOIS"], y=df_prevision["PREVISION_BASSE"], mode="lines",
+                                 line_width=0, fill="tonexty", name="Fourchette (95 %)")
+            fig_mois.add_scatter(x=df_prevision["MOIS"], y=df_prevision["PREVISION"], mode="lines+markers",
+                                 line_dash="dash", name="Prévision")
+        fig_mois.update_layout(yaxis_tickformat=",")
+        st.plotly_chart(fig_mois, use_container_width=True)
+        if not df_prevision.empty:
+            p = df_prevision.iloc[0]
+            erreur = f", erreur moyenne {p['MAPE_PCT']:.1f} % sur les 6 derniers mois" if pd.notna(p["MAPE_PCT"]) else ""
+            st.caption(f"Prévision : modèle « {p['MODELE']} »{erreur}.")
+
+    with col2:
+        # on limite l'échelle pour mieux voir, sans regrouper les données
+        df_region_sel["CROISSANCE_PCT_CLIPPED"] = df_region_sel["CROISSANCE_PCT"].clip(-100, 100)
+        fig_croissance = px.bar(
+            df_region_sel,
+            x="MOIS",
+            y="CROISSANCE_PCT_CLIPPED",
+            title=f"Croissance mensuelle du CA – {region_sel} (entre -100% et +100%)",
+            labels={"CROISSANCE_PCT_CLIPPED": "Croissance (%)", "MOIS": ""}
+        )
+        st.plotly_chart(fig_croissance, use_container_width=True)
+
+
+# =========================================================
+# 3) Segmentation démographique clients
+# =========================================================
+@st.fragment
+def section_clients():
+    st.header("👥 Segmentation démographique clients")
+
+    df_seg = panels.get("Segmentation clients")
+
+    # Répartition par tranche d'âge et genre
+    ordre_age = ["Under 25", "25-34", "35-44", "45-54", "55-64", "65+", "Inconnu"]
+
+    df_age = (
+        df_seg.groupby(["AGE_GROUP", "GENDER"], as_index=False)
+        .agg({"TOTAL_CUSTOMERS": "sum"})
+    )
+    df_age["AGE_GROUP"] = pd.Categorical(df_age["AGE_GROUP"], categories=ordre_age, ordered=True)
+    df_age = df_age.sort_values("AGE_GROUP")
+
+    st.subheader("Répartition par tranche d'âge et genre")
+    fig_age = px.bar(
+        df_age,
+        x="AGE_GROUP",
+        y="TOTAL_CUSTOMERS",
+        color="GENDER",
+        barmode="group",
+        title="Nombre de clients par tranche d'âge et genre",
+        labels={"TOTAL_CUSTOMERS": "Nb clients", "AGE_GROUP": "Tranche d'âge"}
+    )
+    st.plotly_chart(fig_age, use_container_width=True)
+
+    # Revenu moyen par genre
+    st.subheader("Revenu moyen par genre")
+
+    # moyenne pondérée : somme des revenus / nombre de revenus connus de chaque segment
+    df_revenu_genre = (
+        df_seg.groupby("GENDER", as_index=False, observed=True)
+        .agg({"REVENU_TOTAL": "sum", "NB_REVENUS": "sum"})
+    )
+    df_revenu_genre["AVG_ANNUAL_INCOME"] = df_revenu_genre["REVENU_TOTAL"] / df_revenu_genre["NB_REVENUS"]
+
+    fig_revenu = px.bar(
+        df_revenu_genre,
+        x="GENDER",
+        y="AVG_ANNUAL_INCOME",
+        title="Revenu annuel moyen par genre",
+        labels={"AVG_ANNUAL_INCOME": "Revenu moyen (€)"}
+    )
+    fig_revenu.update_layout(yaxis_tickformat=",")
+    st.plotly_chart(fig_revenu, use_container_width=True)
+
+    # Répartition par tranche de revenu
+    ordre_revenu = ["< 30k", "30-50k", "50-80k", "80-120k", "120k+", "Inconnu"]
+
+    df_bande = df_seg.groupby("INCOME_BAND", as_index=False, observed=True).agg({"TOTAL_CUSTOMERS": "sum"})
+    df_bande["INCOME_BAND"] = pd.Categorical(df_bande["INCOME_BAND"], categories=ordre_revenu, ordered=True)
+
+    st.subheader("Répartition par tranche de revenu")
+    fig_bande = px.bar(
+        df_bande.sort_values("INCOME_BAND"),
+        x="INCOME_BAND",
+        y="TOTAL_CUSTOMERS",
+        title="Nombre de clients par tranche de revenu annuel",
+        labels={"TOTAL_CUSTOMERS": "Nb clients", "INCOME_BAND": "Revenu annuel"}
+    )
+    st.plotly_chart(fig_bande, use_container_width=True)
+
+    # Fiche client : lecture ponctuelle, servie par le cache local après la première consultation
+    st.subheader("🔍 Fiche client")
+    saisie = st.text_input("Identifiants client (séparés par des virgules)", placeholder="ex. 1024, 2048")
+    ids = [i.strip() for i in saisie.split(",") if i.strip().isdigit()]
+    if ids:
+        df_fiches = lookup(ids)
+        if df_fiches.empty:
+            st.info("Aucun client trouvé pour ces identifiants.")
+        else:
+            st.dataframe(df_fiches, use_container_width=True, hide_index=True)
+
 
 # =========================================================
 # 4) Rappel : Ventes avec vs sans promotion (vue globale)
 # =========================================================
-st.header("🛒 Rappel : Ventes avec vs sans promotion (vue globale)")
+def section_promo():
+    st.header("🛒 Rappel : Ventes avec vs sans promotion (vue globale)")
 
-query_ventes_promo = """
-WITH ventes_taggees AS (
-    SELECT 
-        v.TRANSACTION_ID,
-        v.AMOUNT,
-        v.REGION,
-        v.TRANSACTION_DATE,
-        CASE WHEN p.PROMOTION_ID IS NOT NULL 
-             THEN 'Période Promo' 
-             ELSE 'Période hors promo' 
-        END AS SITUATION
-    FROM FINANCIAL_TRANSACTIONS_CLEAN v
-    LEFT JOIN PROMOTIONS_DATA_CLEAN p 
-        ON UPPER(TRIM(v.REGION)) = UPPER(TRIM(p.REGION))
-        AND v.TRANSACTION_DATE BETWEEN p.START_DATE AND p.END_DATE
-    WHERE v.TRANSACTION_TYPE = 'Sale'
-)
-SELECT 
-    SITUATION,
-    COUNT(*) AS nombre_de_ventes,
-    ROUND(SUM(AMOUNT), 2) AS chiffre_affaires_total,
-    ROUND(AVG(AMOUNT), 2) AS panier_moyen
-FROM ventes_taggees
-GROUP BY 1;
-"""
-df_ventes_promo_sales = pd.read_sql(query_ventes_promo, conn)
+    df_ventes_promo_sales = panels.get("Ventes promo vs hors promo")
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        st.subheader("Résumé chiffré")
+        st.dataframe(df_ventes_promo_sales)
 
-col1, col2 = st.columns([1, 2])
+    with col2:
+        fig_promo_sales = px.bar(
+            df_ventes_promo_sales,
+            x="SITUATION",
+            y="PANIER_MOYEN",
+            title="Panier moyen – périodes promo vs hors promo",
+            labels={"PANIER_MOYEN": "Panier moyen (€)"}
+        )
+        fig_promo_sales.update_layout(yaxis_tickformat=",")
+        st.plotly_chart(fig_promo_sales, use_container_width=True)
 
-with col1:
-    st.subheader("Résumé chiffré")
-    st.dataframe(df_ventes_promo_sales)
 
-with col2:
-    fig_promo_sales = px.bar(
-        df_ventes_promo_sales,
-        x="SITUATION",
-        y="PANIER_MOYEN",
-        title="Panier moyen – périodes promo vs hors promo",
-        labels={"PANIER_MOYEN": "Panier moyen (€)"}
+# =========================================================
+# 5) Anomalies détectées
+# =========================================================
+def section_anomalies():
+    st.header("🚨 Anomalies détectées")
+    st.caption("Jours dont la valeur s'écarte de plus de 3 écarts-types de la référence du même jour de semaine "
+               "(moyenne mobile exponentielle). Le service client n'est pas régional : il disparaît si des régions "
+               "sont filtrées.")
+
+    df_anomalies = panels.get("Anomalies")
+    if df_anomalies.empty:
+        st.info("Aucune anomalie sur la période sélectionnée.")
+        return
+
+    colonnes = st.columns(3)
+    for col, metrique in zip(colonnes, ["ventes", "retours", "service"]):
+        df_m = df_anomalies[df_anomalies["METRIQUE"] == metrique]
+        col.metric(f"Anomalies – {metrique}", f"{len(df_m):,}",
+                   f"{(df_m['SENS'] == 'Baisse').sum():,} baisse(s)", delta_color="off")
+
+    fig_anomalies = px.scatter(
+        df_anomalies,
+        x="JOUR",
+        y="Z_SCORE",
+        color="METRIQUE",
+        symbol="SENS",
+        hover_data=["SERIE", "VALEUR", "ATTENDU"],
+        title="Anomalies par jour (écart à la référence, en écarts-types)",
+        labels={"Z_SCORE": "Écart (z)", "JOUR": ""}
     )
-    fig_promo_sales.update_layout(yaxis_tickformat=",")
-    st.plotly_chart(fig_promo_sales, use_container_width=True)
+    st.plotly_chart(fig_anomalies, use_container_width=True)
+    st.dataframe(df_anomalies, use_container_width=True, hide_index=True)
+
+
+# Onglets : seule la section affichée est exécutée (requêtes, calculs et figures)
+lazy_sections({
+    "📈 Ventes annuelles": section_annuelles,
+    "🌍 Ventes mensuelles": section_regions,
+    "👥 Clients": section_clients,
+    "🛒 Promo vs hors promo": section_promo,
+    "🚨 Anomalies": section_anomalies,
+}, key="onglet_ventes")
 
 st.success("✅ Sales Dashboard chargé avec succès !")
+
+performance_panel()